@@ -1,7 +1,6 @@
 from app.factory import create_app
-from app.config import get_config
 
 __all__ = ['create_app']
 
-# Default application instance for direct import
-app = create_app(get_config()) 
\ No newline at end of file
+# 应用实例由入口创建（run.py、asgi.py、app/mcp_stdio.py）：导入app包没有副作用，
+# 推理工作进程导入AudioSeparator和配置时不会再创建一个完整的应用
@@ -0,0 +1,137 @@
+"""
+ASGI服务入口
+
+流式端点（/api/progress/<job_id> 和 /mcp/stream/<stream_id>）由事件循环直接处理，
+每个空闲订阅者只占用一个协程，不再占用工作线程；其余请求通过WsgiToAsgi交给Flask应用。
+两种模式共享同一个Flask应用实例，因此任务状态（SSEManager、MCPServer）完全一致。
+
+运行方式:
+    uvicorn asgi:application --host 0.0.0.0 --port 8080
+"""
+
+import re
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app.routes.api import sse_manager
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_PATH = re.compile(r'^/api/progress/(?P<job_id>[^/]+)/?$')
+MCP_STREAM_PATH = re.compile(r'^/mcp/stream/(?P<stream_id>[^/]+)/?$')
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),  # Disable buffering for Nginx
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Cache-Control, Last-Event-ID'),
+]
+
+
+class StreamingASGIApp:
+    """ASGI application serving SSE endpoints on the event loop and everything else through Flask"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+        self.heartbeat = flask_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+        self.coalesce = flask_app.config.get('SSE_COALESCE_SECONDS', 0.1)
+        self.active_streams = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            path = self._route_path(scope)
+            match = PROGRESS_PATH.match(path)
+            if match:
+                events = sse_manager.astream_progress(
+                    match.group('job_id'),
+                    heartbeat=self.heartbeat,
+                    coalesce=self.coalesce,
+                    last_event_id=self._last_event_id(scope)
+                )
+                await self._stream(events, receive, send)
+                return
+
+            match = MCP_STREAM_PATH.match(path)
+            if match:
+                events = self.flask_app.mcp_server.agenerate_stream_events(match.group('stream_id'))
+                await self._stream(events, receive, send)
+                return
+
+        await self.wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info("ASGI server started, streaming endpoints served on the event loop")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.flask_app.inference_pool.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _route_path(self, scope):
+        """Request path without the mount prefix (root_path) the app is served under"""
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        # ASGI服务器可能在path中保留root_path（如uvicorn --root-path），匹配路由前去掉
+        if root_path and (path == root_path or path.startswith(root_path + '/')):
+            path = path[len(root_path):] or '/'
+        return path
+
+    def _last_event_id(self, scope):
+        """Last-Event-ID header, or the lastEventId query parameter"""
+        value = None
+        for name, header_value in scope.get('headers', []):
+            if name == b'last-event-id':
+                value = header_value.decode('latin-1')
+                break
+        if not value:
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            value = query.get('lastEventId', [None])[0]
+        try:
+            return int(value) if value else None
+        except ValueError:
+            return None
+
+    async def _stream(self, events, receive, send):
+        """Send an async iterator of SSE chunks until it ends or the client disconnects"""
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+
+        async def pump():
+            async for chunk in events:
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+        async def wait_for_disconnect():
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+
+        self.active_streams += 1
+        pump_task = asyncio.ensure_future(pump())
+        disconnect_task = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.active_streams -= 1
+            for task in (pump_task, disconnect_task):
+                task.cancel()
+            await asyncio.gather(pump_task, disconnect_task, return_exceptions=True)
+            # 关闭生成器，释放订阅（监听器、MCP流）
+            await events.aclose()
+
+
+def create_asgi_app(flask_app):
+    """Wrap a Flask application created by create_app"""
+    return StreamingASGIApp(flask_app)
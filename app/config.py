@@ -22,11 +22,12 @@ class Config:
     BASE_DIR = Path(os.path.abspath(os.path.dirname(__file__))).parent
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', '/demucs/uploads')
     OUTPUT_FOLDER = os.environ.get('OUTPUT_FOLDER', '/demucs/outputs')
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', '/demucs/data/jobs.db')  # 任务状态数据库（SQLite），多个工作进程共享
     
     # File settings
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))  # 降低为100MB
     ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'ogg', 'm4a', 'mp4'}
-    FILE_RETENTION_MINUTES = int(os.environ.get('FILE_RETENTION_MINUTES', 30))  # 降低为30分钟
+    FILE_RETENTION_MINUTES = int(os.environ.get('FILE_RETENTION_MINUTES', 30))  # 降低为30分钟；任务结束后到期自动回收，0表示不回收
     
     # Audio processing settings - 资源限制配置
     DEFAULT_MODEL = os.environ.get('DEFAULT_MODEL', 'htdemucs')
@@ -34,6 +35,50 @@ class Config:
     SAMPLE_RATE = int(os.environ.get('SAMPLE_RATE', 22050))  # 降低采样率节省资源
     CHANNELS = int(os.environ.get('CHANNELS', 2))
     
+    # Model cache settings - 模型按需加载，LRU淘汰
+    MODEL_CACHE_MAX_MODELS = int(os.environ.get('MODEL_CACHE_MAX_MODELS', 1))  # 最多常驻模型数，0表示不限制
+    MODEL_CACHE_MAX_BYTES = int(os.environ.get('MODEL_CACHE_MAX_BYTES', 0))  # 常驻模型权重字节上限，0表示不限制
+    MODEL_LOAD_TIMEOUT = int(os.environ.get('MODEL_LOAD_TIMEOUT', 600))  # 等待模型加载的超时时间（秒）
+    
+    # Job scheduling settings - 任务队列配置
+    INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS', 1))  # 同时进行推理的任务数
+    MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 10))  # 等待空闲槽位的任务上限，超出返回429；0表示不排队，只在有空闲槽位时接受任务
+    ESTIMATED_JOB_SECONDS = int(os.environ.get('ESTIMATED_JOB_SECONDS', 120))  # 初始任务耗时估计（秒）
+    
+    # Inference worker settings - 推理进程池配置
+    INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'process')  # process: 独立工作进程; thread: Web进程内执行
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', INFERENCE_SLOTS))  # 推理工作进程数
+    WORKER_MAX_JOBS = int(os.environ.get('WORKER_MAX_JOBS', 20))  # 每个工作进程处理多少任务后重启，0表示不重启
+    ENCODER_WORKERS = int(os.environ.get('ENCODER_WORKERS', 4))  # 每个推理进程中并行编码音轨的ffmpeg数量
+    
+    # Long file settings - 长音频按窗口分离，峰值内存由窗口大小而非音频时长决定
+    LONG_FILE_MODE = os.environ.get('LONG_FILE_MODE', 'auto')  # auto: 超出内存上限时启用; always; never
+    SEPARATION_MEMORY_LIMIT_MB = int(os.environ.get('SEPARATION_MEMORY_LIMIT_MB', 1536))  # 单个任务的内存上限（MB）
+    LONG_FILE_OVERLAP_SECONDS = float(os.environ.get('LONG_FILE_OVERLAP_SECONDS', 2.0))  # 相邻窗口交叉淡化的重叠时长
+    
+    # Result cache settings - 按内容哈希缓存分离结果，最长保留FILE_RETENTION_MINUTES
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 100))  # 缓存条目上限，0表示禁用缓存
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 0))  # 缓存结果文件总大小上限，0表示不限制
+    
+    # SSE settings - 进度推送
+    SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))  # 空闲连接的心跳间隔
+    SSE_COALESCE_SECONDS = float(os.environ.get('SSE_COALESCE_SECONDS', 0.1))  # 合并连续更新的时间窗口
+    SSE_HISTORY_SIZE = int(os.environ.get('SSE_HISTORY_SIZE', 32))  # 每个任务保留的最近事件数，用于断线重连补发
+    SSE_STORE_WRITE_SECONDS = float(os.environ.get('SSE_STORE_WRITE_SECONDS', 1.0))  # 进度批量写入任务存储的间隔，状态变化立即写入；0表示每次都写入
+    
+    # Download settings - 单音轨下载可交给Web服务器发送文件内容
+    DOWNLOAD_OFFLOAD = os.environ.get('DOWNLOAD_OFFLOAD', '')  # 空: Python发送; x-accel: nginx; x-sendfile: Apache/lighttpd
+    DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-outputs')  # nginx internal location，映射到OUTPUT_FOLDER
+    
+    # MCP settings - 任务音轨作为MCP资源
+    MCP_RESOURCE_MAX_BYTES = int(os.environ.get('MCP_RESOURCE_MAX_BYTES', 50 * 1024 * 1024))  # resources/read内联音轨的大小上限，超过时返回下载地址
+    MCP_STREAM_MAX_EVENTS = int(os.environ.get('MCP_STREAM_MAX_EVENTS', 64))  # 每个MCP流缓冲的事件数上限，超出时丢弃最旧的进度事件
+    MCP_STREAM_MAX_BYTES = int(os.environ.get('MCP_STREAM_MAX_BYTES', 256 * 1024))  # 每个MCP流缓冲的字节数上限
+    MCP_STREAM_IDLE_SECONDS = int(os.environ.get('MCP_STREAM_IDLE_SECONDS', 300))  # 没有读取方的MCP流超过该时间被回收，0表示不回收
+    MCP_BATCH_WORKERS = int(os.environ.get('MCP_BATCH_WORKERS', 8))  # JSON-RPC批量请求的并发线程数，1表示顺序执行
+    MCP_BATCH_MAX_REQUESTS = int(os.environ.get('MCP_BATCH_MAX_REQUESTS', 100))  # 单个批量请求的调用数上限
+    MCP_SUBSCRIPTION_POLL_SECONDS = float(os.environ.get('MCP_SUBSCRIPTION_POLL_SECONDS', 0.5))  # 订阅其他工作进程的任务时轮询任务存储的间隔
+    
     # Audio output settings - 资源限制配置
     DEFAULT_OUTPUT_FORMAT = os.environ.get('DEFAULT_OUTPUT_FORMAT', 'mp3')  # 默认MP3
     SUPPORTED_OUTPUT_FORMATS = ['mp3']  # 只支持MP3格式
@@ -77,6 +122,7 @@ class TestingConfig(Config):
     # Use temporary directories for tests
     UPLOAD_FOLDER = '/demucs/test_uploads'
     OUTPUT_FOLDER = '/demucs/test_outputs'
+    JOB_STORE_PATH = None  # 内存数据库
 
 
 # Configuration dictionary
@@ -8,6 +8,13 @@ from app import routes
 from app.config import Config
 from app.services.audio_separator import AudioSeparator
 from app.services.file_manager import FileManager
+from app.services.job_scheduler import JobScheduler
+from app.services.inference_pool import InferencePool, InProcessInference
+from app.services.result_cache import ResultCache
+from app.services.job_store import JobStore
+from app.services.janitor import Janitor
+from app.services.file_index import FileIndex
+from app.services.upload_manager import UploadManager
 from app.services.mcp_server import MCPServer
 
 # 加载环境变量
@@ -57,8 +64,30 @@ def init_services(app):
     config_instance = Config()
     
     # Create service instances
-    app.file_manager = FileManager(config_instance)
+    # 任务状态存放在SQLite中，所有工作进程共享；测试配置使用内存数据库
+    app.job_store = JobStore(app.config.get('JOB_STORE_PATH'))
+    app.job_store.recover_orphans()
+    
+    # 任务文件索引与任务状态使用同一个数据库
+    app.file_manager = FileManager(config_instance, index=FileIndex(app.job_store))
     app.audio_separator = AudioSeparator(config_instance)
+    app.job_scheduler = JobScheduler(config_instance)
+    app.result_cache = ResultCache(config_instance)
+    # 可续传上传：分块直接写入上传目录的最终位置，边写边计算哈希
+    app.upload_manager = UploadManager(app.file_manager, app.job_store, max_size=config_instance.MAX_CONTENT_LENGTH)
+    
+    # 按过期时间回收任务记录和文件（FILE_RETENTION_MINUTES）；
+    # 只恢复已退出进程留下的文件，多个工作进程同时启动时每个文件只由其中一个接管
+    app.janitor = Janitor(config_instance)
+    app.janitor.add_evict_callback(app.file_manager.index.remove_job)
+    app.janitor.add_evict_callback(app.upload_manager.forget)
+    app.janitor.restore(app.file_manager.index.claim_orphans())
+    
+    # 推理默认在独立的工作进程中执行，Web进程只负责排队和转发进度
+    if config_instance.INFERENCE_MODE == 'process':
+        app.inference_pool = InferencePool(config_instance)
+    else:
+        app.inference_pool = InProcessInference(app.audio_separator)
     app.mcp_server = MCPServer()
     
     # Set app reference for MCP service
@@ -0,0 +1,218 @@
+"""
+MCP stdio传输
+
+在标准输入/输出上以换行分隔的JSON-RPC 2.0消息运行与 /mcp 端点相同的MCPServer处理逻辑，
+供同一台机器上的本地代理使用：不经过HTTP、Flask路由和CORS，一个长期运行的会话保持模型常驻。
+
+分离任务默认在本进程内执行（InProcessInference），模型加载一次后留在内存中；
+任务进度作为异步通知写到标准输出：
+    - 资源订阅（resources/subscribe）的 notifications/resources/updated
+    - separate_audio 请求带 params._meta.progressToken 时的 notifications/progress
+
+运行方式:
+    python -m app.mcp_stdio [--preload htdemucs] [--workers]
+
+标准输出只用于协议消息；日志和第三方库的输出都写到标准错误。
+"""
+
+import os
+import sys
+import json
+import uuid
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Optional
+
+from app.services.job_store import FINAL_STATUSES
+from app.services.mcp_server import JOB_RESOURCE_URI, is_notification
+from app.services.stream_buffer import RESOURCE_UPDATED
+
+logger = logging.getLogger(__name__)
+
+
+class StdioSession:
+    """One MCP session over a pair of line-oriented text streams
+
+    Requests are read line by line and answered in order; notifications for
+    the session arrive through its MCP stream buffer and are written by a
+    background thread, so progress is pushed while the client keeps sending
+    requests.
+    """
+
+    def __init__(self, app, reader, writer, session_id: Optional[str] = None):
+        self.app = app
+        self.mcp = app.mcp_server
+        self.reader = reader
+        self.writer = writer
+        self.session_id = session_id or f"stdio-{uuid.uuid4().hex[:12]}"
+        self.stream = None
+        self._write_lock = threading.Lock()
+        # job_id -> separate_audio 请求的 progressToken
+        self._progress_tokens: Dict[str, Any] = {}
+
+    def send(self, message: Any):
+        """写一条协议消息（一行JSON）"""
+        line = json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._write_lock:
+            self.writer.write(line + "\n")
+            self.writer.flush()
+
+    def handle_line(self, line: str):
+        """处理一行输入，返回需要写回的响应（通知和空行返回None）"""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            request_data = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error", "data": str(e)}}
+
+        if isinstance(request_data, list):
+            responses = self.mcp.handle_batch(request_data, self.session_id)
+            if isinstance(responses, list):
+                by_id = {response.get("id"): response for response in responses}
+                for entry in request_data:
+                    if isinstance(entry, dict) and not is_notification(entry):
+                        self._after_call(entry, by_id.get(entry.get("id")))
+            return responses or None
+
+        if not isinstance(request_data, dict):
+            return {"jsonrpc": "2.0", "id": None,
+                    "error": {"code": -32600, "message": "Invalid Request",
+                              "data": "Request must be an object or an array"}}
+
+        with self.app.app_context():
+            response = self.mcp.handle_jsonrpc_request(request_data, self.session_id)
+        if is_notification(request_data):
+            return None
+        self._after_call(request_data, response)
+        return response
+
+    def _after_call(self, request_data: Dict[str, Any], response: Optional[Dict[str, Any]]):
+        """separate_audio 启动任务后订阅任务资源，把进度推送给本会话"""
+        params = request_data.get("params") or {}
+        if (request_data.get("method") != "tools/call" or params.get("name") != "separate_audio"
+                or not response or "result" not in response):
+            return
+        try:
+            result = json.loads(response["result"]["content"][0]["text"])
+        except (KeyError, IndexError, TypeError, ValueError):
+            return
+        job_id = result.get("job_id")
+        if not job_id or not (params.get("arguments") or {}).get("stream_progress", True):
+            return
+
+        token = (params.get("_meta") or {}).get("progressToken")
+        if token is not None:
+            self._progress_tokens[job_id] = token
+        with self.app.app_context():
+            self.mcp.handle_jsonrpc_request({
+                "jsonrpc": "2.0", "id": None, "method": "resources/subscribe",
+                "params": {"uri": f"demucs://jobs/{job_id}"}
+            }, self.session_id)
+
+        # 先发送订阅时的状态：订阅前的进度不会再通知，任务也可能已经完成（结果缓存命中）
+        update = self.mcp.job_update(job_id)
+        if update is not None:
+            self._forward(update)
+
+    def _forward(self, event: Dict[str, Any]):
+        """把会话流中的通知写到标准输出；带progressToken的任务同时发送 notifications/progress"""
+        if "jsonrpc" not in event:
+            return
+        self.send(event)
+        if event.get("method") != RESOURCE_UPDATED:
+            return
+        params = event.get("params") or {}
+        match = JOB_RESOURCE_URI.match(params.get("uri", ""))
+        job_id = match.group("job_id") if match else None
+        if job_id not in self._progress_tokens:
+            return
+        job = params.get("job")
+        if job is not None:
+            self.send({
+                "jsonrpc": "2.0",
+                "method": "notifications/progress",
+                "params": {
+                    "progressToken": self._progress_tokens[job_id],
+                    "progress": job.get("progress", 0),
+                    "total": 100,
+                    "message": job.get("message")
+                }
+            })
+        if params.get("expired") or params.get("status") in FINAL_STATUSES:
+            self._progress_tokens.pop(job_id, None)
+
+    def _pump(self):
+        """后台线程：读取会话流并写出通知，流关闭时退出"""
+        stream = self.stream
+        while True:
+            event = stream.get(timeout=30)
+            if event is None:
+                if stream.closed:
+                    return
+                continue
+            try:
+                self._forward(event)
+            except Exception as e:
+                logger.error(f"写出MCP通知失败: {str(e)}")
+                return
+
+    def serve(self):
+        """处理请求直到输入结束"""
+        self.stream = self.mcp.create_stream(self.session_id)
+        pump = threading.Thread(target=self._pump, name="mcp-stdio-notify", daemon=True)
+        pump.start()
+        logger.info(f"MCP stdio会话已启动: {self.session_id}")
+        try:
+            for line in self.reader:
+                try:
+                    response = self.handle_line(line)
+                except Exception as e:
+                    logger.error(f"处理MCP stdio请求时出错: {str(e)}")
+                    response = {"jsonrpc": "2.0", "id": None,
+                                "error": {"code": -32603, "message": "Internal error", "data": str(e)}}
+                if response is not None:
+                    self.send(response)
+        finally:
+            self.mcp.close_stream(self.session_id, self.stream)
+            self.mcp.drop_session(self.session_id)
+            pump.join(timeout=1)
+            logger.info(f"MCP stdio会话已结束: {self.session_id}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MCP stdio服务（换行分隔的JSON-RPC 2.0）")
+    parser.add_argument('--preload', action='append', default=[], help='启动时加载的模型（可重复，仅进程内推理）')
+    parser.add_argument('--workers', action='store_true', help='在推理工作进程中执行分离（INFERENCE_MODE=process）')
+    args = parser.parse_args(argv)
+
+    # 标准输出只写协议消息：保留一个副本给协议使用，fd 1 重定向到标准错误，
+    # 第三方库和子进程（ffmpeg）的输出不会混入协议流
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8', buffering=1)
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    from app import create_app
+    from app.config import get_config
+    from app.services.inference_pool import InProcessInference
+
+    app = create_app(get_config())
+
+    if not args.workers and not isinstance(app.inference_pool, InProcessInference):
+        # 在本进程内推理，模型加载后常驻，会话内的后续任务直接复用
+        app.inference_pool.shutdown()
+        app.inference_pool = InProcessInference(app.audio_separator)
+    for model_name in args.preload if not args.workers else ():
+        logger.info(f"预加载模型: {model_name}")
+        app.audio_separator.preload(model_name)
+
+    reader = open(sys.stdin.fileno(), 'r', encoding='utf-8', closefd=False)
+    StdioSession(app, reader, protocol_out).serve()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
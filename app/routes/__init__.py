@@ -9,5 +9,4 @@ def init_app(app):
     api.init_app(app)
     
     # Register MCP routes
-    app.register_blueprint(mcp.mcp_bp)
-    app.logger.info("Standard MCP routes initialized") 
\ No newline at end of file
+    mcp.init_app(app)
@@ -14,6 +14,9 @@ from pathlib import Path
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# 汇总中的状态计数需要关联所有任务的记录，翻页时复用这段时间内的结果（秒）
+STATUS_COUNTS_MAX_AGE = 5
+
 def admin_required(f):
     """管理员权限验证装饰器"""
     @wraps(f)
@@ -60,227 +63,128 @@ def dashboard():
 @admin_bp.route('/api/files')
 @admin_required
 def get_files():
-    """获取文件列表API - 按任务分组（优化版本）"""
+    """获取文件列表API - 按任务分组，从文件索引分页查询（不扫描目录）"""
     try:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        output_folder = current_app.config['OUTPUT_FOLDER']
         file_retention_minutes = current_app.config['FILE_RETENTION_MINUTES']
-        
-        # 确保目录存在
-        os.makedirs(upload_folder, exist_ok=True)
-        os.makedirs(output_folder, exist_ok=True)
-        
+        index = current_app.file_manager.index
         current_time = time.time()
-        tasks = {}  # 按任务ID分组
-        orphaned_files = []  # 无法识别任务的文件
-        total_size = 0
-        old_files_count = 0
-        
-        # 限制扫描的配置参数
-        MAX_SCAN_DEPTH = 3  # 最大扫描深度
-        MAX_FILES_PER_DIR = 1000  # 每个目录最大文件数
-        MAX_TOTAL_FILES = 5000  # 总文件扫描上限
-        SKIP_LARGE_DIRS = True  # 跳过大目录
-        
-        # 需要跳过的目录名（性能优化）
-        SKIP_DIRS = {
-            '__pycache__', '.git', '.svn', '.hg', 'node_modules', 
-            '.venv', 'venv', '.env', 'temp', 'tmp', 'cache',
-            '.DS_Store', 'Thumbs.db', 'logs', 'backup'
-        }
-        
-        scanned_files = 0
-        
-        def should_skip_dir(dir_name, dir_path):
-            """检查是否应该跳过目录"""
-            if dir_name in SKIP_DIRS:
-                return True
-            
-            # 如果开启了跳过大目录选项
-            if SKIP_LARGE_DIRS:
-                try:
-                    # 快速检查目录大小（通过列表长度估算）
-                    entries = os.listdir(dir_path)
-                    if len(entries) > MAX_FILES_PER_DIR:
-                        current_app.logger.warning(f"跳过大目录: {dir_path} (包含 {len(entries)} 个条目)")
-                        return True
-                except (OSError, PermissionError):
-                    return True
-            
-            return False
-        
-        def scan_directory(base_path, max_depth=MAX_SCAN_DEPTH):
-            """优化的目录扫描函数"""
-            nonlocal scanned_files, total_size, old_files_count
-            
-            if scanned_files >= MAX_TOTAL_FILES:
-                current_app.logger.warning(f"达到文件扫描上限 ({MAX_TOTAL_FILES})，停止扫描")
-                return
-            
-            try:
-                for root, dirs, files in os.walk(base_path):
-                    # 计算当前深度
-                    depth = root[len(base_path):].count(os.sep)
-                    if depth >= max_depth:
-                        dirs[:] = []  # 不再深入扫描
-                        continue
-                    
-                    # 过滤需要跳过的目录
-                    dirs[:] = [d for d in dirs if not should_skip_dir(d, os.path.join(root, d))]
-                    
-                    # 限制每个目录的文件数量
-                    if len(files) > MAX_FILES_PER_DIR:
-                        current_app.logger.warning(f"目录 {root} 包含过多文件 ({len(files)})，只扫描前 {MAX_FILES_PER_DIR} 个")
-                        files = files[:MAX_FILES_PER_DIR]
-                    
-                    for file in files:
-                        if scanned_files >= MAX_TOTAL_FILES:
-                            break
-                        
-                        file_path = os.path.join(root, file)
-                        try:
-                            stat = os.stat(file_path)
-                            modified_time = stat.st_mtime
-                            size = stat.st_size
-                            total_size += size
-                            scanned_files += 1
-                            
-                            # 判断是否过期
-                            is_old = (current_time - modified_time) > (file_retention_minutes * 60)
-                            if is_old:
-                                old_files_count += 1
-                            
-                            file_info = {
-                                'name': file,
-                                'path': file_path,
-                                'size': size,
-                                'modified_time': modified_time,
-                                'is_old': is_old,
-                                'type': 'input' if base_path == upload_folder else 'output'
-                            }
-                            
-                            # 任务ID提取逻辑
-                            task_id = extract_task_id_from_file(file, root, base_path)
-                            
-                            if task_id:
-                                if task_id not in tasks:
-                                    tasks[task_id] = {
-                                        'task_id': task_id,
-                                        'created_time': modified_time,
-                                        'input_files': [],
-                                        'output_files': [],
-                                        'total_size': 0,
-                                        'is_old': is_old,
-                                        'status': 'unknown'
-                                    }
-                                
-                                if file_info['type'] == 'input':
-                                    tasks[task_id]['input_files'].append(file_info)
-                                else:
-                                    tasks[task_id]['output_files'].append(file_info)
-                                
-                                tasks[task_id]['total_size'] += size
-                                tasks[task_id]['created_time'] = min(tasks[task_id]['created_time'], modified_time)
-                            else:
-                                orphaned_files.append(file_info)
-                                
-                        except (OSError, PermissionError) as e:
-                            current_app.logger.debug(f"无法访问文件 {file_path}: {e}")
-                            continue
-                    
-                    if scanned_files >= MAX_TOTAL_FILES:
-                        break
-                        
-            except (OSError, PermissionError) as e:
-                current_app.logger.error(f"无法扫描目录 {base_path}: {e}")
-        
-        def extract_task_id_from_file(filename, root_dir, base_path):
-            """从文件名或路径提取任务ID"""
-            # 方法1: 从文件名提取 (格式: name_taskid.ext 或 name_stem.ext)
-            if '_' in filename and '.' in filename:
-                name_part = os.path.splitext(filename)[0]
-                if '_' in name_part:
-                    task_id = name_part.split('_')[-1]
-                    if len(task_id) >= 6:  # 任务ID通常比较长
-                        return task_id
-            
-            # 方法2: 从目录名提取
-            dir_name = os.path.basename(root_dir)
-            if dir_name != os.path.basename(base_path) and len(dir_name) >= 6:
-                # 检查是否看起来像UUID或任务ID
-                if any(c.isalnum() for c in dir_name) and not dir_name.isdigit():
-                    return dir_name
-            
-            return None
-        
-        current_app.logger.info(f"开始扫描文件系统，最大深度: {MAX_SCAN_DEPTH}，最大文件数: {MAX_TOTAL_FILES}")
+        old_before = current_time - file_retention_minutes * 60
         start_time = time.time()
         
-        # 并发扫描上传和输出目录
-        scan_directory(upload_folder)
-        scan_directory(output_folder)
-        
-        scan_duration = time.time() - start_time
-        current_app.logger.info(f"文件扫描完成，耗时: {scan_duration:.2f}秒，扫描文件数: {scanned_files}")
+        # 分页和排序参数
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 500)
+        sort = request.args.get('sort', 'latest_time')
+        descending = request.args.get('order', 'desc') != 'asc'
+        
+        # 过滤参数：任务ID前缀、状态、文件类型、大小（字节）、年龄（分钟）
+        status = request.args.get('status') or None
+        if status in ('all', 'old'):
+            status = None
+        elif status == 'failed':
+            status = 'error'
+        updated_before = None
+        updated_after = None
+        if request.args.get('old') in ('1', 'true') or request.args.get('status') == 'old':
+            updated_before = old_before
+        older_than = request.args.get('older_than_minutes', type=float)
+        if older_than is not None:
+            updated_before = min(updated_before or current_time, current_time - older_than * 60)
+        newer_than = request.args.get('newer_than_minutes', type=float)
+        if newer_than is not None:
+            updated_after = current_time - newer_than * 60
+        
+        rows, total = index.query_jobs(
+            task=request.args.get('task') or None,
+            status=status,
+            file_type=request.args.get('type') or None,
+            min_size=request.args.get('min_size', type=int),
+            max_size=request.args.get('max_size', type=int),
+            updated_before=updated_before,
+            updated_after=updated_after,
+            sort=sort,
+            descending=descending,
+            limit=per_page,
+            offset=(page - 1) * per_page
+        )
         
-        # 处理任务状态和排序
+        # 只读取当前页任务的文件和记录，文件大小和时间来自索引
+        job_ids = [row['job_id'] for row in rows]
+        files_by_job = index.files_of(job_ids)
+        job_records = current_app.job_store.get_many(job_ids)
         task_list = []
-        for task_id, task_info in tasks.items():
-            # 确定任务状态
-            if task_info['output_files']:
-                task_info['status'] = 'completed'
-            elif task_info['input_files']:
-                task_info['status'] = 'processing'
-            else:
-                task_info['status'] = 'unknown'
-                
-            # 确定任务是否过期（基于最新文件时间）
-            latest_time = task_info['created_time']
-            for f in task_info['input_files'] + task_info['output_files']:
-                latest_time = max(latest_time, f['modified_time'])
-            
-            task_info['is_old'] = (current_time - latest_time) > (file_retention_minutes * 60)
-            task_info['latest_time'] = latest_time
-            
+        for row in rows:
+            task_id = row['job_id']
+            is_old = row['updated_at'] < old_before
+            task_info = {
+                'task_id': task_id,
+                'created_time': row['created_at'],
+                'latest_time': row['updated_at'],
+                'input_files': [],
+                'output_files': [],
+                'total_size': row['total_bytes'],
+                'input_size': row['input_bytes'],
+                'output_size': row['output_bytes'],
+                'is_old': is_old,
+                'status': row['status']
+            }
+            for indexed in files_by_job[task_id]:
+                file_type = 'input' if indexed['kind'] == 'upload' else 'output'
+                task_info[f'{file_type}_files'].append({
+                    'name': os.path.basename(indexed['path']),
+                    'path': indexed['path'],
+                    'size': indexed['size'],
+                    'modified_time': indexed['created_at'],
+                    'is_old': is_old,
+                    'type': file_type
+                })
+            record = job_records.get(task_id)
+            if record:
+                task_info['progress'] = record.get('progress', 0)
+                task_info['message'] = record.get('message')
             task_list.append(task_info)
         
-        # 排序：按最新时间排序，限制返回数量
-        MAX_RETURN_TASKS = 500  # 限制返回的任务数
-        MAX_RETURN_ORPHANED = 200  # 限制返回的孤立文件数
-        
-        task_list.sort(key=lambda x: x['latest_time'], reverse=True)
-        orphaned_files.sort(key=lambda x: x['modified_time'], reverse=True)
-        
-        # 如果数据过多，进行截断并提示
-        tasks_truncated = len(task_list) > MAX_RETURN_TASKS
-        orphaned_truncated = len(orphaned_files) > MAX_RETURN_ORPHANED
-        
-        if tasks_truncated:
-            task_list = task_list[:MAX_RETURN_TASKS]
-        if orphaned_truncated:
-            orphaned_files = orphaned_files[:MAX_RETURN_ORPHANED]
+        usage = index.usage(old_before=old_before)
+        status_counts = index.status_counts(max_age=STATUS_COUNTS_MAX_AGE)
+        query_duration = time.time() - start_time
         
         summary = {
-            'total_tasks': len(task_list),
-            'completed_tasks': len([t for t in task_list if t['status'] == 'completed']),
-            'processing_tasks': len([t for t in task_list if t['status'] == 'processing']),
-            'old_tasks': len([t for t in task_list if t['is_old']]),
-            'total_size': total_size,
-            'orphaned_files_count': len(orphaned_files),
-            'old_files_count': old_files_count,
-            'scan_duration': scan_duration,
-            'scanned_files': scanned_files,
-            'scan_limited': scanned_files >= MAX_TOTAL_FILES,
-            'tasks_truncated': tasks_truncated,
-            'orphaned_truncated': orphaned_truncated
+            'total_tasks': usage['tasks'],
+            'completed_tasks': status_counts.get('completed', 0),
+            'processing_tasks': sum(n for s, n in status_counts.items() if s not in ('completed', 'error')),
+            'failed_tasks': status_counts.get('error', 0),
+            'old_tasks': usage['old_tasks'],
+            'total_size': usage['total_bytes'],
+            'orphaned_files_count': 0,
+            'old_files_count': usage['old_tasks'],
+            'scan_duration': query_duration,
+            'scanned_files': usage['files'],
+            'scan_limited': False,
+            'tasks_truncated': total > page * per_page,
+            'orphaned_truncated': False
         }
         
         return jsonify({
             'status': 'success',
             'data': {
                 'tasks': task_list,
-                'orphaned_files': orphaned_files,
-                'summary': summary
+                # 所有文件都通过FileManager登记，索引中没有孤立文件
+                'orphaned_files': [],
+                'summary': summary,
+                'usage': {
+                    'total_bytes': usage['total_bytes'],
+                    'input_bytes': usage['input_bytes'],
+                    'output_bytes': usage['output_bytes'],
+                    'old_bytes': usage['old_bytes'],
+                    'files': usage['files'],
+                    'tasks': usage['tasks']
+                },
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'pages': (total + per_page - 1) // per_page
+                }
             }
         })
         
@@ -294,56 +198,40 @@ def get_files():
 @admin_bp.route('/api/cleanup/old', methods=['POST'])
 @admin_required
 def cleanup_old_files():
-    """清理过期文件API"""
+    """清理过期文件API - 按文件索引删除最后更新时间超过保留期的任务"""
     try:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        output_folder = current_app.config['OUTPUT_FOLDER']
         file_retention_minutes = current_app.config['FILE_RETENTION_MINUTES']
+        file_manager = current_app.file_manager
+        cutoff = time.time() - file_retention_minutes * 60
         
-        current_time = time.time()
+        # 排队或处理中的任务（与janitor相同的判断）不删除，跳过的任务留在结果的前面
+        is_active = current_app.janitor.is_active or (lambda job_id: False)
         deleted_count = 0
-        
-        # 清理上传文件夹中的过期文件
-        for root, dirs, files in os.walk(upload_folder):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    modified_time = os.path.getmtime(file_path)
-                    if (current_time - modified_time) > (file_retention_minutes * 60):
-                        os.remove(file_path)
-                        deleted_count += 1
-                        current_app.logger.info(f"删除过期上传文件: {file_path}")
-                except OSError as e:
-                    current_app.logger.error(f"删除文件失败 {file_path}: {e}")
-        
-        # 清理输出文件夹中的过期文件
-        for root, dirs, files in os.walk(output_folder):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    modified_time = os.path.getmtime(file_path)
-                    if (current_time - modified_time) > (file_retention_minutes * 60):
-                        os.remove(file_path)
-                        deleted_count += 1
-                        current_app.logger.info(f"删除过期输出文件: {file_path}")
-                except OSError as e:
-                    current_app.logger.error(f"删除文件失败 {file_path}: {e}")
-        
-        # 清理空目录
-        for folder in [upload_folder, output_folder]:
-            for root, dirs, files in os.walk(folder, topdown=False):
-                for dir_name in dirs:
-                    dir_path = os.path.join(root, dir_name)
-                    try:
-                        if not os.listdir(dir_path):  # 空目录
-                            os.rmdir(dir_path)
-                            current_app.logger.info(f"删除空目录: {dir_path}")
-                    except OSError:
-                        pass
-        
+        skipped = 0
+        while True:
+            rows, _ = file_manager.index.query_jobs(updated_before=cutoff, sort='latest_time',
+                                                    descending=False, limit=200, offset=skipped)
+            if not rows:
+                break
+            for row in rows:
+                task_id = row['job_id']
+                if is_active(task_id):
+                    skipped += 1
+                    continue
+                success, message = file_manager.cleanup_job_files(task_id)
+                if not success:
+                    # 文件已不存在或任务ID无效，仍然移除索引条目，避免重复处理
+                    file_manager.index.remove_job(task_id)
+                current_app.janitor.forget(task_id)
+                deleted_count += row['input_files'] + row['output_files']
+                current_app.logger.info(f"删除过期任务文件: {task_id}")
+        
+        message = f'成功清理 {deleted_count} 个过期文件'
+        if skipped:
+            message += f'，跳过 {skipped} 个排队或处理中的任务'
         return jsonify({
             'status': 'success',
-            'message': f'成功清理 {deleted_count} 个过期文件'
+            'message': message
         })
         
     except Exception as e:
@@ -393,6 +281,10 @@ def cleanup_all_files():
                 except OSError as e:
                     current_app.logger.error(f"删除失败 {item_path}: {e}")
         
+        current_app.file_manager.index.clear()
+        current_app.upload_manager.clear()
+        current_app.janitor.clear()
+        
         return jsonify({
             'status': 'success',
             'message': f'成功清理 {deleted_count} 个文件/目录'
@@ -441,6 +333,7 @@ def delete_file():
             os.remove(file_path)
         elif os.path.isdir(file_path):
             shutil.rmtree(file_path)
+        current_app.file_manager.index.remove_path(file_path_abs)
         
         current_app.logger.info(f"管理员删除文件: {file_path}")
         
@@ -461,8 +354,6 @@ def delete_file():
 def get_task_details(task_id):
     """获取任务详情API"""
     try:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        output_folder = current_app.config['OUTPUT_FOLDER']
         file_retention_minutes = current_app.config['FILE_RETENTION_MINUTES']
         
         current_time = time.time()
@@ -477,56 +368,39 @@ def get_task_details(task_id):
             'is_old': False
         }
         
-        # 扫描输入文件
-        if os.path.exists(upload_folder):
-            for root, dirs, files in os.walk(upload_folder):
-                for file in files:
-                    if task_id in file or task_id in root:
-                        file_path = os.path.join(root, file)
-                        try:
-                            stat = os.stat(file_path)
-                            file_info = {
-                                'name': file,
-                                'path': file_path,
-                                'size': stat.st_size,
-                                'modified_time': stat.st_mtime,
-                                'type': 'input'
-                            }
-                            task_info['input_files'].append(file_info)
-                            task_info['total_size'] += stat.st_size
-                            
-                            if task_info['created_time'] is None or stat.st_mtime < task_info['created_time']:
-                                task_info['created_time'] = stat.st_mtime
-                            if task_info['latest_time'] is None or stat.st_mtime > task_info['latest_time']:
-                                task_info['latest_time'] = stat.st_mtime
-                        except OSError:
-                            continue
-        
-        # 扫描输出文件
-        if os.path.exists(output_folder):
-            for root, dirs, files in os.walk(output_folder):
-                for file in files:
-                    if task_id in file or task_id in root:
-                        file_path = os.path.join(root, file)
-                        try:
-                            stat = os.stat(file_path)
-                            file_info = {
-                                'name': file,
-                                'path': file_path,
-                                'size': stat.st_size,
-                                'modified_time': stat.st_mtime,
-                                'type': 'output'
-                            }
-                            task_info['output_files'].append(file_info)
-                            task_info['total_size'] += stat.st_size
-                            
-                            if task_info['latest_time'] is None or stat.st_mtime > task_info['latest_time']:
-                                task_info['latest_time'] = stat.st_mtime
-                        except OSError:
-                            continue
+        # 从文件索引获取任务文件，无需扫描上传和输出目录
+        for indexed in current_app.file_manager.get_job_files(task_id):
+            if indexed['kind'] == 'output_dir':
+                continue  # 音轨文件单独登记
+            try:
+                stat = os.stat(indexed['path'])
+            except OSError:
+                continue
+            file_type = 'input' if indexed['kind'] == 'upload' else 'output'
+            task_info[f'{file_type}_files'].append({
+                'name': os.path.basename(indexed['path']),
+                'path': indexed['path'],
+                'size': stat.st_size,
+                'modified_time': stat.st_mtime,
+                'type': file_type
+            })
+            task_info['total_size'] += stat.st_size
+            
+            if file_type == 'input' and (task_info['created_time'] is None or stat.st_mtime < task_info['created_time']):
+                task_info['created_time'] = stat.st_mtime
+            if task_info['latest_time'] is None or stat.st_mtime > task_info['latest_time']:
+                task_info['latest_time'] = stat.st_mtime
         
         # 设置任务状态
-        if task_info['output_files']:
+        record = current_app.job_store.get(task_id)
+        if record:
+            task_info['status'] = record.get('status', 'unknown')
+            task_info['progress'] = record.get('progress', 0)
+            task_info['message'] = record.get('message')
+            task_info['job'] = record
+            if task_info['created_time'] is None:
+                task_info['created_time'] = record.get('created_at') or record.get('started_at')
+        elif task_info['output_files']:
             task_info['status'] = 'completed'
         elif task_info['input_files']:
             task_info['status'] = 'processing'
@@ -620,49 +494,18 @@ def delete_task():
             }), 400
         
         task_id = data['task_id']
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        output_folder = current_app.config['OUTPUT_FOLDER']
         
-        deleted_files = []
-        deleted_count = 0
+        # 根据文件索引删除任务的上传文件、输出目录（含音轨）和ZIP
+        deleted_files = [indexed['path'] for indexed in current_app.file_manager.get_job_files(task_id)
+                         if indexed['kind'] != 'stem' and os.path.exists(indexed['path'])]
+        current_app.file_manager.cleanup_job_files(task_id)
+        deleted_count = len(deleted_files)
+        for path in deleted_files:
+            current_app.logger.info(f"删除任务文件: {path}")
         
-        # 删除上传文件夹中相关的文件
-        for root, dirs, files in os.walk(upload_folder):
-            for file in files:
-                if task_id in file:  # 文件名包含任务ID
-                    file_path = os.path.join(root, file)
-                    try:
-                        os.remove(file_path)
-                        deleted_files.append(file_path)
-                        deleted_count += 1
-                        current_app.logger.info(f"删除任务文件: {file_path}")
-                    except OSError as e:
-                        current_app.logger.error(f"删除文件失败 {file_path}: {e}")
-        
-        # 删除输出文件夹中相关的文件和目录
-        for root, dirs, files in os.walk(output_folder):
-            # 检查是否是任务目录
-            if task_id in os.path.basename(root):
-                try:
-                    shutil.rmtree(root)
-                    deleted_files.append(root)
-                    deleted_count += 1
-                    current_app.logger.info(f"删除任务目录: {root}")
-                    break  # 避免继续遍历已删除的目录
-                except OSError as e:
-                    current_app.logger.error(f"删除目录失败 {root}: {e}")
-            else:
-                # 检查文件名是否包含任务ID
-                for file in files:
-                    if task_id in file:
-                        file_path = os.path.join(root, file)
-                        try:
-                            os.remove(file_path)
-                            deleted_files.append(file_path)
-                            deleted_count += 1
-                            current_app.logger.info(f"删除任务文件: {file_path}")
-                        except OSError as e:
-                            current_app.logger.error(f"删除文件失败 {file_path}: {e}")
+        # 删除任务记录
+        current_app.job_store.delete(task_id)
+        current_app.janitor.forget(task_id)
         
         return jsonify({
             'status': 'success',
@@ -677,6 +520,103 @@ def delete_task():
             'message': f'删除任务失败: {str(e)}'
         }), 500
 
+@admin_bp.route('/api/workers', methods=['GET'])
+@admin_required
+def get_workers():
+    """获取推理进程池和任务队列状态API"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'pool': current_app.inference_pool.stats(),
+                'scheduler': current_app.job_scheduler.stats()
+            }
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取推理进程状态失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取推理进程状态失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/api/workers/restart', methods=['POST'])
+@admin_required
+def restart_workers():
+    """重启推理工作进程API（正在处理的进程在当前任务完成后重启）"""
+    try:
+        current_app.inference_pool.restart()
+        current_app.logger.info("管理员重启推理工作进程")
+        return jsonify({
+            'status': 'success',
+            'message': '推理工作进程已安排重启'
+        })
+    except Exception as e:
+        current_app.logger.error(f"重启推理进程失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'重启推理进程失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/api/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """获取结果缓存命中统计API"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': current_app.result_cache.stats()
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取缓存统计失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取缓存统计失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/api/janitor', methods=['GET'])
+@admin_required
+def get_janitor_stats():
+    """获取过期任务自动回收统计API"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': current_app.janitor.stats()
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取回收统计失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取回收统计失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/api/jobs', methods=['GET'])
+@admin_required
+def get_jobs():
+    """任务列表API - 直接查询任务存储（按状态过滤、分页），包括其他工作进程的任务"""
+    try:
+        status = request.args.get('status') or None
+        source = request.args.get('source') or None
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        job_store = current_app.job_store
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'jobs': job_store.list(status=status, source=source, limit=limit, offset=offset),
+                'counts': job_store.count_by_status(),
+                'total': job_store.count(status=status, source=source),
+                'limit': limit,
+                'offset': offset
+            }
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取任务列表失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取任务列表失败: {str(e)}'
+        }), 500
+
 @admin_bp.route('/api/status')
 def api_status():
     """检查管理员认证状态"""
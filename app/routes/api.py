@@ -1,5 +1,4 @@
 import os
-import threading
 import logging
 from flask import Blueprint, request, current_app
 
@@ -9,9 +8,14 @@ from app.utils.helpers import (
     generate_job_id,
     create_success_response, 
     create_error_response, 
-    create_file_response
+    create_file_response,
+    create_zip_stream_response,
+    create_stem_file_response
 )
 from app.utils.sse import SSEManager, create_sse_response
+from app.services.job_scheduler import QueueFullError
+from app.services.job_submitter import JobSubmitter
+from app.services.upload_manager import UploadError
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +29,14 @@ sse_manager = SSEManager()
 def list_models():
     """Get list of available demucs models"""
     try:
-        # 避免立即初始化AudioSeparator，返回静态的模型列表以提高响应速度
-        # 可用的模型列表基于demucs库的标准模型
-        available_models = ["htdemucs", "htdemucs_ft", "htdemucs_6s", "mdx", "mdx_q"]
+        # 模型按需加载，列出模型不会触发加载
+        model_stats = current_app.inference_pool.get_model_stats()
+        loaded = sorted({name for stats in model_stats.values() for name in stats.get('resident_models', [])})
         return create_success_response({
-            'models': available_models,
-            'default': current_app.config['DEFAULT_MODEL']
+            'models': current_app.audio_separator.get_available_models(),
+            'default': current_app.config['DEFAULT_MODEL'],
+            'loaded': loaded,
+            'cache': model_stats
         })
     except Exception as e:
         logger.error(f"Error fetching models: {str(e)}")
@@ -70,19 +76,25 @@ def process_audio():
     """
     Start audio separation process
     Returns a job ID that can be used to track progress and download results
+    
+    The audio is either a multipart 'file'/'audio' field or the 'upload_id'
+    of a finalized resumable upload (see /api/uploads).
     """
+    # 分块上传完成后只需传入upload_id，文件已在上传目录中
+    upload_id = request.form.get('upload_id')
+    
     # Validate request - check for either 'file' or 'audio' field
     has_file = 'file' in request.files
     has_audio = 'audio' in request.files
     
-    if not has_file and not has_audio:
+    if not has_file and not has_audio and not upload_id:
         return create_error_response("No file provided")
     
     # Get uploaded file from either 'file' or 'audio' field
     file = request.files.get('file') or request.files.get('audio')
     
     # Check if file type is allowed
-    if not file or not allowed_file(file.filename):
+    if not upload_id and (not file or not allowed_file(file.filename)):
         return create_error_response("Invalid file format. Supported formats: mp3, wav, flac, ogg, m4a, mp4")
     
     try:
@@ -93,11 +105,10 @@ def process_audio():
         audio_quality = request.form.get('audio_quality', current_app.config['DEFAULT_AUDIO_QUALITY'])
         
         # Validate format and quality
-        if output_format not in current_app.config['SUPPORTED_OUTPUT_FORMATS']:
-            return create_error_response(f"不支持的输出格式: {output_format}。支持的格式: {current_app.config['SUPPORTED_OUTPUT_FORMATS']}")
-        
-        if audio_quality not in current_app.config['AUDIO_QUALITY_SETTINGS']:
-            return create_error_response(f"不支持的音频质量: {audio_quality}。支持的质量: {list(current_app.config['AUDIO_QUALITY_SETTINGS'].keys())}")
+        try:
+            current_app.job_submitter.validate(output_format, audio_quality)
+        except ValueError as e:
+            return create_error_response(str(e))
         
         # Parse stems if provided
         stems = None
@@ -107,76 +118,69 @@ def process_audio():
         # Generate job ID
         job_id = generate_job_id()
         
-        # Create job output directory
-        job_output_dir = current_app.file_manager.create_job_output_directory(job_id)
-        
-        # Save uploaded file
-        filename, file_path = current_app.file_manager.save_uploaded_file(file)
-        
-        logger.info(f"Starting audio separation process for job: {job_id}, format: {output_format}, quality: {audio_quality}")
-        
-        # Register task in SSE manager
-        sse_manager.create_task(job_id)
-        
-        # 创建应用上下文副本以在线程中使用
-        app = current_app._get_current_object()
-        
-        # Define progress callback for SSE
-        def progress_callback(progress, message="处理中", status="processing"):
-            # 更新传统SSE进度
-            sse_manager.update_progress(job_id, progress=progress, message=message, status=status)
-        
-        # Start processing thread
-        def process_thread():
+        on_rejected = None
+        if upload_id:
+            # 队列已满时不占用上传：上传保持可用，按Retry-After重试
+            try:
+                current_app.job_scheduler.check_capacity()
+            except QueueFullError as e:
+                return _queue_full_response(current_app.job_scheduler.stats(), e.retry_after)
+            # 使用已完成的分块上传：不复制文件，哈希已在写入时计算
             try:
-                # Start demucs process with new format and quality parameters
-                result = app.audio_separator.separate_track(
-                    input_file=file_path,
-                    output_dir=job_output_dir,
-                    model_name=model_name,
-                    stems=stems,
-                    output_format=output_format,
-                    audio_quality=audio_quality,
-                    progress_callback=progress_callback
-                )
-                
-                if result and result.get('files'):
-                    # Extract file paths from result
-                    output_paths = [file_info['path'] for file_info in result['files']]
-                    
-                    # Create a zip file from the output
-                    zip_path = app.file_manager.create_zip_from_output(job_id, output_paths)
-                    
-                    # 设置结果文件路径 - 这是关键的修复
-                    progress_callback(100, f"音频分离完成，格式: {output_format.upper()}，质量: {audio_quality}", "completed")
-                    sse_manager.update_progress(job_id, progress=100, 
-                                             message=f"音频分离完成，格式: {output_format.upper()}，质量: {audio_quality}", 
-                                             status="completed", result_file=zip_path)
-                    
-                    logger.info(f"Audio separation completed for job: {job_id}, format: {output_format}, quality: {audio_quality}")
-                else:
-                    # If no output paths were returned, the separation failed
-                    progress_callback(0, "处理失败", "error")
-                    logger.error(f"Audio separation failed for job: {job_id}")
+                upload = current_app.upload_manager.consume(upload_id, job_id)
+            except UploadError as e:
+                return create_error_response(str(e), status_code=e.status_code)
+            file_path, content_hash = upload['path'], upload['sha256']
             
-            except Exception as e:
-                logger.error(f"Error in audio separation thread: {str(e)}")
-                progress_callback(0, f"错误: {str(e)}", "error")
+            def on_rejected():
+                # 检查容量之后队列被占满：把上传交还给upload_id，文件不随任务删除
+                current_app.upload_manager.release(upload_id, job_id)
+        else:
+            # Save uploaded file
+            filename, file_path = current_app.file_manager.save_uploaded_file(file, job_id=job_id)
+            content_hash = None
+        
+        # 与MCP共用提交流程：结果缓存、排队、推理和进度
+        try:
+            submitted = current_app.job_submitter.submit(
+                job_id, file_path, model_name,
+                stems=stems,
+                output_format=output_format,
+                audio_quality=audio_quality,
+                content_hash=content_hash,
+                on_rejected=on_rejected
+            )
+        except QueueFullError as e:
+            return _queue_full_response(current_app.job_scheduler.stats(), e.retry_after)
         
-        # Start processing in a separate thread
-        thread = threading.Thread(target=process_thread)
-        thread.daemon = True
-        thread.start()
+        if upload_id:
+            # 上传文件随任务一起过期
+            current_app.janitor.forget(upload_id)
+        
+        job_id = submitted['job_id']
+        queue_info = submitted['queue_info']
         
         # Construct API URLs
-        base_url = current_app.config.get('BASE_URL', '')
         status_url = f"/api/status/{job_id}"
         progress_url = f"/api/progress/{job_id}"
         download_url = f"/api/download/{job_id}"
         
+        if submitted['cache_state'] != 'miss':
+            return create_success_response({
+                'job_id': job_id,
+                'message': 'Audio separation started',
+                'cached': submitted['cache_state'] == 'hit',
+                'deduplicated': submitted['cache_state'] == 'inflight',
+                'status_url': status_url,
+                'progress_url': progress_url,
+                'download_url': download_url
+            })
+        
         return create_success_response({
             'job_id': job_id,
             'message': 'Audio separation started',
+            'queue_position': queue_info.get('queue_position') if queue_info else 0,
+            'estimated_start_time': queue_info.get('estimated_start_time') if queue_info else None,
             'status_url': status_url,
             'progress_url': progress_url,
             'download_url': download_url
@@ -186,6 +190,101 @@ def process_audio():
         logger.error(f"Error starting separation process: {str(e)}")
         return create_error_response(f"Failed to start separation process: {str(e)}")
 
+@api_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Create a resumable upload
+    
+    The total size comes from the Upload-Length header or a 'size' field, the
+    name from a 'filename' field. Chunks are then sent with PATCH.
+    """
+    data = request.get_json(silent=True) or request.form
+    filename = data.get('filename', '')
+    length = request.headers.get('Upload-Length', data.get('size'))
+    
+    if not filename or not allowed_file(filename):
+        return create_error_response("Invalid file format. Supported formats: mp3, wav, flac, ogg, m4a, mp4")
+    try:
+        length = int(length)
+    except (TypeError, ValueError):
+        return create_error_response("Upload-Length header or size field is required")
+    
+    try:
+        upload = current_app.upload_manager.create(filename, length)
+    except UploadError as e:
+        return create_error_response(str(e), status_code=e.status_code)
+    
+    # 未完成的上传按保留期回收，每次写入后重新计时
+    current_app.janitor.track(upload['upload_id'], [upload['path']])
+    
+    upload_url = f"/api/uploads/{upload['upload_id']}"
+    response = create_success_response(_upload_info(upload))
+    response.status_code = 201
+    response.headers['Location'] = upload_url
+    response.headers['Upload-Offset'] = '0'
+    return response
+
+@api_bp.route('/uploads/<upload_id>', methods=['HEAD', 'GET'])
+def get_upload(upload_id):
+    """Current offset of an upload, for resuming after a dropped connection"""
+    upload = current_app.upload_manager.get(upload_id)
+    if not upload:
+        return create_error_response("Upload not found", status_code=404)
+    
+    response = create_success_response(_upload_info(upload))
+    response.headers['Upload-Offset'] = str(upload['offset'])
+    response.headers['Upload-Length'] = str(upload['length'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@api_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def write_upload(upload_id):
+    """
+    Append a chunk at the Upload-Offset header
+    
+    The raw request body is written straight into the upload file; on an
+    offset mismatch the response carries the current Upload-Offset.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return create_error_response("Upload-Offset header is required")
+    
+    try:
+        new_offset = current_app.upload_manager.write(upload_id, offset, request.stream)
+    except UploadError as e:
+        response, status_code = create_error_response(str(e), status_code=e.status_code)
+        if e.offset is not None:
+            response.headers['Upload-Offset'] = str(e.offset)
+        return response, status_code
+    
+    upload = current_app.upload_manager.get(upload_id)
+    current_app.janitor.track(upload_id)
+    response = create_success_response(_upload_info(upload))
+    response.headers['Upload-Offset'] = str(new_offset)
+    return response
+
+@api_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Complete an upload once every byte has been received; optionally verifies a client 'sha256'"""
+    data = request.get_json(silent=True) or request.form
+    try:
+        upload = current_app.upload_manager.finalize(upload_id, data.get('sha256'))
+    except UploadError as e:
+        response, status_code = create_error_response(str(e), status_code=e.status_code)
+        if e.offset is not None:
+            response.headers['Upload-Offset'] = str(e.offset)
+        return response, status_code
+    return create_success_response(_upload_info(upload))
+
+@api_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id):
+    """Abort an upload that has not started a job"""
+    if not current_app.upload_manager.delete(upload_id):
+        return create_error_response("Upload not found", status_code=404)
+    current_app.janitor.forget(upload_id)
+    return create_success_response({'message': 'Upload deleted'})
+
 @api_bp.route('/status/<job_id>', methods=['GET'])
 def get_status(job_id):
     """Get current status of a processing job"""
@@ -194,14 +293,30 @@ def get_status(job_id):
     if not progress:
         return create_error_response("Job not found", status_code=404)
     
+    # 附加排队信息（排队位置、预计开始时间）
+    queue_info = current_app.job_scheduler.get_job_info(job_id)
+    if queue_info:
+        progress.update(queue_info)
+    
     return create_success_response(progress)
 
 @api_bp.route('/progress/<job_id>', methods=['GET'])
 def get_progress(job_id):
     """Get progress updates using Server-Sent Events (SSE)"""
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    coalesce = current_app.config.get('SSE_COALESCE_SECONDS', 0.1)
+    
+    # 断线重连时浏览器通过Last-Event-ID头携带最后收到的事件ID，也支持查询参数
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
     def generate():
         # 直接返回生成器，而不是函数
-        yield from sse_manager.stream_progress(job_id)
+        yield from sse_manager.stream_progress(job_id, heartbeat=heartbeat, coalesce=coalesce,
+                                               last_event_id=last_event_id)
     
     return create_sse_response(generate())
 
@@ -221,6 +336,16 @@ def download_result(job_id):
                 status_code=400
             )
         
+        output_files = progress.get('output_files')
+        if output_files:
+            if not all(os.path.isfile(file_info['path']) for file_info in output_files):
+                return create_error_response("Result file not found", status_code=404)
+            # 边打包边发送，不在磁盘上生成ZIP
+            return create_zip_stream_response(
+                [(file_info['path'], file_info['name']) for file_info in output_files],
+                f"demucs_output_{job_id}.zip"
+            )
+        
         # Get result file path
         result_file = sse_manager.get_result_file(job_id)
         
@@ -234,16 +359,55 @@ def download_result(job_id):
         logger.error(f"Error downloading result: {str(e)}")
         return create_error_response(f"Failed to download result: {str(e)}")
 
+@api_bp.route('/download/<job_id>/<stem>', methods=['GET'])
+def download_stem(job_id, stem):
+    """Download a single stem of a completed job (supports Range and conditional requests)"""
+    try:
+        progress = sse_manager.get_progress(job_id)
+        
+        if not progress:
+            return create_error_response("Job not found", status_code=404)
+        
+        if progress['status'] != 'completed':
+            return create_error_response(
+                f"Job is not completed yet. Current status: {progress['status']}", 
+                status_code=400
+            )
+        
+        output_files = progress.get('output_files') or []
+        file_info = next((f for f in output_files if f['stem'] == stem), None)
+        if file_info is None:
+            available = ', '.join(f['stem'] for f in output_files)
+            return create_error_response(f"Stem not found: {stem}. Available stems: {available}", status_code=404)
+        
+        if not os.path.isfile(file_info['path']):
+            return create_error_response("Result file not found", status_code=404)
+        
+        return create_stem_file_response(file_info['path'], file_info['name'])
+        
+    except Exception as e:
+        logger.error(f"Error downloading stem: {str(e)}")
+        return create_error_response(f"Failed to download stem: {str(e)}")
+
 @api_bp.route('/cleanup/<job_id>', methods=['DELETE'])
 def cleanup_files(job_id):
     """清理特定任务的文件"""
     try:
+        # 复用同一结果的其他请求仍在使用：只释放本次请求，保留任务和文件
+        if current_app.result_cache.release(job_id):
+            return create_success_response({
+                'message': '其他请求仍在使用该任务的结果，文件已保留'
+            })
+        
         # 检查任务是否存在
         progress = sse_manager.get_progress(job_id)
         
         if progress:
-            # 从SSE管理器中移除任务
+            # 从队列和SSE管理器中移除任务
+            current_app.job_scheduler.cancel(job_id)
+            current_app.result_cache.invalidate_job(job_id)
             sse_manager.clean_task(job_id)
+        current_app.janitor.forget(job_id)
         
         # 清理任务相关的文件
         success, message = current_app.file_manager.cleanup_job_files(job_id)
@@ -269,9 +433,11 @@ def admin_cleanup():
         if not admin_token or admin_token != current_app.config['ADMIN_TOKEN']:
             return create_error_response("无效的管理员令牌", status_code=403)
         
-        # 清理所有SSE任务
-        task_count = len(sse_manager.tasks)
-        sse_manager.tasks.clear()
+        # 清理所有SSE任务和结果缓存
+        task_count = sse_manager.clear_tasks()
+        current_app.result_cache.clear()
+        current_app.upload_manager.clear()
+        current_app.janitor.clear()
         
         # 清理所有文件
         success, message, stats = current_app.file_manager.cleanup_all_files()
@@ -289,6 +455,42 @@ def admin_cleanup():
         logger.error(f"清理所有文件失败: {str(e)}")
         return create_error_response(f"清理所有文件失败: {str(e)}")
 
+def _queue_full_response(scheduler_stats, retry_after):
+    """Create a 429 response with a Retry-After header"""
+    response, status_code = create_error_response(
+        f"任务队列已满 ({scheduler_stats['queued']}/{scheduler_stats['max_queued']})，请稍后重试",
+        status_code=429
+    )
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status_code
+
+def _upload_info(upload):
+    """Public fields of an upload record"""
+    return {
+        'upload_id': upload['upload_id'],
+        'filename': upload['filename'],
+        'length': upload['length'],
+        'offset': upload['offset'],
+        'status': upload['status'],
+        'sha256': upload['sha256'],
+        'job_id': upload['job_id'],
+        'upload_url': f"/api/uploads/{upload['upload_id']}"
+    }
+
+def _is_job_active(job_id):
+    progress = sse_manager.get_progress(job_id)
+    return progress is not None and progress['status'] not in ('completed', 'error')
+
 def init_app(app):
+    sse_manager.history_size = app.config.get('SSE_HISTORY_SIZE', 32)
+    sse_manager.store_write_interval = app.config.get('SSE_STORE_WRITE_SECONDS', 1.0)
+    sse_manager.attach_store(app.job_store)
+    # API和MCP共用的任务提交服务
+    app.job_submitter = JobSubmitter(app, sse_manager)
+    
+    # 过期任务：删除任务记录和缓存条目；排队或处理中的任务推迟回收
+    app.janitor.add_evict_callback(sse_manager.clean_task)
+    app.janitor.add_evict_callback(app.result_cache.invalidate_job)
+    app.janitor.is_active = _is_job_active
     app.register_blueprint(api_bp)
     logger.info("API routes initialized") 
\ No newline at end of file
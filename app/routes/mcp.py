@@ -7,6 +7,8 @@ from flask import Blueprint, request, Response, jsonify, current_app
 import json
 import logging
 
+from app.services.mcp_server import is_notification
+
 logger = logging.getLogger(__name__)
 
 mcp_bp = Blueprint('mcp', __name__, url_prefix='/mcp')
@@ -18,10 +20,10 @@ def mcp_endpoint():
     所有MCP通信都通过此单一端点进行
     """
     try:
-        # 获取请求数据
-        request_data = request.json
+        # 获取请求数据（无法解析时为None）
+        request_data = request.get_json(silent=True)
         
-        if not request_data:
+        if request_data is None:
             return jsonify({
                 "jsonrpc": "2.0",
                 "id": None,
@@ -32,20 +34,30 @@ def mcp_endpoint():
                 }
             }), 400
         
-        # 处理批量请求
+        # 资源订阅的通知发送到该会话的流（/mcp/stream/<session_id>）
+        session_id = request.headers.get('Mcp-Session-Id')
+        
+        # 处理批量请求：并发执行，响应按请求顺序返回，通知不返回响应
         if isinstance(request_data, list):
-            responses = []
-            for req in request_data:
-                response = current_app.mcp_server.handle_jsonrpc_request(req)
-                if response:  # 过滤掉通知（无需响应）
-                    responses.append(response)
+            responses = current_app.mcp_server.handle_batch(request_data, session_id)
             return jsonify(responses) if responses else ('', 204)
         
+        if not isinstance(request_data, dict):
+            return jsonify({
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32600,
+                    "message": "Invalid Request",
+                    "data": "Request must be an object or an array"
+                }
+            }), 400
+        
         # 处理单个请求
-        response = current_app.mcp_server.handle_jsonrpc_request(request_data)
+        response = current_app.mcp_server.handle_jsonrpc_request(request_data, session_id)
         
         # 如果是通知（没有id），不返回响应
-        if request_data.get("id") is None:
+        if is_notification(request_data):
             return ('', 204)
         
         return jsonify(response)
@@ -126,7 +138,8 @@ def mcp_health():
             "server": current_app.mcp_server.name,
             "version": current_app.mcp_server.version,
             "active_streams": len(current_app.mcp_server.streams),
-            "active_jobs": len(current_app.mcp_server.jobs),
+            "streams": current_app.mcp_server.stream_stats(),
+            "active_jobs": current_app.mcp_server.active_job_count(),
             "endpoint": "/mcp"
         })
     except Exception as e:
@@ -224,4 +237,12 @@ def mcp_info():
         logger.error(f"获取MCP信息失败: {str(e)}")
         return jsonify({
             "error": str(e)
-        }), 500 
\ No newline at end of file
+        }), 500 
+
+def init_app(app):
+    # MCP工具通过API的任务提交服务执行真实的分离任务
+    app.mcp_server.attach_submitter(app.job_submitter)
+    # 任务过期时移除它的资源订阅
+    app.janitor.add_evict_callback(app.mcp_server.forget_job)
+    app.register_blueprint(mcp_bp)
+    app.logger.info("Standard MCP routes initialized")
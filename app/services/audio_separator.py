@@ -1,59 +1,72 @@
 import os
+import math
 import logging
 import uuid
 import time
 import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Optional, List, Tuple, Callable
+import numpy as np
 import torch
+import julius
 
 try:
     from demucs import pretrained
-    from demucs.apply import apply_model
-    from demucs.audio import AudioFile, save_audio
+    from demucs.apply import apply_model, BagOfModels
+    from demucs.audio import AudioFile, save_audio, prevent_clip, convert_audio_channels
 except ImportError as e:
     raise ImportError(f"Demucs library not found: {e}")
 
+from app.services.model_registry import ModelRegistry
+from app.services.long_audio import (
+    MIN_WINDOW_SECONDS, StreamingEncoder, WindowCrossfader,
+    decode_to_pcm_file, ffmpeg_codec_args, iter_windows, open_pcm_file, plan_windows
+)
+
 logger = logging.getLogger(__name__)
 
 class AudioSeparator:
     """Service for separating audio tracks using demucs models"""
     
+    # Sample rate of the pretrained demucs models; audio is decoded at this rate
+    MODEL_SAMPLERATE = 44100
+    
+    # apply_model parameters; part of the result cache key
+    INFERENCE_PARAMS = {'shifts': 1, 'split': True, 'overlap': 0.25}
+    
     def __init__(self, config):
         self.config = config
         self.device = None
-        self.models = {}
         self.models_loaded = False
+        self.model_registry = ModelRegistry(
+            loader=pretrained.get_model,
+            max_models=getattr(config, 'MODEL_CACHE_MAX_MODELS', 1),
+            max_bytes=getattr(config, 'MODEL_CACHE_MAX_BYTES', 0),
+            load_timeout=getattr(config, 'MODEL_LOAD_TIMEOUT', 600)
+        )
+        self._init_lock = threading.Lock()
+        # 音轨编码线程池，每个任务等待一个ffmpeg子进程
+        self.encoder_pool = ThreadPoolExecutor(
+            max_workers=max(1, getattr(config, 'ENCODER_WORKERS', 4)),
+            thread_name_prefix="stem-encoder"
+        )
         self.AudioFile = AudioFile
         self.save_audio = save_audio
     
+    @property
+    def models(self) -> Dict:
+        """Models currently resident in the model registry"""
+        return self.model_registry.loaded_models()
+    
     def initialize(self):
-        """Load models on demand"""
-        if not self.models_loaded:
-            try:
+        """Prepare the separator; models are loaded lazily by the registry"""
+        with self._init_lock:
+            if not self.models_loaded:
                 self.device = self._get_device()
                 logger.info(f"Using device: {self.device}")
-                
-                # 使用正确的API
-                self.models = {}
-                available_models = ["htdemucs", "htdemucs_ft", "htdemucs_6s", "mdx", "mdx_q"]
-                
-                for model_name in available_models:
-                    try:
-                        model = pretrained.get_model(model_name)
-                        self.models[model_name] = model
-                        logger.info(f"Successfully loaded model: {model_name}")
-                    except Exception as e:
-                        logger.warning(f"Failed to load model {model_name}: {e}")
-                
-                if not self.models:
-                    raise RuntimeError("No models could be loaded")
-                
                 self.models_loaded = True
-                logger.info(f"Loaded {len(self.models)} models")
-                
-            except Exception as e:
-                logger.error(f"Failed to initialize AudioSeparator: {e}")
-                raise
     
     def _get_device(self) -> str:
         """Determine the best available device for processing"""
@@ -61,78 +74,93 @@ class AudioSeparator:
             return "cuda"
         return "cpu"
     
+    def _resolve_model_names(self, model_name: str) -> List[str]:
+        """Expand a requested model name into the names to run"""
+        if model_name == "all":
+            return list(self.model_registry.known_models)
+        
+        if model_name in self.model_registry.known_models:
+            return [model_name]
+        
+        available_models = self.model_registry.known_models
+        logger.error(f"Model {model_name} not found. Available models: {available_models}")
+        raise ValueError(f"Model {model_name} not found. Available models: {available_models}")
+    
     def _get_model(self, model_name: str):
         """Get a specific demucs model"""
         self.initialize()
         
-        if model_name == "all":
-            return list(self.models.values())
-            
-        if model_name in self.models:
-            model = self.models[model_name]
-            # 确保返回的是列表，方便后续统一处理
-            return [model]
+        # 确保返回的是列表，方便后续统一处理
+        return [self.model_registry.get(name) for name in self._resolve_model_names(model_name)]
+    
+    def preload(self, model_name: str):
+        """Load a model into the registry ahead of the first job"""
+        self._get_model(model_name)
+    
+    def get_model_stats(self) -> Dict:
+        """Get model cache counters (loads, evictions, hits)"""
+        return self.model_registry.stats()
+    
+    def _count_segments(self, model, length, shifts, split, overlap) -> int:
+        """Number of forward passes apply_model will run for one (sub-)model"""
+        passes = max(1, shifts)
+        if not split:
+            return passes
         
-        available_models = list(self.models.keys())
-        logger.error(f"Model {model_name} not found. Available models: {available_models}")
-        raise ValueError(f"Model {model_name} not found. Available models: {available_models}")
+        segment_length = int(model.samplerate * float(model.segment))
+        stride = max(1, int((1 - overlap) * segment_length))
+        # shifts>0时apply_model会对输入补零最多0.5秒后再切分
+        padded_length = length + (int(0.5 * model.samplerate) if shifts else 0)
+        return passes * math.ceil(padded_length / stride)
     
     # 自定义apply_model包装函数，添加进度报告
     def _apply_model_with_progress(self, model, mix, shifts, split, overlap, progress, device, job_id, progress_callback, model_name, base_progress=10, max_progress=95):
-        """包装apply_model函数以添加进度报告"""
-        # 设置初始时间
-        start_time = time.time()
-        last_update_time = start_time
-        update_interval = 2.0  # 每2秒更新一次进度
-        
-        # 预计总处理时间（根据经验值）
-        estimated_total_time = 60 if self.device == "cuda" else 120
+        """
+        包装apply_model函数，按实际完成的分段数报告进度
         
-        # 计算进度范围
+        每个子模型的forward调用对应一个已完成的分段，进度、吞吐量（采样点/秒）
+        和剩余时间都由已完成分段数计算得出，不需要额外的轮询线程。
+        """
+        start_time = time.time()
+        length = mix.shape[-1]
         progress_range = max_progress - base_progress
         
-        def progress_reporter():
-            """定期报告进度"""
-            nonlocal last_update_time
-            current_time = time.time()
-            elapsed_time = current_time - start_time
-            
-            # 如果距离上次更新已经过了update_interval秒
-            if current_time - last_update_time >= update_interval:
-                # 计算估计进度百分比（基于经验的时间估计），范围从base_progress到max_progress
-                estimated_relative_progress = min(100, int((elapsed_time / estimated_total_time) * 100))
-                # 转换为全局进度值
-                estimated_progress = base_progress + (progress_range * estimated_relative_progress // 100)
-                
-                # 更新进度
-                if progress_callback:
-                    # 正确设置进度百分比，并使用更清晰的状态文本
-                    message = f"正在处理音频，使用模型: {model_name}"
-                    status = f"正在处理音频"
-                    progress_callback(estimated_progress, message, status)
-                
-                # 记录日志
-                logger.info(f"模型处理进度: {estimated_progress}%, 已用时间: {elapsed_time:.1f}秒")
-                
-                # 更新上次更新时间
-                last_update_time = current_time
-        
-        # 创建一个线程定期报告进度
-        import threading
-        stop_reporter = False
-        
-        def report_thread():
-            while not stop_reporter:
-                progress_reporter()
-                time.sleep(1)
+        # BagOfModels会对每个子模型分别调用apply_model
+        sub_models = list(model.models) if isinstance(model, BagOfModels) else [model]
+        segments_total = sum(self._count_segments(m, length, shifts, split, overlap) for m in sub_models)
+        state = {'done': 0, 'last_report': 0.0}
         
-        # 启动进度报告线程
-        reporter = threading.Thread(target=report_thread)
-        reporter.daemon = True
-        reporter.start()
+        def on_segment_done(module, inputs, output):
+            state['done'] = min(state['done'] + 1, segments_total)
+            now = time.time()
+            # 限制上报频率，最后一个分段总是上报
+            if now - state['last_report'] < 0.5 and state['done'] < segments_total:
+                return
+            state['last_report'] = now
+            
+            elapsed = now - start_time
+            fraction = state['done'] / segments_total
+            samples_per_second = fraction * length / elapsed if elapsed > 0 else 0.0
+            eta_seconds = elapsed * (segments_total - state['done']) / state['done']
+            current_progress = base_progress + int(progress_range * fraction)
+            
+            logger.info(f"模型处理进度: {state['done']}/{segments_total} 分段, "
+                        f"{samples_per_second:.0f} 采样点/秒, 剩余约 {eta_seconds:.1f}秒")
+            if progress_callback:
+                progress_callback(
+                    current_progress,
+                    f"正在处理音频，使用模型: {model_name} ({state['done']}/{segments_total})",
+                    "正在处理音频",
+                    {
+                        'segments_done': state['done'],
+                        'segments_total': segments_total,
+                        'samples_per_second': round(samples_per_second, 1),
+                        'eta_seconds': round(eta_seconds, 1)
+                    }
+                )
         
+        hooks = [m.register_forward_hook(on_segment_done) for m in sub_models]
         try:
-            # 执行原始apply_model函数 - 修复：使用demucs.apply.apply_model
             result = apply_model(
                 model=model, 
                 mix=mix,
@@ -142,32 +170,23 @@ class AudioSeparator:
                 progress=progress,
                 device=device
             )
-            
-            # 停止进度报告线程
-            stop_reporter = True
-            reporter.join(timeout=1.0)
-            
-            # 记录总处理时间
-            total_time = time.time() - start_time
-            logger.info(f"模型处理完成，总用时: {total_time:.1f}秒")
-            
-            # 报告完成进度
-            if progress_callback:
-                progress_callback(max_progress, f"模型处理完成，用时: {total_time:.1f}秒", "模型处理完成")
-            
-            return result
-            
         except Exception as e:
-            # 停止进度报告线程
-            stop_reporter = True
-            if reporter.is_alive():
-                reporter.join(timeout=1.0)
-                
-            # 记录错误
             logger.error(f"模型处理出错: {str(e)}")
-            
-            # 传递异常
             raise
+        finally:
+            for hook in hooks:
+                hook.remove()
+        
+        # 记录总处理时间
+        total_time = time.time() - start_time
+        logger.info(f"模型处理完成，总用时: {total_time:.1f}秒，"
+                    f"{length / total_time if total_time > 0 else 0:.0f} 采样点/秒")
+        
+        # 报告完成进度
+        if progress_callback:
+            progress_callback(max_progress, f"模型处理完成，用时: {total_time:.1f}秒", "模型处理完成")
+        
+        return result
     
     def separate_track(self, 
                        input_file: str, 
@@ -216,9 +235,14 @@ class AudioSeparator:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
+        # 已提交到编码线程池的音轨
+        encode_jobs = []
+        # 长音频模式下解码得到的原始PCM文件，按采样率索引
+        pcm_files = {}
+        
         try:
-            # Get model(s)
-            models = self._get_model(model_name)
+            # Resolve model names; models themselves are loaded lazily per iteration
+            model_names = self._resolve_model_names(model_name)
             
             # Report initial progress
             if progress_callback:
@@ -227,32 +251,45 @@ class AudioSeparator:
             # 记录加载开始时间
             load_start_time = time.time()
             
-            # Get quality settings for sample rate
+            # Get quality settings for sample rate - 输出采样率，推理始终在模型采样率下进行
             quality_settings = self.config.AUDIO_QUALITY_SETTINGS[audio_quality]
             actual_samplerate = quality_settings.get('sample_rate', self.config.SAMPLE_RATE)
             
-            # Load audio file with appropriate sample rate
-            wav = self.AudioFile(input_file).read(
-                streams=0,
-                samplerate=actual_samplerate,
-                channels=self.config.CHANNELS
-            )
+            # 长音频按窗口分离，峰值内存由窗口大小决定
+            long_plan = self._plan_long_file(input_file, job_id, len(stems))
+            
+            if long_plan:
+                # 解码为磁盘上的原始PCM，再按窗口内存映射读取
+                wav = None
+                pcm_path = self._decode_long_file(input_file, output_dir, self.MODEL_SAMPLERATE, pcm_files)
+                total_samples = len(open_pcm_file(pcm_path, long_plan['source_channels']))
+            else:
+                # Load audio file at the rate the models were trained on
+                wav = self.AudioFile(input_file).read(
+                    streams=0,
+                    samplerate=self.MODEL_SAMPLERATE,
+                    channels=self.config.CHANNELS
+                )
+                total_samples = wav.shape[-1]
+            wav_samplerate = self.MODEL_SAMPLERATE
             
             # 记录加载完成时间和文件信息
             load_time = time.time() - load_start_time
-            logger.info(f"音频加载完成，耗时: {load_time:.2f}秒，形状: {wav.shape}，采样率: {actual_samplerate}")
+            logger.info(f"音频加载完成，耗时: {load_time:.2f}秒，采样点: {total_samples}，采样率: {wav_samplerate}")
             
             # 更新加载进度
             if progress_callback:
-                progress_callback(5, f"音频加载完成，时长: {wav.shape[-1]/actual_samplerate:.1f}秒，格式: {output_format.upper()}，质量: {quality_settings['description']}", "加载完成")
+                progress_callback(5, f"音频加载完成，时长: {total_samples/wav_samplerate:.1f}秒，格式: {output_format.upper()}，质量: {quality_settings['description']}", "加载完成",
+                                  {'long_file': long_plan} if long_plan else None)
+            
+            # 重采样总耗时（输入适配模型 + 输出降采样）
+            resample_seconds = 0.0
             
             # Get filename without extension
             ref = os.path.basename(input_file).rsplit(".", 1)[0]
             
             # Track progress
-            total_models = len(list(models))
-            total_stems = len(stems)
-            total_steps = total_models * total_stems
+            total_models = len(model_names)
             current_step = 0
             
             # 定义各阶段的进度范围
@@ -263,16 +300,8 @@ class AudioSeparator:
             SAVING_START = 85      # 保存开始进度
             SAVING_END = 100       # 保存结束进度
             
-            result_files = []
-            
             # Process with each model
-            for i, model in enumerate(models):
-                # 获取模型名称 - 处理可能没有name属性的情况
-                curr_model_name = model_name
-                if hasattr(model, 'name'):
-                    curr_model_name = model.name
-                # BagOfModels可能是模型的集合，在文件名中使用传入的名称
-                
+            for i, curr_model_name in enumerate(model_names):
                 # 计算模型进度 - 在try块外定义
                 model_start_progress = MODEL_START + (i * (MODEL_END - MODEL_START) // max(1, total_models))
                 
@@ -282,6 +311,45 @@ class AudioSeparator:
                                      f"开始处理模型: {curr_model_name} ({i+1}/{total_models})",
                                      f"模型处理")
                 
+                # 按需加载模型，由模型注册表负责LRU淘汰
+                try:
+                    model = self.model_registry.get(curr_model_name)
+                except Exception as e:
+                    if total_models > 1:
+                        logger.warning(f"Failed to load model {curr_model_name}: {e}")
+                        continue
+                    raise
+                
+                model_samplerate = getattr(model, 'samplerate', self.MODEL_SAMPLERATE)
+                
+                if long_plan:
+                    # 按窗口分离，音轨直接流式写入编码器（由ffmpeg重采样到输出采样率）
+                    pcm_path = self._decode_long_file(input_file, output_dir, model_samplerate, pcm_files)
+                    encode_jobs.extend(self._separate_windowed(
+                        model=model,
+                        pcm=open_pcm_file(pcm_path, long_plan['source_channels']),
+                        plan=long_plan,
+                        stems=stems,
+                        output_base=os.path.join(output_dir, ref),
+                        model_name=curr_model_name,
+                        output_format=output_format,
+                        audio_quality=audio_quality,
+                        output_samplerate=actual_samplerate,
+                        job_id=job_id,
+                        progress_callback=progress_callback,
+                        base_progress=model_start_progress,
+                        max_progress=MODEL_END
+                    ))
+                    continue
+                
+                # 模型采样率与解码采样率不一致时先重采样输入
+                if model_samplerate != wav_samplerate:
+                    resample_start = time.time()
+                    wav = self._resample(wav, wav_samplerate, model_samplerate)
+                    resample_seconds += time.time() - resample_start
+                    logger.info(f"输入重采样 {wav_samplerate}Hz -> {model_samplerate}Hz")
+                    wav_samplerate = model_samplerate
+                
                 # Apply model - 彻底修复解包错误
                 try:
                     # 确保wav有正确的批次维度 [batch, channels, length]
@@ -296,9 +364,9 @@ class AudioSeparator:
                     sources = self._apply_model_with_progress(
                         model=model, 
                         mix=input_wav,
-                        shifts=1,
-                        split=True,
-                        overlap=0.25,
+                        shifts=self.INFERENCE_PARAMS['shifts'],
+                        split=self.INFERENCE_PARAMS['split'],
+                        overlap=self.INFERENCE_PARAMS['overlap'],
                         progress=False,
                         device=self.device,
                         job_id=job_id,
@@ -326,53 +394,61 @@ class AudioSeparator:
                 # BagOfModels有sources属性
                 source_names = getattr(model, 'sources', ["vocals", "drums", "bass", "other"])
                 
-                # Process each requested stem
+                # 只保留请求的音轨，一次性向量化降采样到输出采样率
+                selected = [stem for stem in stems if stem in source_names]
+                if selected:
+                    sources = sources[[source_names.index(stem) for stem in selected]]
+                    source_names = selected
+                if selected and model_samplerate != actual_samplerate:
+                    resample_start = time.time()
+                    sources = self._resample(sources, model_samplerate, actual_samplerate)
+                    resample_time = time.time() - resample_start
+                    resample_seconds += resample_time
+                    logger.info(f"输出重采样 {model_samplerate}Hz -> {actual_samplerate}Hz，"
+                                f"{len(selected)}个音轨，耗时: {resample_time:.2f}秒")
+                    if progress_callback:
+                        progress_callback(MODEL_END, f"重采样完成 ({curr_model_name})，耗时: {resample_time:.2f}秒",
+                                          "重采样", {'resample_seconds': round(resample_seconds, 3)})
+                
+                # Process each requested stem - 提交到编码线程池，下一个模型的推理可以与编码并行
                 for stem in stems:
                     if stem in source_names:
                         stem_idx = source_names.index(stem)
                         
-                        # 更新保存进度
-                        current_step += 1
-                        save_progress = SAVING_START + (current_step * (SAVING_END - SAVING_START) // total_steps)
-                        
-                        if progress_callback:
-                            progress_callback(save_progress, 
-                                            f"保存 {stem} 音轨 ({curr_model_name}) - {output_format.upper()}, {quality_settings['description']}",
-                                            f"保存音轨文件")
-                        
                         # Create output filename (without extension)
                         filename_base = f"{ref}_{curr_model_name}_{stem}"
                         output_path_base = os.path.join(output_dir, filename_base)
                         
-                        # Save stem audio with custom format and quality
-                        stem_audio = sources[stem_idx]  # 直接使用源索引获取对应的音频数据
-                        save_start = time.time()
-                        
-                        # Use new save method with format and quality support
-                        final_output_path = self.save_audio_with_format(
-                            stem_audio, 
+                        encode_jobs.append(self.encoder_pool.submit(
+                            self._save_stem,
+                            sources[stem_idx],  # 直接使用源索引获取对应的音频数据
                             output_path_base,
-                            format_type=output_format,
-                            quality=audio_quality,
+                            stem=stem,
+                            model_name=curr_model_name,
+                            output_format=output_format,
+                            audio_quality=audio_quality,
                             samplerate=actual_samplerate
-                        )
-                        
-                        save_time = time.time() - save_start
-                        file_size = os.path.getsize(final_output_path) if os.path.exists(final_output_path) else 0
-                        
-                        logger.info(f"保存 {stem} 音轨完成，耗时: {save_time:.2f}秒，"
-                                  f"文件: {final_output_path}，大小: {file_size//1024}KB，"
-                                  f"格式: {output_format.upper()}，质量: {audio_quality}")
-                        
-                        result_files.append({
-                            "path": final_output_path,
-                            "name": os.path.basename(final_output_path),
-                            "stem": stem,
-                            "model": curr_model_name,
-                            "format": output_format,
-                            "quality": audio_quality,
-                            "size": file_size
-                        })
+                        ))
+                
+                # 释放本模型的输出引用，编码任务各自持有需要的音轨
+                del sources
+            
+            # 等待所有音轨编码完成，按完成顺序报告保存进度
+            if progress_callback:
+                progress_callback(SAVING_START,
+                                  f"正在保存音轨 ({len(encode_jobs)}个) - {output_format.upper()}, {quality_settings['description']}",
+                                  "保存音轨文件")
+            for future in as_completed(encode_jobs):
+                file_info = future.result()
+                current_step += 1
+                if progress_callback:
+                    save_progress = SAVING_START + (current_step * (SAVING_END - SAVING_START) // len(encode_jobs))
+                    progress_callback(min(save_progress, SAVING_END - 1),
+                                      f"已保存 {file_info['stem']} 音轨 ({file_info['model']}) - {output_format.upper()}",
+                                      "保存音轨文件")
+            
+            # 结果保持提交顺序（模型顺序、音轨顺序）
+            result_files = [future.result() for future in encode_jobs]
             
             # Report completion
             if progress_callback:
@@ -388,20 +464,195 @@ class AudioSeparator:
                 "output_format": output_format,
                 "audio_quality": audio_quality,
                 "quality_description": quality_settings['description'],
+                "sample_rate": actual_samplerate,
+                "resample_seconds": round(resample_seconds, 3),
+                "long_file": long_plan,
                 "files": result_files
             }
             
         except Exception as e:
             logger.error(f"音频分离过程中出错: {str(e)}")
+            # 取消尚未开始的编码任务
+            for future in encode_jobs:
+                future.cancel()
             # Report error through callback
             if progress_callback:
                 progress_callback(0, f"错误: {str(e)}", "error")
             raise
+        finally:
+            for pcm_path in pcm_files.values():
+                if os.path.exists(pcm_path):
+                    os.remove(pcm_path)
+    
+    def _resample(self, audio: torch.Tensor, from_rate: int, to_rate: int) -> torch.Tensor:
+        """Resample along the last dimension; all stems/channels are processed in one call"""
+        return julius.resample_frac(audio, int(from_rate), int(to_rate))
+    
+    def _save_stem(self, stem_audio, output_path_base, stem, model_name, output_format, audio_quality, samplerate) -> Dict:
+        """Encode one stem and describe the written file (runs in the encoder pool)"""
+        save_start = time.time()
+        
+        # Use new save method with format and quality support
+        final_output_path = self.save_audio_with_format(
+            stem_audio, 
+            output_path_base,
+            format_type=output_format,
+            quality=audio_quality,
+            samplerate=samplerate
+        )
+        
+        save_time = time.time() - save_start
+        file_size = os.path.getsize(final_output_path) if os.path.exists(final_output_path) else 0
+        
+        logger.info(f"保存 {stem} 音轨完成，耗时: {save_time:.2f}秒，"
+                  f"文件: {final_output_path}，大小: {file_size//1024}KB，"
+                  f"格式: {output_format.upper()}，质量: {audio_quality}")
+        
+        return {
+            "path": final_output_path,
+            "name": os.path.basename(final_output_path),
+            "stem": stem,
+            "model": model_name,
+            "format": output_format,
+            "quality": audio_quality,
+            "size": file_size
+        }
+    
+    def _plan_long_file(self, input_file: str, job_id: str, num_stems: int) -> Optional[Dict]:
+        """Decide whether a track is separated in windows; None means whole-track separation"""
+        mode = getattr(self.config, 'LONG_FILE_MODE', 'auto')
+        if mode == 'never':
+            return None
+        
+        try:
+            audio_file = self.AudioFile(input_file)
+            duration = audio_file.duration
+            source_channels = audio_file.channels()
+        except Exception as e:
+            logger.warning(f"无法获取音频时长，使用整段处理: {e}")
+            return None
+        
+        memory_limit = int(getattr(self.config, 'SEPARATION_MEMORY_LIMIT_MB', 1536)) * 1024 * 1024
+        plan = plan_windows(
+            duration=duration,
+            memory_limit_bytes=memory_limit,
+            samplerate=self.MODEL_SAMPLERATE,
+            channels=self.config.CHANNELS,
+            sources=max(4, num_stems),
+            overlap_seconds=float(getattr(self.config, 'LONG_FILE_OVERLAP_SECONDS', 2.0)),
+            min_window_seconds=MIN_WINDOW_SECONDS,
+            force=(mode == 'always')
+        )
+        if plan:
+            plan['source_channels'] = source_channels
+            logger.info(f"任务 {job_id} 使用长音频模式: 时长 {plan['duration']}秒, "
+                        f"内存上限 {memory_limit // (1024 * 1024)}MB, "
+                        f"窗口 {plan['window_seconds']}秒 x {plan['windows']}, 重叠 {plan['overlap_seconds']}秒, "
+                        f"预计峰值 {plan['estimated_peak_bytes'] // (1024 * 1024)}MB "
+                        f"(整段处理约 {plan['whole_track_bytes'] // (1024 * 1024)}MB)")
+        else:
+            logger.info(f"任务 {job_id} 整段处理: 时长 {duration:.1f}秒, 内存上限 {memory_limit // (1024 * 1024)}MB")
+        return plan
+    
+    def _decode_long_file(self, input_file: str, output_dir: str, samplerate: int, pcm_files: Dict) -> str:
+        """Decode once per sample rate to a raw PCM file next to the outputs"""
+        if samplerate not in pcm_files:
+            fd, pcm_path = tempfile.mkstemp(prefix='.decoded_', suffix=f'_{samplerate}.f32', dir=output_dir)
+            os.close(fd)
+            pcm_files[samplerate] = pcm_path
+            decode_to_pcm_file(input_file, pcm_path, samplerate)
+        return pcm_files[samplerate]
+    
+    def _separate_windowed(self, model, pcm, plan, stems, output_base, model_name, output_format,
+                           audio_quality, output_samplerate, job_id, progress_callback,
+                           base_progress, max_progress) -> List:
+        """
+        Separate a memory-mapped track window by window, streaming each stem to its encoder
+
+        Returns:
+            Futures (in stem order) that finish the encoders and describe the output files
+        """
+        samplerate = getattr(model, 'samplerate', self.MODEL_SAMPLERATE)
+        source_names = getattr(model, 'sources', ["vocals", "drums", "bass", "other"])
+        selected = [stem for stem in stems if stem in source_names]
+        if not selected:
+            return []
+        indices = [source_names.index(stem) for stem in selected]
+        
+        quality_settings = self.config.AUDIO_QUALITY_SETTINGS[audio_quality]
+        window = int(plan['window_seconds'] * samplerate)
+        overlap = int(plan['overlap_seconds'] * samplerate)
+        windows = list(iter_windows(len(pcm), window, overlap))
+        crossfader = WindowCrossfader(overlap)
+        
+        encoders = {}
+        try:
+            for stem in selected:
+                encoders[stem] = StreamingEncoder(
+                    f"{output_base}_{model_name}_{stem}.{output_format}", output_format, quality_settings,
+                    input_samplerate=samplerate, output_samplerate=output_samplerate,
+                    channels=self.config.CHANNELS
+                )
+            
+            progress_range = max_progress - base_progress
+            for k, (start, end) in enumerate(windows):
+                chunk = torch.from_numpy(np.array(pcm[start:end])).t()
+                chunk = convert_audio_channels(chunk, self.config.CHANNELS)
+                logger.info(f"处理窗口 {k + 1}/{len(windows)}: {start / samplerate:.1f}s - {end / samplerate:.1f}s")
+                
+                out = self._apply_model_with_progress(
+                    model=model,
+                    mix=chunk.to(self.device).unsqueeze(0),
+                    shifts=self.INFERENCE_PARAMS['shifts'],
+                    split=self.INFERENCE_PARAMS['split'],
+                    overlap=self.INFERENCE_PARAMS['overlap'],
+                    progress=False,
+                    device=self.device,
+                    job_id=job_id,
+                    progress_callback=progress_callback,
+                    model_name=f"{model_name} 窗口{k + 1}/{len(windows)}",
+                    base_progress=base_progress + progress_range * k // len(windows),
+                    max_progress=base_progress + progress_range * (k + 1) // len(windows)
+                )
+                out = crossfader.push(out[0, indices].cpu(), last=(end >= len(pcm)))
+                for j, stem in enumerate(selected):
+                    encoders[stem].write(out[j])
+                del out, chunk
+        except Exception:
+            for encoder in encoders.values():
+                encoder.abort()
+            raise
+        
+        return [
+            self.encoder_pool.submit(self._finish_stream, encoders[stem], stem, model_name, output_format, audio_quality)
+            for stem in selected
+        ]
+    
+    def _finish_stream(self, encoder, stem, model_name, output_format, audio_quality) -> Dict:
+        """Close a streaming encoder and describe the written file (runs in the encoder pool)"""
+        try:
+            final_output_path = encoder.close()
+        except Exception:
+            encoder.abort()
+            raise
+        file_size = os.path.getsize(final_output_path) if os.path.exists(final_output_path) else 0
+        
+        logger.info(f"保存 {stem} 音轨完成（流式编码），文件: {final_output_path}，大小: {file_size//1024}KB，"
+                    f"格式: {output_format.upper()}，质量: {audio_quality}")
+        
+        return {
+            "path": final_output_path,
+            "name": os.path.basename(final_output_path),
+            "stem": stem,
+            "model": model_name,
+            "format": output_format,
+            "quality": audio_quality,
+            "size": file_size
+        }
     
     def get_available_models(self) -> List[str]:
-        """Get list of available demucs models"""
-        self.initialize()
-        return list(self.models.keys())
+        """Get list of available demucs models without loading them"""
+        return list(self.model_registry.known_models)
     
     def separate(self, 
                  file_path: str, 
@@ -458,8 +709,10 @@ class AudioSeparator:
         """
         try:
             # 获取质量设置
-            quality_settings = self.config.AUDIO_QUALITY_SETTINGS.get(quality, 
-                                                                     self.config.AUDIO_QUALITY_SETTINGS['high'])
+            # 默认值不能直接写在get()里，否则未配置'high'时总会抛出KeyError
+            quality_settings = self.config.AUDIO_QUALITY_SETTINGS.get(quality)
+            if quality_settings is None:
+                quality_settings = self.config.AUDIO_QUALITY_SETTINGS['high']
             
             # 根据质量调整采样率
             actual_samplerate = quality_settings.get('sample_rate', samplerate)
@@ -479,23 +732,11 @@ class AudioSeparator:
                 logger.info(f"保存{format_type.upper()}文件: {final_output_path}")
                 
             elif format_type in ['mp3', 'flac']:
-                # 对于MP3和有损FLAC，先保存为临时WAV，再转换
-                temp_wav_path = f"{output_path}_temp.wav"
+                # 对于MP3和有损FLAC，直接把PCM数据通过管道送入ffmpeg编码，不写临时文件
+                self._encode_audio_stream(audio_tensor, final_output_path, format_type,
+                                          quality_settings, actual_samplerate)
+                logger.info(f"保存{format_type.upper()}文件: {final_output_path} (质量: {quality})")
                 
-                try:
-                    # 保存临时WAV文件
-                    self.save_audio(audio_tensor, temp_wav_path, samplerate=actual_samplerate)
-                    
-                    # 使用ffmpeg转换格式和质量
-                    self._convert_audio_format(temp_wav_path, final_output_path, 
-                                             format_type, quality_settings)
-                    
-                    logger.info(f"保存{format_type.upper()}文件: {final_output_path} (质量: {quality})")
-                    
-                finally:
-                    # 清理临时文件
-                    if os.path.exists(temp_wav_path):
-                        os.remove(temp_wav_path)
             else:
                 raise ValueError(f"不支持的音频格式: {format_type}")
                 
@@ -505,33 +746,32 @@ class AudioSeparator:
             logger.error(f"保存音频文件失败: {str(e)}")
             raise
     
-    def _convert_audio_format(self, input_path, output_path, format_type, quality_settings):
-        """使用ffmpeg转换音频格式和质量"""
+    def _encode_audio_stream(self, audio_tensor, output_path, format_type, quality_settings, samplerate):
+        """将音频张量以原始PCM流写入ffmpeg标准输入进行编码"""
+        # 与save_audio一致：先防止削波，再按声道交错为32位浮点PCM
+        wav = prevent_clip(audio_tensor.detach().cpu().float(), mode='rescale')
+        channels = wav.shape[0]
+        pcm = wav.t().contiguous().numpy().tobytes()
+        
         try:
-            cmd = ['ffmpeg', '-i', input_path, '-y']  # -y 覆盖现有文件
+            cmd = ['ffmpeg', '-y',  # -y 覆盖现有文件
+                   '-f', 'f32le', '-ar', str(samplerate), '-ac', str(channels), '-i', 'pipe:0']
             
-            if format_type == 'mp3':
-                # MP3编码设置
-                bitrate = quality_settings.get('mp3_bitrate', '192k')
-                cmd.extend(['-codec:a', 'libmp3lame', '-b:a', bitrate])
-                
-            elif format_type == 'flac':
-                # FLAC编码设置
-                cmd.extend(['-codec:a', 'flac'])
-                
+            cmd.extend(ffmpeg_codec_args(format_type, quality_settings))
             cmd.append(output_path)
             
-            # 执行转换
-            result = subprocess.run(cmd, 
-                                  capture_output=True, 
-                                  text=True, 
-                                  check=True)
+            # 执行编码
+            subprocess.run(cmd,
+                           input=pcm,
+                           capture_output=True,
+                           check=True)
             
-            logger.debug(f"ffmpeg转换成功: {' '.join(cmd)}")
+            logger.debug(f"ffmpeg编码成功: {' '.join(cmd)}")
             
         except subprocess.CalledProcessError as e:
-            logger.error(f"ffmpeg转换失败: {e.stderr}")
-            raise RuntimeError(f"音频格式转换失败: {e.stderr}")
+            stderr = e.stderr.decode('utf-8', errors='replace') if e.stderr else ''
+            logger.error(f"ffmpeg编码失败: {stderr}")
+            raise RuntimeError(f"音频格式转换失败: {stderr}")
         except FileNotFoundError:
             logger.error("ffmpeg未找到，请确保已安装ffmpeg")
             raise RuntimeError("ffmpeg未找到，无法转换音频格式")
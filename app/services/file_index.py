@@ -0,0 +1,417 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional
+
+from app.services.job_store import JobStore, _pid_alive
+
+logger = logging.getLogger(__name__)
+
+# Kinds of indexed paths
+UPLOAD = 'upload'
+OUTPUT_DIR = 'output_dir'
+STEM = 'stem'
+ZIP = 'zip'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_files (
+    path        TEXT PRIMARY KEY,
+    job_id      TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    size        INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    owner_pid   INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_job_files_job_id ON job_files (job_id);
+"""
+
+# Per-job file counts and sizes, kept up to date by triggers so the admin
+# inventory never aggregates job_files on a request
+USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_usage (
+    job_id        TEXT PRIMARY KEY,
+    input_files   INTEGER NOT NULL DEFAULT 0,
+    output_files  INTEGER NOT NULL DEFAULT 0,
+    input_bytes   INTEGER NOT NULL DEFAULT 0,
+    output_bytes  INTEGER NOT NULL DEFAULT 0,
+    total_bytes   INTEGER NOT NULL DEFAULT 0,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_usage_created_at ON job_usage (created_at);
+CREATE INDEX IF NOT EXISTS idx_job_usage_updated_at ON job_usage (updated_at);
+CREATE INDEX IF NOT EXISTS idx_job_usage_total_bytes ON job_usage (total_bytes);
+
+CREATE TRIGGER IF NOT EXISTS job_files_usage_insert AFTER INSERT ON job_files
+WHEN NEW.kind != 'output_dir'
+BEGIN
+    INSERT INTO job_usage (job_id, input_files, output_files, input_bytes, output_bytes, total_bytes,
+                           created_at, updated_at)
+    VALUES (NEW.job_id, NEW.kind = 'upload', NEW.kind != 'upload',
+            CASE WHEN NEW.kind = 'upload' THEN NEW.size ELSE 0 END,
+            CASE WHEN NEW.kind != 'upload' THEN NEW.size ELSE 0 END,
+            NEW.size, NEW.created_at, NEW.created_at)
+    ON CONFLICT(job_id) DO UPDATE SET
+        input_files = input_files + excluded.input_files,
+        output_files = output_files + excluded.output_files,
+        input_bytes = input_bytes + excluded.input_bytes,
+        output_bytes = output_bytes + excluded.output_bytes,
+        total_bytes = total_bytes + excluded.total_bytes,
+        created_at = MIN(created_at, excluded.created_at),
+        updated_at = MAX(updated_at, excluded.updated_at);
+END;
+
+CREATE TRIGGER IF NOT EXISTS job_files_usage_delete AFTER DELETE ON job_files
+WHEN OLD.kind != 'output_dir'
+BEGIN
+    UPDATE job_usage SET
+        input_files = input_files - (OLD.kind = 'upload'),
+        output_files = output_files - (OLD.kind != 'upload'),
+        input_bytes = input_bytes - CASE WHEN OLD.kind = 'upload' THEN OLD.size ELSE 0 END,
+        output_bytes = output_bytes - CASE WHEN OLD.kind != 'upload' THEN OLD.size ELSE 0 END,
+        total_bytes = total_bytes - OLD.size
+    WHERE job_id = OLD.job_id;
+    DELETE FROM job_usage WHERE job_id = OLD.job_id AND input_files + output_files <= 0;
+END;
+
+-- An update may move a path to another job (e.g. an upload adopted by a job) or change
+-- its size: subtract the old row, then add the new one
+CREATE TRIGGER IF NOT EXISTS job_files_usage_update_old AFTER UPDATE ON job_files
+WHEN OLD.kind != 'output_dir'
+BEGIN
+    UPDATE job_usage SET
+        input_files = input_files - (OLD.kind = 'upload'),
+        output_files = output_files - (OLD.kind != 'upload'),
+        input_bytes = input_bytes - CASE WHEN OLD.kind = 'upload' THEN OLD.size ELSE 0 END,
+        output_bytes = output_bytes - CASE WHEN OLD.kind != 'upload' THEN OLD.size ELSE 0 END,
+        total_bytes = total_bytes - OLD.size
+    WHERE job_id = OLD.job_id;
+    DELETE FROM job_usage WHERE job_id = OLD.job_id AND input_files + output_files <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS job_files_usage_update_new AFTER UPDATE ON job_files
+WHEN NEW.kind != 'output_dir'
+BEGIN
+    INSERT INTO job_usage (job_id, input_files, output_files, input_bytes, output_bytes, total_bytes,
+                           created_at, updated_at)
+    VALUES (NEW.job_id, NEW.kind = 'upload', NEW.kind != 'upload',
+            CASE WHEN NEW.kind = 'upload' THEN NEW.size ELSE 0 END,
+            CASE WHEN NEW.kind != 'upload' THEN NEW.size ELSE 0 END,
+            NEW.size, NEW.created_at, NEW.created_at)
+    ON CONFLICT(job_id) DO UPDATE SET
+        input_files = input_files + excluded.input_files,
+        output_files = output_files + excluded.output_files,
+        input_bytes = input_bytes + excluded.input_bytes,
+        output_bytes = output_bytes + excluded.output_bytes,
+        total_bytes = total_bytes + excluded.total_bytes,
+        created_at = MIN(created_at, excluded.created_at),
+        updated_at = MAX(updated_at, excluded.updated_at);
+END;
+
+-- Totals over job_usage in a single row, so the admin summary reads one row
+-- instead of aggregating every job
+CREATE TABLE IF NOT EXISTS job_usage_totals (
+    id            INTEGER PRIMARY KEY CHECK (id = 1),
+    tasks         INTEGER NOT NULL DEFAULT 0,
+    files         INTEGER NOT NULL DEFAULT 0,
+    input_bytes   INTEGER NOT NULL DEFAULT 0,
+    output_bytes  INTEGER NOT NULL DEFAULT 0,
+    total_bytes   INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO job_usage_totals (id) VALUES (1);
+
+CREATE TRIGGER IF NOT EXISTS job_usage_totals_insert AFTER INSERT ON job_usage
+BEGIN
+    UPDATE job_usage_totals SET
+        tasks = tasks + 1,
+        files = files + NEW.input_files + NEW.output_files,
+        input_bytes = input_bytes + NEW.input_bytes,
+        output_bytes = output_bytes + NEW.output_bytes,
+        total_bytes = total_bytes + NEW.total_bytes
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS job_usage_totals_update AFTER UPDATE ON job_usage
+BEGIN
+    UPDATE job_usage_totals SET
+        files = files + NEW.input_files + NEW.output_files - OLD.input_files - OLD.output_files,
+        input_bytes = input_bytes + NEW.input_bytes - OLD.input_bytes,
+        output_bytes = output_bytes + NEW.output_bytes - OLD.output_bytes,
+        total_bytes = total_bytes + NEW.total_bytes - OLD.total_bytes
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS job_usage_totals_delete AFTER DELETE ON job_usage
+BEGIN
+    UPDATE job_usage_totals SET
+        tasks = tasks - 1,
+        files = files - OLD.input_files - OLD.output_files,
+        input_bytes = input_bytes - OLD.input_bytes,
+        output_bytes = output_bytes - OLD.output_bytes,
+        total_bytes = total_bytes - OLD.total_bytes
+    WHERE id = 1;
+END;
+"""
+
+# Columns the inventory can be sorted by
+SORT_COLUMNS = {
+    'created_time': 'u.created_at',
+    'latest_time': 'u.updated_at',
+    'total_size': 'u.total_bytes',
+    'task_id': 'u.job_id'
+}
+
+# Status expression: the job store's status, or inferred from the files for jobs without a record
+STATUS_SQL = ("COALESCE(j.status, CASE WHEN u.output_files > 0 THEN 'completed' ELSE 'processing' END)")
+
+
+class FileIndex:
+    """Persistent job_id -> files index, kept in the job store's SQLite database
+
+    FileManager records every upload, output directory, stem and zip when it
+    creates them, so finding or deleting a job's files never scans the folders.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None):
+        """
+        Args:
+            store: JobStore whose database holds the index; a private in-memory store by default
+        """
+        self.store = store if store is not None else JobStore()
+        conn = self.store.conn
+        # True when this call created the index, so files written before it existed still need recording
+        self.created = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'job_files'").fetchone() is None
+        conn.executescript(SCHEMA)
+        conn.executescript(USAGE_SCHEMA)
+        # (computed_at, counts) of the last status_counts aggregate
+        self._status_counts = None
+
+    @property
+    def conn(self):
+        return self.store.conn
+
+    def add(self, job_id: str, kind: str, path: str, size: Optional[int] = None):
+        """Record a path of a job; size is read from disk for files when not given"""
+        path = os.path.abspath(path)
+        if size is None:
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+        self.conn.execute(
+            """INSERT INTO job_files (path, job_id, kind, size, created_at, owner_pid) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(path) DO UPDATE SET job_id = excluded.job_id, kind = excluded.kind, size = excluded.size,
+                   owner_pid = excluded.owner_pid""",
+            (path, job_id, kind, size, time.time(), os.getpid())
+        )
+
+    def add_many(self, job_id: str, kind: str, files: List[Dict]):
+        """Record several files given as {'path', 'size'} dicts in one transaction"""
+        now = time.time()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """INSERT INTO job_files (path, job_id, kind, size, created_at, owner_pid) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO UPDATE SET job_id = excluded.job_id, kind = excluded.kind, size = excluded.size,
+                       owner_pid = excluded.owner_pid""",
+                [(os.path.abspath(f['path']), job_id, kind, f.get('size') or 0, now, os.getpid()) for f in files]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def backfill(self, entries: List[tuple]):
+        """
+        Record files found on disk, leaving paths already indexed untouched
+
+        Args:
+            entries: (job_id, kind, path, size, created_at) tuples; they get no owner,
+                so the next claim_orphans hands them to the janitor
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """INSERT INTO job_files (path, job_id, kind, size, created_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO NOTHING""",
+                [(os.path.abspath(path), job_id, kind, size, created_at)
+                 for job_id, kind, path, size, created_at in entries]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def files(self, job_id: str, kind: Optional[str] = None) -> List[Dict]:
+        """Indexed paths of a job, oldest first"""
+        query = "SELECT path, job_id, kind, size, created_at FROM job_files WHERE job_id = ?"
+        params = [job_id]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        rows = self.conn.execute(query + " ORDER BY created_at", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def output_dir(self, job_id: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT path FROM job_files WHERE job_id = ? AND kind = ?", (job_id, OUTPUT_DIR)
+        ).fetchone()
+        return row['path'] if row else None
+
+    def jobs(self) -> Dict[str, Dict]:
+        """job_id -> {'paths', 'updated_at'} of every indexed job"""
+        return _group_jobs(self.conn.execute("SELECT job_id, path, created_at FROM job_files"))
+
+    def claim_orphans(self) -> Dict[str, Dict]:
+        """
+        Take over the files of processes that no longer exist, in the shape of jobs()
+
+        Call at startup, like JobStore.recover_orphans: files recorded under our own
+        pid come from a previous container run that reused the pid. The claim runs in
+        one write transaction, so of several workers starting together exactly one
+        gets each leftover file, and files of live workers stay with their owner.
+        """
+        me = os.getpid()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            owners = [row['owner_pid'] for row in conn.execute("SELECT DISTINCT owner_pid FROM job_files")]
+            rows = []
+            for pid in owners:
+                if pid and pid != me and _pid_alive(pid):
+                    continue
+                rows.extend(conn.execute(
+                    "SELECT job_id, path, created_at FROM job_files WHERE owner_pid IS ?", (pid,)).fetchall())
+                conn.execute("UPDATE job_files SET owner_pid = ? WHERE owner_pid IS ?", (me, pid))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return _group_jobs(rows)
+
+    def remove_path(self, path: str) -> int:
+        """Remove a path, and everything indexed under it if it is a directory"""
+        path = os.path.abspath(path)
+        # Range over the primary key: every path starting with "<path>/" ('0' follows '/')
+        return self.conn.execute(
+            "DELETE FROM job_files WHERE path = ? OR (path >= ? AND path < ?)",
+            (path, path + '/', path + '0')
+        ).rowcount
+
+    def query_jobs(self, task: Optional[str] = None, status: Optional[str] = None,
+                   file_type: Optional[str] = None, min_size: Optional[int] = None,
+                   max_size: Optional[int] = None, updated_before: Optional[float] = None,
+                   updated_after: Optional[float] = None, sort: str = 'latest_time',
+                   descending: bool = True, limit: int = 50, offset: int = 0):
+        """
+        Page through jobs that have files, with their usage
+
+        Args:
+            task: job_id prefix
+            status: completed, processing (anything unfinished) or error
+            file_type: 'input' or 'output', jobs having such files
+            min_size, max_size: Bounds on the job's total bytes
+            updated_before, updated_after: Bounds on the job's last file time
+            sort: One of SORT_COLUMNS
+
+        Returns:
+            (rows, total) with rows as dicts of job_usage columns plus 'status'
+        """
+        clauses, params = [], []
+        if task:
+            clauses.append("u.job_id >= ? AND u.job_id < ?")
+            params += [task, task + '\uffff']
+        if status == 'processing':
+            clauses.append(f"{STATUS_SQL} NOT IN ('completed', 'error')")
+        elif status:
+            clauses.append(f"{STATUS_SQL} = ?")
+            params.append(status)
+        if file_type == 'input':
+            clauses.append("u.input_files > 0")
+        elif file_type == 'output':
+            clauses.append("u.output_files > 0")
+        if min_size is not None:
+            clauses.append("u.total_bytes >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            clauses.append("u.total_bytes <= ?")
+            params.append(max_size)
+        if updated_before is not None:
+            clauses.append("u.updated_at < ?")
+            params.append(updated_before)
+        if updated_after is not None:
+            clauses.append("u.updated_at >= ?")
+            params.append(updated_after)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        source = "FROM job_usage u LEFT JOIN jobs j ON j.job_id = u.job_id"
+        order = f"{SORT_COLUMNS.get(sort, SORT_COLUMNS['latest_time'])} {'DESC' if descending else 'ASC'}"
+        rows = self.conn.execute(
+            f"SELECT u.*, {STATUS_SQL} AS status {source} {where} ORDER BY {order}, u.job_id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        total = self.conn.execute(f"SELECT COUNT(*) {source} {where}", params).fetchone()[0]
+        return [dict(row) for row in rows], total
+
+    def files_of(self, job_ids: List[str]) -> Dict[str, List[Dict]]:
+        """job_id -> indexed files (without output directories) for a page of jobs"""
+        files = {job_id: [] for job_id in job_ids}
+        if not job_ids:
+            return files
+        rows = self.conn.execute(
+            f"""SELECT path, job_id, kind, size, created_at FROM job_files
+                WHERE job_id IN ({','.join('?' * len(job_ids))}) AND kind != 'output_dir'
+                ORDER BY created_at""",
+            list(job_ids)
+        ).fetchall()
+        for row in rows:
+            files[row['job_id']].append(dict(row))
+        return files
+
+    def usage(self, old_before: Optional[float] = None) -> Dict:
+        """Disk usage totals over every indexed job; only jobs older than old_before are aggregated"""
+        usage = dict(self.conn.execute(
+            "SELECT tasks, files, input_bytes, output_bytes, total_bytes FROM job_usage_totals WHERE id = 1"
+        ).fetchone())
+        # Range over idx_job_usage_updated_at: expired jobs are evicted, so this stays small
+        old = self.conn.execute(
+            "SELECT COUNT(*) AS old_tasks, COALESCE(SUM(total_bytes), 0) AS old_bytes FROM job_usage WHERE updated_at < ?",
+            (old_before or 0,)
+        ).fetchone()
+        usage.update(old_tasks=old['old_tasks'], old_bytes=old['old_bytes'])
+        return usage
+
+    def status_counts(self, max_age: float = 0) -> Dict[str, int]:
+        """
+        Number of jobs with files per status
+
+        Args:
+            max_age: Seconds a previous result may be reused; the counts join every job with its record
+        """
+        cached = self._status_counts
+        if cached is not None and time.time() - cached[0] < max_age:
+            return dict(cached[1])
+        rows = self.conn.execute(
+            f"SELECT {STATUS_SQL} AS status, COUNT(*) AS n FROM job_usage u "
+            f"LEFT JOIN jobs j ON j.job_id = u.job_id GROUP BY 1"
+        ).fetchall()
+        counts = {row['status']: row['n'] for row in rows}
+        self._status_counts = (time.time(), counts)
+        return dict(counts)
+
+    def remove_job(self, job_id: str) -> int:
+        return self.conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,)).rowcount
+
+    def clear(self) -> int:
+        # job_usage is emptied by the delete trigger
+        return self.conn.execute("DELETE FROM job_files").rowcount
+
+
+def _group_jobs(rows) -> Dict[str, Dict]:
+    """job_id -> {'paths', 'updated_at'} from (job_id, path, created_at) rows"""
+    jobs = {}
+    for row in rows:
+        job = jobs.setdefault(row['job_id'], {'paths': [], 'updated_at': 0.0})
+        job['paths'].append(row['path'])
+        job['updated_at'] = max(job['updated_at'], row['created_at'])
+    return jobs
@@ -8,20 +8,69 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Union
 
+from app.services.file_index import FileIndex, UPLOAD, OUTPUT_DIR, STEM, ZIP
+
 logger = logging.getLogger(__name__)
 
 class FileManager:
     """File management service for handling file uploads, cleaning, etc."""
     
-    def __init__(self, config):
+    def __init__(self, config, index: Optional[FileIndex] = None):
         self.config = config
         self.upload_folder = config.UPLOAD_FOLDER
         self.output_folder = config.OUTPUT_FOLDER
         self.file_retention_minutes = config.FILE_RETENTION_MINUTES
+        # 任务ID到文件路径的索引，查找和删除任务文件时无需扫描目录
+        self.index = index if index is not None else FileIndex()
         
         # Ensure directories exist
         os.makedirs(self.upload_folder, exist_ok=True)
         os.makedirs(self.output_folder, exist_ok=True)
+        
+        # 索引刚创建时登记之前版本留下的文件，否则这些任务无法下载、清理或过期回收
+        if self.index.created:
+            self._backfill_index()
+    
+    def _backfill_index(self):
+        """Record the files written before the index existed, grouped the way the folders lay them out"""
+        entries = []
+        
+        def add(job_id, kind, path):
+            stat = os.stat(path)
+            entries.append((job_id, kind, path, stat.st_size if kind != OUTPUT_DIR else 0, stat.st_mtime))
+        
+        def add_zip(entry):
+            name, ext = os.path.splitext(entry.name)
+            if ext == '.zip' and name.startswith('demucs_output_'):
+                add(name[len('demucs_output_'):], ZIP, entry.path)
+        
+        try:
+            # 上传文件名为 name_<id>.ext，按末尾的ID分组
+            for entry in os.scandir(self.upload_folder):
+                if entry.is_file():
+                    add(os.path.splitext(entry.name)[0].rsplit('_', 1)[-1], UPLOAD, entry.path)
+            
+            # 输出目录为 <日期>/<任务ID>/，ZIP为 demucs_output_<任务ID>.zip
+            for entry in os.scandir(self.output_folder):
+                if entry.is_file():
+                    add_zip(entry)
+                    continue
+                if not entry.is_dir():
+                    continue
+                for job_entry in os.scandir(entry.path):
+                    if job_entry.is_file():
+                        add_zip(job_entry)
+                    elif job_entry.is_dir():
+                        add(job_entry.name, OUTPUT_DIR, job_entry.path)
+                        for root, _, files in os.walk(job_entry.path):
+                            for name in files:
+                                add(job_entry.name, STEM, os.path.join(root, name))
+        except OSError as e:
+            logger.error(f"扫描已有文件失败: {e}")
+        
+        if entries:
+            self.index.backfill(entries)
+            logger.info(f"文件索引登记了 {len(entries)} 个已有文件")
     
     def get_upload_path(self, job_id):
         """Get upload file path"""
@@ -31,13 +80,14 @@ class FileManager:
         """Get output file path"""
         return os.path.join(self.output_folder, job_id)
     
-    def save_uploaded_file(self, file, filename: Optional[str] = None) -> Tuple[str, str]:
+    def save_uploaded_file(self, file, filename: Optional[str] = None, job_id: Optional[str] = None) -> Tuple[str, str]:
         """
         Save an uploaded file to the upload directory
         
         Args:
             file: File object from request
             filename: Optional custom filename
+            job_id: Job the upload belongs to, recorded in the file index
             
         Returns:
             Tuple of (filename, file_path)
@@ -55,10 +105,30 @@ class FileManager:
             
         file_path = os.path.join(self.upload_folder, safe_filename)
         file.save(file_path)
+        if job_id:
+            self.index.add(job_id, UPLOAD, file_path)
         logger.info(f"Saved uploaded file: {file_path}")
         
         return safe_filename, file_path
     
+    def create_upload_file(self, filename: str, upload_id: str) -> str:
+        """
+        Create the empty file a resumable upload is written into
+        
+        Args:
+            filename: Original file name
+            upload_id: Upload identifier, recorded in the file index until a job adopts the file
+            
+        Returns:
+            Path to the upload file
+        """
+        name_parts = os.path.splitext(os.path.basename(filename))
+        file_path = os.path.join(self.upload_folder, f"{name_parts[0]}_{upload_id[:8]}{name_parts[1]}")
+        open(file_path, 'wb').close()
+        self.index.add(upload_id, UPLOAD, file_path, size=0)
+        logger.info(f"Created upload file: {file_path}")
+        return file_path
+    
     def create_job_output_directory(self, job_id: str) -> str:
         """
         Create a directory for a specific job's output files
@@ -73,6 +143,7 @@ class FileManager:
         date_str = datetime.now().strftime("%Y%m%d")
         job_dir = os.path.join(self.output_folder, date_str, job_id)
         os.makedirs(job_dir, exist_ok=True)
+        self.index.add(job_id, OUTPUT_DIR, job_dir)
         logger.info(f"Created job output directory: {job_dir}")
         
         return job_dir
@@ -87,13 +158,9 @@ class FileManager:
         Returns:
             Path to the job output directory or None if not found
         """
-        # Check in all date folders
-        for date_dir in os.listdir(self.output_folder):
-            date_path = os.path.join(self.output_folder, date_dir)
-            if os.path.isdir(date_path):
-                job_dir = os.path.join(date_path, job_id)
-                if os.path.isdir(job_dir):
-                    return job_dir
+        job_dir = self.index.output_dir(job_id)
+        if job_dir and os.path.isdir(job_dir):
+            return job_dir
         
         logger.warning(f"Job output directory not found for job_id: {job_id}")
         return None
@@ -128,59 +195,34 @@ class FileManager:
             
             # 返回绝对路径
             abs_zip_path = os.path.abspath(zip_path)
+            self.index.add(job_id, ZIP, abs_zip_path)
             logger.info(f"Created ZIP file: {zip_path}, 绝对路径: {abs_zip_path}")
             return abs_zip_path
         except Exception as e:
             logger.error(f"Error creating ZIP file: {str(e)}")
             return None
 
-    def create_zip_from_output(self, job_id: str, output_paths: List[str]) -> Optional[str]:
+    def record_output_files(self, job_id: str, files: List[Dict]):
         """
-        Create a ZIP file from output file paths
+        Record the stem files written for a job
         
         Args:
-            job_id: Job identifier for the zip file name
-            output_paths: List of file paths to include in the ZIP
+            job_id: Job identifier
+            files: File information dicts with 'path' and 'size'
+        """
+        self.index.add_many(job_id, STEM, files)
+    
+    def get_job_files(self, job_id: str) -> List[Dict]:
+        """
+        Get the indexed files of a job
+        
+        Args:
+            job_id: Job identifier
             
         Returns:
-            Path to the created ZIP file or None if failed
+            List of {'path', 'job_id', 'kind', 'size', 'created_at'}
         """
-        try:
-            # Create ZIP filename
-            zip_filename = f"demucs_output_{job_id}.zip"
-            # Store ZIP in the same date directory as the job output
-            job_output_dir = self.get_job_output_directory(job_id)
-            if job_output_dir:
-                # Use the parent directory of job output (the date directory)
-                zip_path = os.path.join(os.path.dirname(job_output_dir), zip_filename)
-            else:
-                # Fallback to output folder root
-                zip_path = os.path.join(self.output_folder, zip_filename)
-            
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(zip_path), exist_ok=True)
-            
-            # Create ZIP file
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in output_paths:
-                    if os.path.isfile(file_path):
-                        # Use just the filename as the archive name
-                        arcname = os.path.basename(file_path)
-                        zipf.write(file_path, arcname=arcname)
-                        logger.info(f"Added to ZIP: {file_path} -> {arcname}")
-            
-            # 验证ZIP文件是否创建成功
-            if not os.path.exists(zip_path) or os.path.getsize(zip_path) == 0:
-                logger.error(f"ZIP file creation failed or is empty: {zip_path}")
-                return None
-            
-            # 返回绝对路径
-            abs_zip_path = os.path.abspath(zip_path)
-            logger.info(f"Created ZIP file from output: {zip_path}, 大小: {os.path.getsize(zip_path)} 字节")
-            return abs_zip_path
-        except Exception as e:
-            logger.error(f"Error creating ZIP file from output: {str(e)}")
-            return None
+        return self.index.files(job_id)
     
     def get_file_path(self, filename: str, folder: str = None) -> Optional[str]:
         """
@@ -249,43 +291,18 @@ class FileManager:
         cleanup_success = False
         
         try:
-            # 清理上传的原始文件
-            upload_file = None
-            for filename in os.listdir(self.upload_folder):
-                if job_id in filename:
-                    upload_file = os.path.join(self.upload_folder, filename)
-                    if os.path.isfile(upload_file):
-                        logger.info(f"删除上传文件: {upload_file}")
-                        os.remove(upload_file)
-                        cleanup_success = True
-            
-            # 清理输出目录中的任务文件夹
-            job_output_dir = self.get_job_output_directory(job_id)
-            if job_output_dir and os.path.isdir(job_output_dir):
-                logger.info(f"删除任务输出目录: {job_output_dir}")
-                shutil.rmtree(job_output_dir, ignore_errors=True)
-                cleanup_success = True
-            
-            # 清理ZIP文件
-            zip_file = os.path.join(self.output_folder, f"demucs_output_{job_id}.zip")
-            if os.path.isfile(zip_file):
-                logger.info(f"删除ZIP文件: {zip_file}")
-                os.remove(zip_file)
-                cleanup_success = True
-            
-            # 清理separated目录中可能存在的文件
-            separated_dir = os.path.join(os.getcwd(), 'separated')
-            if os.path.exists(separated_dir):
-                for model_name in os.listdir(separated_dir):
-                    model_path = os.path.join(separated_dir, model_name)
-                    if os.path.isdir(model_path):
-                        for item in os.listdir(model_path):
-                            if job_id in item:
-                                item_path = os.path.join(model_path, item)
-                                if os.path.isdir(item_path):
-                                    logger.info(f"删除separated目录: {item_path}")
-                                    shutil.rmtree(item_path, ignore_errors=True)
-                                    cleanup_success = True
+            # 按索引删除上传文件、输出目录、音轨和ZIP
+            for file_info in self.index.files(job_id):
+                path = file_info['path']
+                if os.path.isdir(path):
+                    logger.info(f"删除任务输出目录: {path}")
+                    shutil.rmtree(path, ignore_errors=True)
+                    cleanup_success = True
+                elif os.path.isfile(path):
+                    logger.info(f"删除任务文件: {path}")
+                    os.remove(path)
+                    cleanup_success = True
+            self.index.remove_job(job_id)
             
             if cleanup_success:
                 return True, "任务文件清理成功"
@@ -355,6 +372,7 @@ class FileManager:
                                 shutil.rmtree(item_path, ignore_errors=True)
                                 stats["separated_deleted"] += 1
             
+            self.index.clear()
             logger.info(f"文件清理完成，统计: {stats}")
             return True, "所有文件清理成功", stats
         
@@ -0,0 +1,312 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(worker_id: int, config, task_queue, event_queue):
+    """Entry point of an inference worker process"""
+    # Imported here so the web process never needs torch state from the worker
+    from app.services.audio_separator import AudioSeparator
+
+    separator = AudioSeparator(config)
+    event_queue.put(('ready', worker_id, os.getpid()))
+
+    while True:
+        job = task_queue.get()
+        if job is None:
+            break
+
+        job_id = job['job_id']
+
+        def progress_callback(*args, **kwargs):
+            event_queue.put(('progress', job_id, args, kwargs))
+
+        try:
+            result = separator.separate_track(progress_callback=progress_callback, **job['params'])
+            event_queue.put(('result', job_id, result, separator.get_model_stats()))
+        except Exception as e:
+            event_queue.put(('error', job_id, str(e), separator.get_model_stats()))
+
+    event_queue.put(('exit', worker_id, os.getpid()))
+
+
+class _WorkerHandle:
+    """Parent-side bookkeeping for one worker process"""
+
+    def __init__(self, worker_id: int, process, task_queue):
+        self.worker_id = worker_id
+        self.process = process
+        self.task_queue = task_queue
+        self.jobs_done = 0
+        self.current_job = None
+        self.recycle = False
+        self.started_at = time.time()
+        self.model_stats = {}
+
+
+class InferencePool:
+    """Pool of worker processes that own AudioSeparator and run separation jobs"""
+
+    def __init__(self, config):
+        self.config = config
+        self.size = max(1, getattr(config, 'INFERENCE_WORKERS', 1))
+        # Recycle a worker after this many jobs to cap memory creep (0 disables)
+        self.max_jobs_per_worker = max(0, getattr(config, 'WORKER_MAX_JOBS', 20))
+        self.ctx = multiprocessing.get_context('spawn')
+        self.event_queue = None
+        self.workers: Dict[int, _WorkerHandle] = {}
+        self._idle = queue.Queue()
+        self._pending: Dict[str, queue.Queue] = {}
+        self._next_worker_id = 0
+        self._started = False
+        self.lock = threading.Lock()
+        self.counters = {
+            'jobs': 0,
+            'errors': 0,
+            'crashes': 0,
+            'recycled': 0,
+            'spawned': 0
+        }
+
+    def start(self):
+        """Spawn worker processes on first use"""
+        with self.lock:
+            if self._started:
+                return
+            self.event_queue = self.ctx.Queue()
+            threading.Thread(target=self._relay_events, name="inference-relay", daemon=True).start()
+            for _ in range(self.size):
+                self._idle.put(self._spawn_worker_locked())
+            self._started = True
+            atexit.register(self.shutdown)
+        logger.info(f"Inference pool started with {self.size} worker process(es), "
+                    f"recycling after {self.max_jobs_per_worker or 'unlimited'} jobs")
+
+    def _spawn_worker_locked(self) -> int:
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        task_queue = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.config, task_queue, self.event_queue),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = _WorkerHandle(worker_id, process, task_queue)
+        self.counters['spawned'] += 1
+        logger.info(f"Spawned inference worker {worker_id} (pid {process.pid})")
+        return worker_id
+
+    def _detach_worker_locked(self, worker_id: int) -> Optional[_WorkerHandle]:
+        """Remove a worker from the pool and ask it to exit; join it with _join_worker after releasing the lock"""
+        handle = self.workers.pop(worker_id, None)
+        if handle is not None and handle.process.is_alive():
+            handle.task_queue.put(None)
+        return handle
+
+    def _join_worker(self, handle: Optional[_WorkerHandle], timeout: float = 5.0):
+        """Wait for a detached worker to exit, terminating it if it does not (lock must not be held)"""
+        if handle is None:
+            return
+        handle.process.join(timeout)
+        if handle.process.is_alive():
+            handle.process.terminate()
+            handle.process.join(timeout)
+        logger.info(f"Stopped inference worker {handle.worker_id} after {handle.jobs_done} job(s)")
+
+    def _relay_events(self):
+        """Route events from worker processes to the waiting job"""
+        while True:
+            try:
+                event = self.event_queue.get()
+            except (EOFError, OSError):
+                break
+            kind = event[0]
+            if kind in ('ready', 'exit'):
+                logger.debug(f"Inference worker {event[1]} (pid {event[2]}) {kind}")
+                continue
+            with self.lock:
+                job_events = self._pending.get(event[1])
+            if job_events is not None:
+                job_events.put(event)
+
+    def _acquire_worker(self) -> _WorkerHandle:
+        """Take an idle worker, replacing it first if it died while idle"""
+        worker_id = self._idle.get()
+        stopped = None
+        with self.lock:
+            handle = self.workers.get(worker_id)
+            if handle is None or not handle.process.is_alive():
+                logger.warning(f"Inference worker {worker_id} is not alive, respawning")
+                stopped = self._detach_worker_locked(worker_id)
+                handle = self.workers[self._spawn_worker_locked()]
+        self._join_worker(stopped)
+        return handle
+
+    def _release_worker(self, handle: _WorkerHandle, crashed: bool):
+        stopped = None
+        with self.lock:
+            handle.current_job = None
+            replace = crashed or handle.recycle or (
+                self.max_jobs_per_worker and handle.jobs_done >= self.max_jobs_per_worker)
+            if replace:
+                if crashed:
+                    self.counters['crashes'] += 1
+                else:
+                    self.counters['recycled'] += 1
+                stopped = self._detach_worker_locked(handle.worker_id)
+                worker_id = self._spawn_worker_locked()
+            else:
+                worker_id = handle.worker_id
+        self._idle.put(worker_id)
+        if stopped is not None:
+            # 旧进程在后台退出，不阻塞任务返回，也不占用锁（进度转发需要锁）
+            threading.Thread(target=self._join_worker, args=(stopped,),
+                             name=f"inference-reaper-{stopped.worker_id}", daemon=True).start()
+
+    def run(self, job_id: str, params: Dict, progress_callback: Optional[Callable] = None) -> Dict:
+        """
+        Run a separation job in a worker process and relay its progress
+
+        Args:
+            job_id: Job identifier
+            params: Keyword arguments for AudioSeparator.separate_track
+            progress_callback: Callback receiving the worker's progress updates
+
+        Returns:
+            Result dictionary from separate_track
+        """
+        self.start()
+        handle = self._acquire_worker()
+        job_events = queue.Queue()
+        crashed = False
+
+        with self.lock:
+            self._pending[job_id] = job_events
+            handle.current_job = job_id
+            self.counters['jobs'] += 1
+
+        try:
+            handle.task_queue.put({'job_id': job_id, 'params': params})
+            while True:
+                try:
+                    event = job_events.get(timeout=1.0)
+                except queue.Empty:
+                    if not handle.process.is_alive():
+                        crashed = True
+                        raise RuntimeError(f"推理进程异常退出 (exit code: {handle.process.exitcode})")
+                    continue
+
+                kind = event[0]
+                if kind == 'progress':
+                    if progress_callback:
+                        progress_callback(*event[2], **event[3])
+                elif kind == 'result':
+                    handle.model_stats = event[3]
+                    return event[2]
+                elif kind == 'error':
+                    handle.model_stats = event[3]
+                    raise RuntimeError(event[2])
+        except Exception:
+            with self.lock:
+                self.counters['errors'] += 1
+            raise
+        finally:
+            with self.lock:
+                self._pending.pop(job_id, None)
+            handle.jobs_done += 1
+            self._release_worker(handle, crashed)
+
+    def restart(self):
+        """Restart idle workers now and busy workers once their current job finishes"""
+        with self.lock:
+            if not self._started:
+                return
+            for handle in self.workers.values():
+                handle.recycle = True
+
+        # Cycle idle workers through acquire/release so they are replaced immediately
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker_id in idle:
+            with self.lock:
+                handle = self.workers.get(worker_id)
+            if handle is None:
+                self._idle.put(worker_id)
+            else:
+                self._release_worker(handle, crashed=False)
+
+    def shutdown(self):
+        """Stop all worker processes"""
+        with self.lock:
+            stopped = [self._detach_worker_locked(worker_id) for worker_id in list(self.workers.keys())]
+            self._started = False
+        for handle in stopped:
+            self._join_worker(handle, timeout=2.0)
+
+    def get_model_stats(self) -> Dict:
+        """Model cache stats last reported by each worker"""
+        with self.lock:
+            return {str(worker_id): handle.model_stats for worker_id, handle in self.workers.items()}
+
+    def stats(self) -> Dict:
+        """Pool and per-worker statistics"""
+        with self.lock:
+            return {
+                **self.counters,
+                'mode': 'process',
+                'size': self.size,
+                'max_jobs_per_worker': self.max_jobs_per_worker,
+                'workers': [
+                    {
+                        'worker_id': handle.worker_id,
+                        'pid': handle.process.pid,
+                        'alive': handle.process.is_alive(),
+                        'jobs_done': handle.jobs_done,
+                        'current_job': handle.current_job,
+                        'uptime': round(time.time() - handle.started_at, 1)
+                    }
+                    for handle in self.workers.values()
+                ]
+            }
+
+
+class InProcessInference:
+    """Runs separation jobs on the web process's own AudioSeparator"""
+
+    def __init__(self, audio_separator):
+        self.audio_separator = audio_separator
+        self.counters = {'jobs': 0, 'errors': 0}
+
+    def run(self, job_id: str, params: Dict, progress_callback: Optional[Callable] = None) -> Dict:
+        self.counters['jobs'] += 1
+        try:
+            return self.audio_separator.separate_track(progress_callback=progress_callback, **params)
+        except Exception:
+            self.counters['errors'] += 1
+            raise
+
+    def restart(self):
+        """Drop resident models; the next job reloads what it needs"""
+        self.audio_separator.model_registry.clear()
+
+    def shutdown(self):
+        pass
+
+    def get_model_stats(self) -> Dict:
+        return {'local': self.audio_separator.get_model_stats()}
+
+    def stats(self) -> Dict:
+        return {**self.counters, 'mode': 'thread', 'size': 1, 'workers': []}
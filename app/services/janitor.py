@@ -0,0 +1,231 @@
+import os
+import heapq
+import shutil
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Janitor:
+    """Evicts finished jobs and their files when their retention period ends
+
+    Jobs are kept in a heap ordered by expiry time, so the background thread
+    sleeps until exactly the next expiry instead of sweeping the upload and
+    output folders.
+    """
+
+    def __init__(self, config):
+        self.retention_seconds = max(0, getattr(config, 'FILE_RETENTION_MINUTES', 30)) * 60
+        # Folders that are never removed even when they become empty
+        self.roots = {os.path.abspath(getattr(config, 'UPLOAD_FOLDER', '')),
+                      os.path.abspath(getattr(config, 'OUTPUT_FOLDER', ''))}
+
+        # job_id -> {'paths': set, 'expires_at': float}
+        self._jobs: Dict[str, Dict] = {}
+        # (expires_at, job_id); entries whose expiry no longer matches _jobs are stale
+        self._heap: List = []
+        self._evict_callbacks: List[Callable[[str], None]] = []
+        # Returns True while a job is still queued or running; such jobs are postponed
+        self.is_active: Optional[Callable[[str], bool]] = None
+        self._thread = None
+        self._stopped = False
+        self.condition = threading.Condition()
+        self.counters = {
+            'evicted_jobs': 0,
+            'removed_files': 0,
+            'removed_dirs': 0,
+            'reclaimed_bytes': 0,
+            'postponed': 0,
+            'errors': 0
+        }
+
+    def add_evict_callback(self, callback: Callable[[str], None]):
+        """Register a callback run with the job_id of every evicted job (e.g. to drop its task record)"""
+        self._evict_callbacks.append(callback)
+
+    def track(self, job_id: str, paths: Iterable[str] = (), ttl: Optional[float] = None):
+        """
+        Add files to a job and (re)start its retention period
+
+        Args:
+            job_id: Job identifier
+            paths: Files or directories removed when the job expires
+            ttl: Seconds until expiry, FILE_RETENTION_MINUTES by default
+        """
+        if self.retention_seconds <= 0 and ttl is None:
+            return
+        expires_at = time.time() + (self.retention_seconds if ttl is None else ttl)
+        with self.condition:
+            entry = self._jobs.setdefault(job_id, {'paths': set(), 'expires_at': None})
+            entry['paths'].update(os.path.abspath(path) for path in paths if path)
+            entry['expires_at'] = expires_at
+            heapq.heappush(self._heap, (expires_at, job_id))
+            self._ensure_thread()
+            # Wake the thread in case this is now the earliest expiry
+            self.condition.notify()
+
+    def restore(self, jobs: Dict[str, Dict]):
+        """
+        Track jobs left over from a previous run
+
+        Args:
+            jobs: job_id -> {'paths', 'updated_at'}; each expires a retention period after updated_at
+        """
+        if self.retention_seconds <= 0 or not jobs:
+            return
+        with self.condition:
+            for job_id, job in jobs.items():
+                entry = self._jobs.setdefault(job_id, {'paths': set(), 'expires_at': None})
+                entry['paths'].update(job['paths'])
+                entry['expires_at'] = job['updated_at'] + self.retention_seconds
+                heapq.heappush(self._heap, (entry['expires_at'], job_id))
+            self._ensure_thread()
+            self.condition.notify()
+        logger.info(f"Janitor restored {len(jobs)} job(s) from the file index")
+
+    def forget(self, job_id: str) -> bool:
+        """Stop tracking a job whose files were removed some other way"""
+        with self.condition:
+            # Its heap entry becomes stale and is skipped
+            return self._jobs.pop(job_id, None) is not None
+
+    def clear(self):
+        with self.condition:
+            self._jobs.clear()
+            self._heap.clear()
+
+    def _ensure_thread(self):
+        """Start the eviction thread on first use (condition must be held)"""
+        if self._thread is None and not self._stopped:
+            self._thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+            self._thread.start()
+            logger.info(f"Janitor started, retention {self.retention_seconds // 60} minutes")
+
+    def shutdown(self):
+        with self.condition:
+            self._stopped = True
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                due = self._pop_due_locked()
+                while due is None:
+                    if self._stopped:
+                        return
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self.condition.wait(timeout)
+                    due = self._pop_due_locked()
+            self._evict(*due)
+
+    def _pop_due_locked(self):
+        """Remove and return (job_id, paths) of the next expired job, or None"""
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, job_id = heapq.heappop(self._heap)
+            entry = self._jobs.get(job_id)
+            if entry is None or entry['expires_at'] != expires_at:
+                continue
+            if self.is_active and self._is_active(job_id):
+                # 任务仍在排队或处理中，推迟一个保留周期
+                self.counters['postponed'] += 1
+                entry['expires_at'] = now + max(self.retention_seconds, 60)
+                heapq.heappush(self._heap, (entry['expires_at'], job_id))
+                continue
+            del self._jobs[job_id]
+            return job_id, entry['paths']
+        return None
+
+    def _is_active(self, job_id):
+        try:
+            return self.is_active(job_id)
+        except Exception as e:
+            logger.warning(f"Failed to check job {job_id} before eviction: {e}")
+            return False
+
+    def run_pending(self) -> int:
+        """Evict every job that has already expired; returns the number evicted"""
+        evicted = 0
+        while True:
+            with self.condition:
+                due = self._pop_due_locked()
+            if due is None:
+                return evicted
+            self._evict(*due)
+            evicted += 1
+
+    def _evict(self, job_id: str, paths: Iterable[str]):
+        reclaimed = 0
+        for path in paths:
+            try:
+                if os.path.isdir(path):
+                    size, files = _tree_size(path)
+                    shutil.rmtree(path)
+                    reclaimed += size
+                    self._count(removed_files=files, removed_dirs=1)
+                elif os.path.isfile(path):
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    reclaimed += size
+                    self._count(removed_files=1)
+                else:
+                    continue
+                self._remove_empty_parent(path)
+            except OSError as e:
+                logger.error(f"回收文件失败 {path}: {e}")
+                self._count(errors=1)
+
+        for callback in self._evict_callbacks:
+            try:
+                callback(job_id)
+            except Exception as e:
+                logger.error(f"Janitor callback failed for job {job_id}: {e}")
+                self._count(errors=1)
+
+        self._count(evicted_jobs=1, reclaimed_bytes=reclaimed)
+        logger.info(f"已回收过期任务 {job_id}: {reclaimed} 字节")
+
+    def _remove_empty_parent(self, path):
+        """Remove the parent directory (e.g. a dated output folder) once it is empty"""
+        parent = os.path.dirname(path)
+        if parent in self.roots:
+            return
+        try:
+            os.rmdir(parent)
+        except OSError:
+            # Not empty, or already gone
+            pass
+
+    def _count(self, **deltas):
+        with self.condition:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def stats(self) -> Dict:
+        """Eviction counters and the tracked jobs"""
+        with self.condition:
+            next_expiry = min((entry['expires_at'] for entry in self._jobs.values()), default=None)
+            return {
+                **self.counters,
+                'tracked_jobs': len(self._jobs),
+                'next_expiry_in_seconds': round(max(0.0, next_expiry - time.time()), 1) if next_expiry else None,
+                'retention_seconds': self.retention_seconds
+            }
+
+
+def _tree_size(path: str):
+    """(bytes, file count) of a single job directory"""
+    size = files = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_size, sub_files = _tree_size(entry.path)
+                size += sub_size
+                files += sub_files
+            else:
+                size += entry.stat(follow_symlinks=False).st_size
+                files += 1
+    return size, files
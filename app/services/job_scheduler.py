@@ -0,0 +1,174 @@
+import heapq
+import math
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """Bounded job queue feeding a fixed number of inference slots"""
+
+    def __init__(self, config):
+        self.slots = max(1, getattr(config, 'INFERENCE_SLOTS', 1))
+        # Jobs allowed to wait for a slot; 0 admits a job only when a slot is free
+        self.max_queued = max(0, getattr(config, 'MAX_QUEUED_JOBS', 10))
+        # Moving average of job duration, used for queue estimates
+        self.avg_job_seconds = float(getattr(config, 'ESTIMATED_JOB_SECONDS', 120))
+
+        self._queue = deque()  # (job_id, func, enqueued_at)
+        self._running: Dict[str, float] = {}  # job_id -> started_at
+        self._workers = []
+        self.condition = threading.Condition()
+        self.counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'cancelled': 0
+        }
+
+    def _ensure_workers(self):
+        """Start slot threads on first use (condition must be held)"""
+        if self._workers:
+            return
+        for i in range(self.slots):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-slot-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Job scheduler started with {self.slots} inference slot(s), queue limit {self.max_queued}")
+
+    def submit(self, job_id: str, func: Callable[[], None]) -> Dict:
+        """
+        Queue a job for execution
+
+        Args:
+            job_id: Job identifier
+            func: Callable that runs the job; returning False (or raising) counts the job as failed
+
+        Returns:
+            Queue information for the job
+
+        Raises:
+            QueueFullError: If the queue is full
+        """
+        with self.condition:
+            self._check_capacity_locked()
+            self._ensure_workers()
+            self._queue.append((job_id, func, time.time()))
+            self.counters['submitted'] += 1
+            self.condition.notify()
+            return self._job_info_locked(job_id)
+
+    def check_capacity(self):
+        """Raise QueueFullError if a new job would be rejected"""
+        with self.condition:
+            self._check_capacity_locked()
+
+    def _check_capacity_locked(self):
+        # Queued jobs that an idle slot is about to pick up are not waiting
+        waiting = len(self._queue) - (self.slots - len(self._running))
+        if waiting >= self.max_queued:
+            self.counters['rejected'] += 1
+            retry_after = max(1, math.ceil(self._slot_free_times()[0]))
+            raise QueueFullError(
+                f"Job queue is full ({max(0, waiting)}/{self.max_queued})",
+                retry_after=retry_after
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a job that has not started yet"""
+        with self.condition:
+            for item in self._queue:
+                if item[0] == job_id:
+                    self._queue.remove(item)
+                    self.counters['cancelled'] += 1
+                    return True
+            return False
+
+    def get_job_info(self, job_id: str) -> Optional[Dict]:
+        """Get queue position and estimated start time for a queued or running job"""
+        with self.condition:
+            return self._job_info_locked(job_id)
+
+    def _slot_free_times(self):
+        """Estimated seconds until each slot becomes free, soonest first (condition must be held)"""
+        now = time.time()
+        free_times = [max(0.0, self.avg_job_seconds - (now - started_at))
+                      for started_at in self._running.values()]
+        free_times.extend([0.0] * (self.slots - len(free_times)))
+        free_times.sort()
+        return free_times
+
+    def _job_info_locked(self, job_id: str) -> Optional[Dict]:
+        now = time.time()
+        if job_id in self._running:
+            return {
+                'state': 'running',
+                'queue_position': 0,
+                'estimated_start_time': self._running[job_id],
+                'estimated_wait_seconds': 0
+            }
+
+        free_times = self._slot_free_times()
+        heapq.heapify(free_times)
+        for position, (queued_id, _, enqueued_at) in enumerate(self._queue, start=1):
+            start_in = heapq.heappop(free_times)
+            if queued_id == job_id:
+                return {
+                    'state': 'queued',
+                    'queue_position': position,
+                    'queued_at': enqueued_at,
+                    'estimated_start_time': now + start_in,
+                    'estimated_wait_seconds': round(start_in, 1)
+                }
+            heapq.heappush(free_times, start_in + self.avg_job_seconds)
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self.condition:
+                while not self._queue:
+                    self.condition.wait()
+                job_id, func, _ = self._queue.popleft()
+                started_at = time.time()
+                self._running[job_id] = started_at
+
+            succeeded = True
+            try:
+                # The job callable reports its own errors (e.g. to the progress tracker) and returns False
+                succeeded = func() is not False
+            except Exception as e:
+                succeeded = False
+                logger.error(f"Job {job_id} failed in scheduler slot: {e}")
+            finally:
+                duration = time.time() - started_at
+                with self.condition:
+                    self._running.pop(job_id, None)
+                    self.counters['completed' if succeeded else 'failed'] += 1
+                    # Exponential moving average keeps estimates close to recent jobs
+                    self.avg_job_seconds = 0.7 * self.avg_job_seconds + 0.3 * duration
+                logger.info(f"Job {job_id} left scheduler slot after {duration:.1f}s")
+
+    def stats(self) -> Dict:
+        """Queue and slot statistics"""
+        with self.condition:
+            return {
+                **self.counters,
+                'queued': len(self._queue),
+                'running': len(self._running),
+                'slots': self.slots,
+                'max_queued': self.max_queued,
+                'avg_job_seconds': round(self.avg_job_seconds, 1)
+            }
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which a job no longer changes
+FINAL_STATUSES = ('completed', 'error')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    source      TEXT NOT NULL DEFAULT 'api',
+    status      TEXT NOT NULL,
+    progress    INTEGER NOT NULL DEFAULT 0,
+    version     INTEGER NOT NULL DEFAULT 0,
+    owner_pid   INTEGER,
+    data        TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+"""
+
+
+class JobStore:
+    """Durable job records in SQLite (WAL mode), shared by every worker process on the host"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite file path; None keeps the records in a private in-memory database
+        """
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self.uri = f"file:{os.path.abspath(db_path)}"
+        else:
+            # Shared cache so every thread's connection sees the same in-memory database
+            self.uri = f"file:jobstore-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.db_path = db_path
+        self._local = threading.local()
+        # Keeps an in-memory database alive while the store exists
+        self._keepalive = self._connect()
+        with self._keepalive:
+            self._keepalive.executescript(SCHEMA)
+        logger.info(f"Job store ready: {db_path or 'in-memory'}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.uri, uri=True, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.db_path:
+            # WAL lets readers in other processes proceed while one process writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Per-thread connection, reopened after a fork (e.g. gunicorn --preload)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def save(self, job_id: str, task: Dict, version: int = 0, source: str = 'api'):
+        """Insert or replace the full record of a job"""
+        now = time.time()
+        self.conn.execute(
+            """INSERT INTO jobs (job_id, source, status, progress, version, owner_pid, data, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(job_id) DO UPDATE SET
+                   status = excluded.status, progress = excluded.progress, version = excluded.version,
+                   owner_pid = excluded.owner_pid, data = excluded.data, updated_at = excluded.updated_at""",
+            (job_id, source, task.get('status', 'unknown'), int(task.get('progress') or 0), version,
+             os.getpid(), json.dumps(task, default=str), task.get('created_at') or task.get('started_at') or now, now)
+        )
+
+    def update(self, job_id: str, fields: Dict, source: str = 'api') -> Dict:
+        """Merge fields into a job record (created if missing) and return the merged record"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data, version FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            task = json.loads(row['data']) if row else {'job_id': job_id}
+            task.update(fields)
+            version = (row['version'] if row else 0) + 1
+            self.save(job_id, task, version=version, source=source)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return task
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def get_with_version(self, job_id: str):
+        """(record, version) or (None, None)"""
+        row = self.conn.execute("SELECT data, version FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row:
+            return None, None
+        return json.loads(row['data']), row['version']
+
+    def get_many(self, job_ids: Iterable[str]) -> Dict[str, Dict]:
+        job_ids = list(job_ids)
+        records = {}
+        # Stay below SQLite's bound-parameter limit
+        for i in range(0, len(job_ids), 500):
+            chunk = job_ids[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT job_id, data FROM jobs WHERE job_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            records.update({row['job_id']: json.loads(row['data']) for row in rows})
+        return records
+
+    def _where(self, status, source, since):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def list(self, status: Optional[str] = None, source: Optional[str] = None,
+             since: Optional[float] = None, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Jobs newest first, filtered through the status/created_at indexes"""
+        where, params = self._where(status, source, since)
+        rows = self.conn.execute(
+            f"SELECT data FROM jobs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def count(self, status: Optional[str] = None, source: Optional[str] = None,
+              since: Optional[float] = None) -> int:
+        where, params = self._where(status, source, since)
+        return self.conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+
+    def count_by_status(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def delete(self, job_id: str) -> bool:
+        return self.conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount > 0
+
+    def delete_finished_before(self, cutoff: float) -> int:
+        """Delete completed/failed jobs last updated before cutoff"""
+        return self.conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINAL_STATUSES))}) AND updated_at < ?",
+            FINAL_STATUSES + (cutoff,)
+        ).rowcount
+
+    def clear(self) -> int:
+        return self.conn.execute("DELETE FROM jobs").rowcount
+
+    def recover_orphans(self) -> int:
+        """
+        Fail unfinished jobs whose owning process no longer exists (e.g. after a restart)
+
+        Call at startup, before this process creates jobs: a record owned by our own pid
+        comes from a previous container run that reused the pid.
+        """
+        rows = self.conn.execute(
+            f"SELECT job_id, owner_pid FROM jobs WHERE status NOT IN ({','.join('?' * len(FINAL_STATUSES))})",
+            FINAL_STATUSES
+        ).fetchall()
+        recovered = 0
+        for row in rows:
+            if row['owner_pid'] and row['owner_pid'] != os.getpid() and _pid_alive(row['owner_pid']):
+                continue
+            self.update(row['job_id'], {'status': 'error', 'message': '服务重启，任务已中断'})
+            recovered += 1
+        if recovered:
+            logger.warning(f"Marked {recovered} interrupted job(s) as failed")
+        return recovered
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,164 @@
+import logging
+from typing import Callable, Dict, List, Optional
+
+from app.services.job_scheduler import QueueFullError
+from app.services.result_cache import hash_file, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class JobSubmitter:
+    """Starts separation jobs for every entry point (REST API and MCP)
+
+    Both entry points go through the same result cache, job queue, inference
+    pool and progress tracker, so a job started over MCP is deduplicated
+    against API jobs, waits in the same queue and reports the same progress.
+    """
+
+    def __init__(self, app, progress):
+        """
+        Args:
+            app: Flask application holding the services
+            progress: SSEManager tracking job progress
+        """
+        self.app = app
+        self.progress = progress
+
+    def validate(self, output_format: str, audio_quality: str):
+        """Raise ValueError for an unsupported output format or quality"""
+        config = self.app.config
+        if output_format not in config['SUPPORTED_OUTPUT_FORMATS']:
+            raise ValueError(f"不支持的输出格式: {output_format}。支持的格式: {config['SUPPORTED_OUTPUT_FORMATS']}")
+        if audio_quality not in config['AUDIO_QUALITY_SETTINGS']:
+            raise ValueError(f"不支持的音频质量: {audio_quality}。支持的质量: {list(config['AUDIO_QUALITY_SETTINGS'].keys())}")
+
+    def submit(self, job_id: str, file_path: str, model_name: str, stems: Optional[List[str]] = None,
+               output_format: Optional[str] = None, audio_quality: Optional[str] = None,
+               content_hash: Optional[str] = None, source: str = 'api', owns_input: bool = True,
+               on_rejected: Optional[Callable[[], None]] = None) -> Dict:
+        """
+        Queue a separation job, or reuse a finished or running job with the same input
+
+        Args:
+            job_id: Identifier for the new job
+            file_path: Input audio file
+            model_name: Demucs model
+            stems: Stems to keep, all stems when None
+            output_format, audio_quality: Encoding settings, the configured defaults when None
+            content_hash: SHA-256 of the input if already known (e.g. from a resumable upload)
+            source: Entry point recorded with the job ('api' or 'mcp')
+            owns_input: Whether the input file belongs to the job and is removed with it;
+                False for files the caller only points at (MCP file paths)
+            on_rejected: Called when the queue is full, before the job's files are removed;
+                used to hand a resumable upload back so it survives for a retry
+
+        Returns:
+            {'job_id', 'cache_state', 'queue_info'}; job_id differs from the one given
+            when an existing job is reused ('hit' or 'inflight'), and the reused job's
+            files are kept until every request sharing it has cleaned it up
+
+        Raises:
+            ValueError: Unsupported format or quality
+            QueueFullError: The job queue is full; the job's files have been removed
+        """
+        app = self.app
+        output_format = output_format or app.config['DEFAULT_OUTPUT_FORMAT']
+        audio_quality = audio_quality or app.config['DEFAULT_AUDIO_QUALITY']
+        self.validate(output_format, audio_quality)
+
+        # 相同内容和参数的结果直接复用，相同的进行中任务直接加入
+        cache_key = make_cache_key(
+            content_hash or hash_file(file_path),
+            model=model_name,
+            stems=sorted(stems) if stems else None,
+            output_format=output_format,
+            audio_quality=audio_quality,
+            **app.audio_separator.INFERENCE_PARAMS
+        )
+        cache_state, cached_job_id = app.result_cache.lookup_or_reserve(cache_key, job_id)
+        if cache_state != 'miss' and self.progress.get_progress(cached_job_id):
+            app.file_manager.cleanup_job_files(job_id)
+            # 复用的结果从本次请求起重新计算保留时间
+            app.janitor.track(cached_job_id)
+            logger.info(f"Result cache {cache_state} for {source} job, reusing job: {cached_job_id}")
+            return {'job_id': cached_job_id, 'cache_state': cache_state, 'queue_info': None}
+        if cache_state != 'miss':
+            # 任务记录已不存在，缓存条目失效，按新任务处理
+            app.result_cache.invalidate_job(cached_job_id)
+            app.result_cache.lookup_or_reserve(cache_key, job_id)
+
+        # Create job output directory
+        job_output_dir = app.file_manager.create_job_output_directory(job_id)
+
+        logger.info(f"Starting audio separation process for job: {job_id} ({source}), "
+                    f"format: {output_format}, quality: {audio_quality}")
+
+        # Register task in SSE manager
+        self.progress.create_task(job_id, status='queued', message='任务排队中', source=source)
+
+        progress = self.progress
+
+        # Define progress callback for SSE
+        def progress_callback(value, message="处理中", status="processing", details=None):
+            progress.update_progress(job_id, progress=value, message=message, status=status, details=details)
+
+        # Start processing thread; returns whether the job succeeded (the scheduler counts failures)
+        def process_thread():
+            try:
+                # Run demucs in the inference pool with format and quality parameters
+                result = app.inference_pool.run(job_id, {
+                    'input_file': file_path,
+                    'output_dir': job_output_dir,
+                    'model_name': model_name,
+                    'stems': stems,
+                    'output_format': output_format,
+                    'audio_quality': audio_quality
+                }, progress_callback=progress_callback)
+
+                if result and result.get('files'):
+                    # Extract file paths from result
+                    output_paths = [file_info['path'] for file_info in result['files']]
+                    app.file_manager.record_output_files(job_id, result['files'])
+                    app.result_cache.complete(cache_key, job_id, output_paths)
+                    # 保留时间从任务完成时开始计算
+                    app.janitor.track(job_id)
+
+                    # 音轨编码完成即可下载，ZIP在下载时流式生成
+                    output_files = [{key: file_info[key] for key in ('name', 'stem', 'format', 'size', 'path')}
+                                    for file_info in result['files']]
+                    progress.update_progress(job_id, progress=100,
+                                             message=f"音频分离完成，格式: {output_format.upper()}，质量: {audio_quality}",
+                                             status="completed", details={'output_files': output_files})
+
+                    logger.info(f"Audio separation completed for job: {job_id}, format: {output_format}, quality: {audio_quality}")
+                    return True
+                else:
+                    # If no output paths were returned, the separation failed
+                    app.result_cache.fail(cache_key, job_id)
+                    app.janitor.track(job_id)
+                    progress_callback(0, "处理失败", "error")
+                    logger.error(f"Audio separation failed for job: {job_id}")
+                    return False
+
+            except Exception as e:
+                logger.error(f"Error in audio separation thread: {str(e)}")
+                app.result_cache.fail(cache_key, job_id)
+                app.janitor.track(job_id)
+                progress_callback(0, f"错误: {str(e)}", "error")
+                return False
+
+        # Queue the job; inference slots are limited by the scheduler
+        try:
+            queue_info = app.job_scheduler.submit(job_id, process_thread)
+        except QueueFullError as e:
+            logger.warning(f"Rejected job {job_id}: {str(e)}")
+            app.result_cache.fail(cache_key, job_id)
+            self.progress.clean_task(job_id)
+            if on_rejected is not None:
+                on_rejected()
+            app.file_manager.cleanup_job_files(job_id)
+            raise
+
+        # 上传文件和输出目录在任务过期时由janitor回收；调用方指定的文件不属于任务，不回收
+        app.janitor.track(job_id, [file_path, job_output_dir] if owns_input else [job_output_dir])
+        return {'job_id': job_id, 'cache_state': 'miss', 'queue_info': queue_info}
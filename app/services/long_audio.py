@@ -0,0 +1,207 @@
+import os
+import math
+import logging
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+from demucs.audio import prevent_clip
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_SAMPLE = 4  # float32
+
+# apply_model keeps several full-length copies of the input (device copy, batch view,
+# shift padding) and of the output (accumulator, CPU copy, stem selection, resample)
+INPUT_COPIES = 3
+OUTPUT_COPIES = 3
+
+# Model weights, segment activations and interpreter overhead that do not scale with length
+FIXED_OVERHEAD_BYTES = 384 * 1024 * 1024
+
+# Windows shorter than this waste most of their time on segment padding
+MIN_WINDOW_SECONDS = 30.0
+
+
+def ffmpeg_codec_args(format_type: str, quality_settings: Dict) -> List[str]:
+    """ffmpeg output arguments for a format and quality preset"""
+    if format_type == 'mp3':
+        return ['-codec:a', 'libmp3lame', '-b:a', quality_settings.get('mp3_bitrate', '192k')]
+    if format_type == 'flac':
+        # 保持16位输出
+        return ['-codec:a', 'flac', '-sample_fmt', 's16']
+    if format_type == 'wav':
+        return ['-codec:a', 'pcm_s16le']
+    raise ValueError(f"不支持的音频格式: {format_type}")
+
+
+def estimate_bytes_per_second(samplerate: int, channels: int, sources: int) -> int:
+    """Peak bytes one second of audio costs during whole-track separation"""
+    frame_bytes = samplerate * channels * BYTES_PER_SAMPLE
+    return frame_bytes * (INPUT_COPIES + OUTPUT_COPIES * sources)
+
+
+def plan_windows(duration: float,
+                 memory_limit_bytes: int,
+                 samplerate: int,
+                 channels: int,
+                 sources: int,
+                 overlap_seconds: float,
+                 min_window_seconds: float,
+                 force: bool = False) -> Optional[Dict]:
+    """
+    Decide whether a track needs windowed separation and how large the windows are
+
+    Returns:
+        None if the whole track fits in the memory limit (and force is False),
+        otherwise a dict with window_seconds, overlap_seconds, windows and estimated_peak_bytes
+    """
+    per_second = estimate_bytes_per_second(samplerate, channels, sources)
+    whole_track_bytes = FIXED_OVERHEAD_BYTES + int(duration * per_second)
+    if whole_track_bytes <= memory_limit_bytes and not force:
+        return None
+
+    budget = max(0, memory_limit_bytes - FIXED_OVERHEAD_BYTES)
+    # Crossfading needs at least two overlaps per window
+    window_seconds = max(budget / per_second, min_window_seconds, 2 * overlap_seconds)
+    window_seconds = min(window_seconds, duration)
+    hop = window_seconds - overlap_seconds
+    windows = 1 if window_seconds >= duration else 1 + math.ceil((duration - window_seconds) / hop)
+
+    return {
+        'duration': round(duration, 2),
+        'window_seconds': round(window_seconds, 2),
+        'overlap_seconds': overlap_seconds,
+        'windows': windows,
+        'memory_limit_bytes': memory_limit_bytes,
+        'estimated_peak_bytes': FIXED_OVERHEAD_BYTES + int(window_seconds * per_second),
+        'whole_track_bytes': whole_track_bytes
+    }
+
+
+def decode_to_pcm_file(input_file: str, pcm_path: str, samplerate: int) -> None:
+    """Decode the first audio stream to raw interleaved float32 on disk"""
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-i', input_file,
+           '-map', '0:a:0', '-threads', '1', '-f', 'f32le', '-ar', str(samplerate), pcm_path]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode('utf-8', errors='replace') if e.stderr else ''
+        logger.error(f"ffmpeg解码失败: {stderr}")
+        raise RuntimeError(f"音频解码失败: {stderr}")
+    except FileNotFoundError:
+        logger.error("ffmpeg未找到，请确保已安装ffmpeg")
+        raise RuntimeError("ffmpeg未找到，无法解码音频")
+
+
+def open_pcm_file(pcm_path: str, channels: int) -> np.memmap:
+    """Memory-map a raw float32 file as [frames, channels]"""
+    frames = os.path.getsize(pcm_path) // (BYTES_PER_SAMPLE * channels)
+    return np.memmap(pcm_path, dtype=np.float32, mode='r', shape=(frames, channels))
+
+
+def iter_windows(total: int, window: int, overlap: int):
+    """Yield (start, end) sample ranges; consecutive windows share `overlap` samples"""
+    start = 0
+    while True:
+        end = min(start + window, total)
+        yield start, end
+        if end >= total:
+            break
+        start = end - overlap
+
+
+class WindowCrossfader:
+    """Joins overlapping window outputs with a linear crossfade"""
+
+    def __init__(self, overlap: int):
+        self.overlap = overlap
+        self.fade_in = torch.linspace(0.0, 1.0, overlap) if overlap else None
+        self.tail = None
+
+    def push(self, chunk: torch.Tensor, last: bool) -> torch.Tensor:
+        """
+        Add the output of the next window ([..., time]) and return the samples that are final
+
+        The last `overlap` samples of every window but the last are held back
+        until the next window arrives.
+        """
+        if self.tail is not None:
+            head = chunk[..., :self.overlap]
+            chunk = chunk.clone()
+            chunk[..., :self.overlap] = self.tail * (1 - self.fade_in) + head * self.fade_in
+
+        if last or not self.overlap:
+            self.tail = None
+            return chunk
+
+        self.tail = chunk[..., -self.overlap:].clone()
+        return chunk[..., :-self.overlap]
+
+
+class StreamingEncoder:
+    """ffmpeg process that encodes audio written to its stdin chunk by chunk"""
+
+    def __init__(self, output_path: str, format_type: str, quality_settings: Dict,
+                 input_samplerate: int, output_samplerate: int, channels: int):
+        self.output_path = output_path
+        cmd = ['ffmpeg', '-y', '-loglevel', 'error',
+               '-f', 'f32le', '-ar', str(input_samplerate), '-ac', str(channels), '-i', 'pipe:0',
+               '-ar', str(output_samplerate)]
+        cmd.extend(ffmpeg_codec_args(format_type, quality_settings))
+        cmd.append(output_path)
+        # stderr写入临时文件而不是管道：编码期间没有人读取，管道写满后ffmpeg会阻塞，write()随之卡住
+        self.stderr = tempfile.TemporaryFile()
+        try:
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.stderr)
+        except FileNotFoundError:
+            self.stderr.close()
+            logger.error("ffmpeg未找到，请确保已安装ffmpeg")
+            raise RuntimeError("ffmpeg未找到，无法转换音频格式")
+
+    def write(self, audio: torch.Tensor):
+        """Append a [channels, time] chunk"""
+        # 整个音轨的峰值未知，无法像save_audio那样整体缩放，只能截断
+        wav = prevent_clip(audio.detach().cpu().float(), mode='clamp')
+        try:
+            self.process.stdin.write(wav.t().contiguous().numpy().tobytes())
+        except BrokenPipeError as e:
+            # ffmpeg提前退出：报告它的退出码和错误输出，而不是管道错误
+            raise self._failure() from e
+
+    def close(self) -> str:
+        """Finish encoding and wait for ffmpeg; returns the output path"""
+        if not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        if self.process.wait() != 0:
+            raise self._failure()
+        self.stderr.close()
+        return self.output_path
+
+    def _failure(self) -> RuntimeError:
+        """Encoder error carrying ffmpeg's exit code and stderr (ffmpeg has exited or is exiting)"""
+        returncode = self.process.wait()
+        self.stderr.seek(0)
+        stderr = self.stderr.read().decode('utf-8', errors='replace').strip()
+        logger.error(f"ffmpeg编码失败（退出码 {returncode}）: {stderr}")
+        return RuntimeError(f"音频格式转换失败（ffmpeg退出码 {returncode}）: {stderr}")
+
+    def abort(self):
+        """Kill ffmpeg and drop the partial output"""
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        if not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        self.stderr.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
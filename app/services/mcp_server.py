@@ -3,19 +3,43 @@
 基于JSON-RPC 2.0协议的单一端点通信
 """
 
+import os
+import re
 import uuid
 import time
 import json
+import base64
+import asyncio
 import logging
 import threading
-import queue
-from typing import Any, Dict, List, Optional, Union
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Union
 from dataclasses import dataclass
 from enum import Enum
 from flask import current_app
 
+from app.services.job_store import JobStore, FINAL_STATUSES
+from app.services.job_scheduler import QueueFullError
+from app.services.stream_buffer import RESOURCE_UPDATED, StreamBuffer
+from app.utils.helpers import AUDIO_MIME_TYPES, allowed_file
+
 logger = logging.getLogger(__name__)
 
+# 推理进度中转发给MCP流的字段（分段进度、吞吐量和剩余时间）
+PROGRESS_DETAIL_FIELDS = ('segments_done', 'segments_total', 'samples_per_second', 'eta_seconds')
+
+# demucs://jobs/{job_id} 和 demucs://jobs/{job_id}/stems/{stem}
+JOB_RESOURCE_URI = re.compile(r'^demucs://jobs/(?P<job_id>[^/]+)(?:/stems/(?P<stem>[^/]+))?$')
+
+# resources/list 中列出音轨的最近完成任务数
+RESOURCE_LIST_JOBS = 50
+
+
+def is_notification(request_data: Any) -> bool:
+    """JSON-RPC通知：没有id成员的请求，不返回响应"""
+    return isinstance(request_data, dict) and "id" not in request_data
+
 class MCPVersion(str, Enum):
     """MCP协议版本"""
     V1_0 = "1.0"
@@ -49,10 +73,30 @@ class MCPServer:
     def __init__(self, name: str = "demucs-audio-separator", version: str = "1.0.0"):
         self.name = name
         self.version = version
-        self.streams: Dict[str, queue.Queue] = {}
-        self.jobs: Dict[str, Dict[str, Any]] = {}
+        # stream_id -> 有界事件缓冲；没有读取方的流按空闲超时回收
+        self.streams: Dict[str, StreamBuffer] = {}
+        self.stream_max_events = 64
+        self.stream_max_bytes = 256 * 1024
+        self.stream_idle_seconds = 300
+        self.stream_counters = {"created": 0, "closed": 0, "reaped": 0, "dropped_events": 0, "coalesced_events": 0}
+        self._last_reap = 0.0
+        # 批量请求中的调用在有界线程池中并发执行，首次使用时创建
+        self.batch_workers = 8
+        self.batch_max_requests = 100
+        self._batch_pool = None
+        # 资源订阅：job_id -> 订阅的会话（会话的流为 /mcp/stream/<session_id>），以及最近通知的任务状态
+        self.subscriptions: Dict[str, Set[str]] = {}
+        self._subscribed_state: Dict[str, str] = {}
+        # 其他工作进程的任务没有本地变化通知：job_id -> 最近看到的存储版本号，由后台线程轮询任务存储
+        self._remote_versions: Dict[str, Optional[int]] = {}
+        self.subscription_poll_interval = 0.5
+        self._poller = None
+        # 任务状态存放在共享的JobStore中，set_app后与API任务使用同一个存储
+        self.job_store = JobStore()
         self.lock = threading.Lock()
         self.app = None
+        # 与 /api/process 共用的任务提交服务（JobSubmitter），路由初始化时设置
+        self.submitter = None
         
         # 服务器能力
         self.capabilities = {
@@ -92,7 +136,15 @@ class MCPServer:
                                 "type": "string",
                                 "enum": ["vocals", "drums", "bass", "other", "piano", "guitar"]
                             },
-                            "description": "要分离的音轨类型"
+                            "description": "要分离的音轨类型，默认为模型的全部音轨"
+                        },
+                        "output_format": {
+                            "type": "string",
+                            "description": "输出格式（见 /api/formats），默认为服务配置的格式"
+                        },
+                        "audio_quality": {
+                            "type": "string",
+                            "description": "输出质量（见 /api/qualities），默认为服务配置的质量"
                         },
                         "stream_progress": {
                             "type": "boolean",
@@ -147,9 +199,155 @@ class MCPServer:
     def set_app(self, app):
         """设置Flask应用实例"""
         self.app = app
+        if getattr(app, 'job_store', None) is not None:
+            self.job_store = app.job_store
+        self.stream_max_events = app.config.get('MCP_STREAM_MAX_EVENTS', self.stream_max_events)
+        self.stream_max_bytes = app.config.get('MCP_STREAM_MAX_BYTES', self.stream_max_bytes)
+        self.stream_idle_seconds = app.config.get('MCP_STREAM_IDLE_SECONDS', self.stream_idle_seconds)
+        self.batch_workers = app.config.get('MCP_BATCH_WORKERS', self.batch_workers)
+        self.batch_max_requests = app.config.get('MCP_BATCH_MAX_REQUESTS', self.batch_max_requests)
+        self.subscription_poll_interval = app.config.get('MCP_SUBSCRIPTION_POLL_SECONDS', self.subscription_poll_interval)
+    
+    def attach_submitter(self, submitter):
+        """使用与API相同的任务提交服务，并把任务进度转发到对应的MCP流"""
+        self.submitter = submitter
+        submitter.progress.add_watcher(self._on_job_change)
+    
+    def _on_job_change(self, job_id: str, task: Dict[str, Any]):
+        """任务状态变化回调（进度管理器释放锁后按版本顺序调用，只做非阻塞的入队）"""
+        if job_id not in self.streams and job_id not in self.subscriptions:
+            return
+        event = self._job_event(job_id, task)
+        if job_id in self.streams:
+            self.send_to_stream(job_id, event)
+            if event["type"] != "progress":
+                self.send_to_stream(job_id, {"type": "end", "job_id": job_id})
+        self._notify_subscribers(job_id, event)
+    
+    def _notify_subscribers(self, job_id: str, event: Dict[str, Any]):
+        """向订阅了任务资源的会话推送更新通知；状态与上次通知相同时不推送"""
+        state = json.dumps(event, sort_keys=True, default=str)
+        with self.lock:
+            sessions = self.subscriptions.get(job_id)
+            if not sessions or self._subscribed_state.get(job_id) == state:
+                return
+            self._subscribed_state[job_id] = state
+            sessions = list(sessions)
+        notification = self._resource_updated(job_id, status=event["status"], job=event)
+        for session_id in sessions:
+            self.send_to_stream(session_id, notification)
+    
+    def _resource_updated(self, job_id: str, **params) -> Dict[str, Any]:
+        """任务资源的更新通知（JSON-RPC通知，附带最新状态，客户端无需再读取资源）"""
+        return {
+            "jsonrpc": "2.0",
+            "method": RESOURCE_UPDATED,
+            "params": {"uri": f"demucs://jobs/{job_id}", **params}
+        }
+    
+    def job_update(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务资源当前状态的更新通知；任务不存在时返回None"""
+        record = self._job_record(job_id)
+        if record is None:
+            return None
+        event = self._job_event(job_id, record)
+        return self._resource_updated(job_id, status=event["status"], job=event)
+    
+    def forget_job(self, job_id: str):
+        """任务过期时移除它的订阅，并通知订阅方资源已不存在"""
+        with self.lock:
+            sessions = self.subscriptions.pop(job_id, ())
+            self._subscribed_state.pop(job_id, None)
+            self._remote_versions.pop(job_id, None)
+        notification = self._resource_updated(job_id, expired=True)
+        for session_id in sessions:
+            self.send_to_stream(session_id, notification)
     
-    def handle_jsonrpc_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """处理JSON-RPC请求"""
+    def drop_session(self, session_id: str):
+        """移除会话的全部订阅（会话的流被回收或会话结束时调用）"""
+        with self.lock:
+            for job_id in [job_id for job_id, sessions in self.subscriptions.items() if session_id in sessions]:
+                sessions = self.subscriptions[job_id]
+                sessions.discard(session_id)
+                if not sessions:
+                    del self.subscriptions[job_id]
+                    self._subscribed_state.pop(job_id, None)
+                    self._remote_versions.pop(job_id, None)
+    
+    def _poll_remote_subscriptions(self):
+        """后台线程：轮询任务存储中被订阅的其他进程任务，版本变化时通知订阅方；没有这类订阅时退出"""
+        while True:
+            time.sleep(self.subscription_poll_interval)
+            with self.lock:
+                if not self._remote_versions:
+                    self._poller = None
+                    return
+                watched = dict(self._remote_versions)
+            for job_id, version in watched.items():
+                try:
+                    record, current = self.job_store.get_with_version(job_id)
+                except Exception as e:
+                    logger.error(f"轮询订阅任务 {job_id} 失败: {str(e)}")
+                    continue
+                if record is None:
+                    # 所属进程已回收该任务
+                    self.forget_job(job_id)
+                    continue
+                if current == version:
+                    continue
+                with self.lock:
+                    if job_id not in self._remote_versions:
+                        continue
+                    self._remote_versions[job_id] = current
+                self._notify_subscribers(job_id, self._job_event(job_id, record))
+    
+    def _job_event(self, job_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+        """把任务记录转换为MCP流事件"""
+        status = task.get("status")
+        event = {
+            "job_id": job_id,
+            "progress": task.get("progress", 0),
+            "message": task.get("message")
+        }
+        if status == "completed":
+            event.update(type="completed", status="completed", output_files=self._stem_resources(job_id, task))
+        elif status == "error":
+            event.update(type="error", status="error")
+        else:
+            # 推理阶段的状态文本（如"正在处理音频"、"保存音轨文件"）作为stage
+            event.update(type="progress", status="queued" if status == "queued" else "processing", stage=status)
+            event.update({key: task[key] for key in PROGRESS_DETAIL_FIELDS if key in task})
+        return event
+    
+    def _stem_resources(self, job_id: str, task: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """已完成任务的音轨，作为MCP资源描述（不暴露服务器路径）"""
+        resources = []
+        for output in task.get("output_files") or []:
+            if not isinstance(output, dict):
+                continue
+            resources.append({
+                "uri": f"demucs://jobs/{job_id}/stems/{output['stem']}",
+                "name": output["name"],
+                "description": f"{output['stem']} 音轨（任务 {job_id}）",
+                "mimeType": AUDIO_MIME_TYPES.get(output.get("format"), "application/octet-stream"),
+                "size": output.get("size"),
+                "downloadUrl": f"/api/download/{job_id}/{output['stem']}"
+            })
+        return resources
+    
+    def _job_record(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务记录：优先使用进度管理器（本进程的最新状态），否则读取共享存储"""
+        if self.submitter is not None:
+            return self.submitter.progress.get_progress(job_id)
+        return self.job_store.get(job_id)
+    
+    def active_job_count(self) -> int:
+        """未结束的任务数（所有工作进程）"""
+        return sum(count for status, count in self.job_store.count_by_status().items()
+                   if status not in FINAL_STATUSES)
+    
+    def handle_jsonrpc_request(self, request_data: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+        """处理JSON-RPC请求；session_id 为请求的 Mcp-Session-Id，资源订阅通知发送到该会话的流"""
         try:
             # 验证JSON-RPC格式
             if request_data.get("jsonrpc") != "2.0":
@@ -177,6 +375,12 @@ class MCPServer:
                 result = self._handle_resources_list(params)
             elif method == "resources/read":
                 result = self._handle_resources_read(params)
+            elif method == "resources/templates/list":
+                result = self._handle_resource_templates_list(params)
+            elif method == "resources/subscribe":
+                result = self._handle_resources_subscribe(params, session_id or params.get("sessionId"))
+            elif method == "resources/unsubscribe":
+                result = self._handle_resources_unsubscribe(params, session_id or params.get("sessionId"))
             else:
                 return self._create_error_response(
                     request_id, -32601, "Method not found", f"Unknown method: {method}"
@@ -190,6 +394,40 @@ class MCPServer:
                 request_data.get("id"), -32603, "Internal error", str(e)
             )
     
+    def handle_batch(self, batch: List[Any], session_id: Optional[str] = None) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        处理JSON-RPC批量请求
+        
+        批量中的调用互不依赖，在有界线程池中并发执行；响应按请求顺序返回，通知不返回响应。
+        空批量或超过数量上限时返回单个Invalid Request错误。
+        """
+        if not batch:
+            return self._create_error_response(None, -32600, "Invalid Request", "Empty batch")
+        if len(batch) > self.batch_max_requests:
+            return self._create_error_response(
+                None, -32600, "Invalid Request", f"Batch too large: {len(batch)} > {self.batch_max_requests}"
+            )
+        
+        if len(batch) == 1 or self.batch_workers <= 1:
+            responses = [self._handle_batch_entry(entry, session_id) for entry in batch]
+        else:
+            responses = list(self._get_batch_pool().map(self._handle_batch_entry, batch, [session_id] * len(batch)))
+        return [response for entry, response in zip(batch, responses) if not is_notification(entry)]
+    
+    def _handle_batch_entry(self, entry: Any, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """在应用上下文中处理批量中的一个请求（可能在线程池中执行）"""
+        if not isinstance(entry, dict):
+            return self._create_error_response(None, -32600, "Invalid Request", "Request must be an object")
+        with self.app.app_context() if self.app is not None else nullcontext():
+            return self.handle_jsonrpc_request(entry, session_id)
+    
+    def _get_batch_pool(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self._batch_pool is None:
+                self._batch_pool = ThreadPoolExecutor(max_workers=self.batch_workers,
+                                                      thread_name_prefix="mcp-batch")
+            return self._batch_pool
+    
     def _handle_initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """处理初始化请求"""
         return {
@@ -223,8 +461,29 @@ class MCPServer:
             raise ValueError(f"Unknown tool: {tool_name}")
     
     def _handle_resources_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """处理资源列表请求"""
-        return {"resources": self.resources}
+        """处理资源列表请求：静态资源和最近完成任务的音轨"""
+        resources = list(self.resources)
+        for job in self.job_store.list(status="completed", limit=RESOURCE_LIST_JOBS):
+            resources.extend(self._stem_resources(job["job_id"], job))
+        return {"resources": resources}
+    
+    def _handle_resource_templates_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """处理资源模板列表请求"""
+        return {
+            "resourceTemplates": [
+                {
+                    "uriTemplate": "demucs://jobs/{job_id}",
+                    "name": "Separation job",
+                    "description": "分离任务的状态和音轨列表",
+                    "mimeType": "application/json"
+                },
+                {
+                    "uriTemplate": "demucs://jobs/{job_id}/stems/{stem}",
+                    "name": "Separated stem",
+                    "description": "已完成任务的单个音轨音频"
+                }
+            ]
+        }
     
     def _handle_resources_read(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """处理资源读取请求"""
@@ -235,6 +494,54 @@ class MCPServer:
         
         return self._read_resource(uri)
     
+    def _subscription_target(self, params: Dict[str, Any], session_id: Optional[str]) -> str:
+        """校验订阅参数，返回任务ID"""
+        uri = params.get("uri")
+        if not uri:
+            raise ValueError("Resource URI is required")
+        if not session_id:
+            raise ValueError("Subscriptions need a session: send the Mcp-Session-Id header "
+                             "and read notifications from /mcp/stream/<session_id>")
+        match = JOB_RESOURCE_URI.match(uri)
+        if not match or match.group("stem"):
+            raise ValueError(f"Only job resources (demucs://jobs/{{job_id}}) can be subscribed: {uri}")
+        return match.group("job_id")
+    
+    def _handle_resources_subscribe(self, params: Dict[str, Any], session_id: Optional[str]) -> Dict[str, Any]:
+        """订阅任务资源：任务状态变化时向会话的流推送 notifications/resources/updated"""
+        job_id = self._subscription_target(params, session_id)
+        record = self._job_record(job_id)
+        if record is None:
+            raise ValueError(f"Job not found: {job_id}")
+        state = json.dumps(self._job_event(job_id, record), sort_keys=True, default=str)
+        # 本进程的任务由进度管理器推送变化；其他工作进程的任务轮询共享的任务存储
+        remote = self.submitter is None or not self.submitter.progress.is_local(job_id)
+        version = self.job_store.get_with_version(job_id)[1] if remote else None
+        with self.lock:
+            self.subscriptions.setdefault(job_id, set()).add(session_id)
+            self._subscribed_state.setdefault(job_id, state)
+            if remote:
+                self._remote_versions.setdefault(job_id, version)
+                if self._poller is None or not self._poller.is_alive():
+                    self._poller = threading.Thread(target=self._poll_remote_subscriptions,
+                                                    name="mcp-subscription-poll", daemon=True)
+                    self._poller.start()
+        logger.info(f"MCP会话 {session_id} 订阅任务资源: {job_id}")
+        return {}
+    
+    def _handle_resources_unsubscribe(self, params: Dict[str, Any], session_id: Optional[str]) -> Dict[str, Any]:
+        """取消订阅任务资源"""
+        job_id = self._subscription_target(params, session_id)
+        with self.lock:
+            sessions = self.subscriptions.get(job_id)
+            if sessions is not None:
+                sessions.discard(session_id)
+                if not sessions:
+                    del self.subscriptions[job_id]
+                    self._subscribed_state.pop(job_id, None)
+                    self._remote_versions.pop(job_id, None)
+        return {}
+    
     def _get_models(self) -> Dict[str, Any]:
         """获取模型列表"""
         return {
@@ -276,88 +583,144 @@ class MCPServer:
         """获取任务状态"""
         job_id = arguments.get("job_id")
         
-        with self.lock:
-            if job_id in self.jobs:
-                job_info = self.jobs[job_id]
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps(job_info, indent=2)
-                    }]
-                }
-            else:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps({
-                            "error": f"Job {job_id} not found"
-                        }, indent=2)
-                    }]
-                }
-    
-    def _separate_audio(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """执行音频分离"""
-        import os
-        
-        file_path = arguments.get("file_path")
-        model = arguments.get("model", "htdemucs")
-        stems = arguments.get("stems", ["vocals", "drums", "bass", "other"])
-        stream_progress = arguments.get("stream_progress", True)
-        
-        # 验证文件路径
-        if not os.path.exists(file_path):
+        # API和MCP创建的任务都可以查询，与处理请求的工作进程无关
+        job_info = self._job_record(job_id) if job_id else None
+        if job_info is not None:
+            job_info = dict(job_info)
+            if job_info.get("status") == "completed":
+                job_info["output_files"] = self._stem_resources(job_id, job_info)
+            job_info.pop("result_file", None)
+            return {
+                "content": [{
+                    "type": "text",
+                    "text": json.dumps(job_info, indent=2)
+                }]
+            }
+        else:
             return {
                 "content": [{
                     "type": "text",
                     "text": json.dumps({
-                        "error": f"File not found: {file_path}"
+                        "error": f"Job {job_id} not found"
                     }, indent=2)
                 }]
             }
+    
+    def _separate_audio(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """执行音频分离：与 /api/process 使用相同的缓存、队列、推理和进度"""
+        file_path = arguments.get("file_path")
+        model = arguments.get("model", "htdemucs")
+        stems = arguments.get("stems") or None
+        stream_progress = arguments.get("stream_progress", True)
+        
+        # 验证文件路径
+        if not file_path or not os.path.isfile(file_path):
+            return self._text_content({"error": f"File not found: {file_path}"})
+        if not allowed_file(file_path):
+            return self._text_content({"error": f"Unsupported file format: {file_path}"})
+        if self.submitter is None:
+            return self._text_content({"error": "Separation service is not available"})
         
         # 生成任务ID
         job_id = str(uuid.uuid4())
         
-        # 初始化任务信息
-        job_info = {
+        try:
+            # 调用方指定的文件不属于任务，任务过期时不删除
+            submitted = self.submitter.submit(
+                job_id, file_path, model,
+                stems=stems,
+                output_format=arguments.get("output_format"),
+                audio_quality=arguments.get("audio_quality"),
+                source="mcp",
+                owns_input=False
+            )
+        except QueueFullError as e:
+            return self._text_content({"error": str(e), "retry_after": e.retry_after})
+        except ValueError as e:
+            return self._text_content({"error": str(e)})
+        
+        job_id = submitted["job_id"]
+        record = self._job_record(job_id) or {}
+        queue_info = submitted["queue_info"] or {}
+        return self._text_content({
             "job_id": job_id,
-            "status": "started",
-            "file_path": file_path,
-            "model": model,
-            "stems": stems,
-            "progress": 0,
-            "message": "任务已创建",
+            "status": record.get("status", "queued"),
+            "message": "音频分离任务已开始",
+            "cached": submitted["cache_state"] == "hit",
+            "deduplicated": submitted["cache_state"] == "inflight",
+            "queue_position": queue_info.get("queue_position"),
             "stream_url": f"/mcp/stream/{job_id}" if stream_progress else None,
-            "created_at": time.time()
+            "resource_uri": f"demucs://jobs/{job_id}",
+            "model": model,
+            "stems": stems
+        })
+    
+    def _text_content(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """工具调用结果：JSON文本内容"""
+        return {
+            "content": [{
+                "type": "text",
+                "text": json.dumps(data, indent=2, ensure_ascii=False)
+            }]
         }
+    
+    def _read_job_resource(self, uri: str, job_id: str, stem: Optional[str]) -> Dict[str, Any]:
+        """读取任务资源（状态JSON）或音轨资源（音频数据）"""
+        record = self._job_record(job_id)
+        if record is None:
+            raise ValueError(f"Unknown resource: {uri}")
+        stems = self._stem_resources(job_id, record) if record.get("status") == "completed" else []
         
-        with self.lock:
-            self.jobs[job_id] = job_info
+        if stem is None:
+            return {
+                "contents": [{
+                    "uri": uri,
+                    "mimeType": "application/json",
+                    "text": json.dumps({
+                        "job_id": job_id,
+                        "status": record.get("status"),
+                        "progress": record.get("progress"),
+                        "message": record.get("message"),
+                        "stems": stems
+                    }, indent=2, ensure_ascii=False)
+                }]
+            }
         
-        # 如果启用流式输出，启动处理线程
-        if stream_progress:
-            threading.Thread(
-                target=self._simulate_audio_processing_with_context,
-                args=(job_id, file_path, model, stems),
-                daemon=True
-            ).start()
+        resource = next((r for r in stems if r["uri"] == uri), None)
+        output = next((o for o in record.get("output_files") or []
+                       if isinstance(o, dict) and o.get("stem") == stem), None)
+        if resource is None or output is None or not os.path.isfile(output["path"]):
+            raise ValueError(f"Unknown resource: {uri}")
         
+        max_bytes = self.app.config.get("MCP_RESOURCE_MAX_BYTES", 0) if self.app else 0
+        size = os.path.getsize(output["path"])
+        if max_bytes and size > max_bytes:
+            # 音轨太大，不内联，返回HTTP下载地址
+            return {
+                "contents": [{
+                    "uri": uri,
+                    "mimeType": "application/json",
+                    "text": json.dumps({
+                        "error": f"Stem is {size} bytes, larger than the inline limit of {max_bytes} bytes",
+                        "downloadUrl": resource["downloadUrl"]
+                    }, indent=2)
+                }]
+            }
+        with open(output["path"], "rb") as f:
+            blob = base64.b64encode(f.read()).decode("ascii")
         return {
-            "content": [{
-                "type": "text",
-                "text": json.dumps({
-                    "job_id": job_id,
-                    "status": "started",
-                    "message": "音频分离任务已开始",
-                    "stream_url": f"/mcp/stream/{job_id}" if stream_progress else None,
-                    "model": model,
-                    "stems": stems
-                }, indent=2)
+            "contents": [{
+                "uri": uri,
+                "mimeType": resource["mimeType"],
+                "blob": blob
             }]
         }
     
     def _read_resource(self, uri: str) -> Dict[str, Any]:
         """读取资源内容"""
+        match = JOB_RESOURCE_URI.match(uri)
+        if match:
+            return self._read_job_resource(uri, match.group("job_id"), match.group("stem"))
         
         if uri == "demucs://docs/api":
             return {
@@ -376,8 +739,11 @@ Demucs音频分离MCP服务器提供基于深度学习的音频源分离功能
 - **file_path**: 音频文件路径
 - **model**: 使用的模型 (htdemucs, htdemucs_ft, htdemucs_6s, mdx, mdx_q)
 - **stems**: 要分离的音轨类型数组
+- **output_format** / **audio_quality**: 输出格式和质量
 - **stream_progress**: 是否启用流式进度输出
 
+任务与 `/api/process` 共用结果缓存和任务队列，相同文件和参数会直接复用已有结果。
+
 ### get_models
 获取可用的Demucs模型列表
 
@@ -386,7 +752,12 @@ Demucs音频分离MCP服务器提供基于深度学习的音频源分离功能
 - **job_id**: 任务ID
 
 ## 流式输出
-当启用stream_progress时，可以通过SSE端点 `/mcp/stream/{job_id}` 获取实时进度更新。
+当启用stream_progress时，可以通过SSE端点 `/mcp/stream/{job_id}` 获取实时进度更新，
+包括分段进度（segments_done/segments_total）、剩余时间（eta_seconds）和音轨保存进度。
+
+## 任务资源
+- `demucs://jobs/{job_id}`: 任务状态和音轨列表
+- `demucs://jobs/{job_id}/stems/{stem}`: 已完成任务的音轨音频（base64）
 
 ## JSON-RPC 2.0 协议
 所有通信均通过单一端点 `/mcp` 进行，使用标准JSON-RPC 2.0消息格式。
@@ -454,168 +825,174 @@ Demucs音频分离MCP服务器提供基于深度学习的音频源分离功能
         else:
             raise ValueError(f"Unknown resource: {uri}")
     
-    def _simulate_audio_processing_with_context(self, job_id: str, file_path: str, model: str, stems: List[str]):
-        """带应用上下文的音频处理"""
-        if self.app:
-            with self.app.app_context():
-                self._simulate_audio_processing(job_id, file_path, model, stems)
-        else:
-            self._simulate_audio_processing(job_id, file_path, model, stems)
+    def create_stream(self, stream_id: str) -> StreamBuffer:
+        """创建一个新的有界流缓冲；同一ID的旧流被关闭（其读取方收到结束）"""
+        stream = StreamBuffer(self.stream_max_events, self.stream_max_bytes)
+        with self.lock:
+            previous = self.streams.get(stream_id)
+            self.streams[stream_id] = stream
+            self.stream_counters["created"] += 1
+        if previous is not None:
+            self._retire_stream(previous)
+        logger.info(f"创建MCP流: {stream_id}")
+        self.reap_idle_streams()
+        return stream
     
-    def _simulate_audio_processing(self, job_id: str, file_path: str, model: str, stems: List[str]):
-        """模拟音频处理过程"""
-        
-        try:
-            # 更新任务状态为处理中
-            with self.lock:
-                if job_id in self.jobs:
-                    self.jobs[job_id].update({
-                        "status": "processing",
-                        "message": "正在初始化音频处理"
-                    })
-            
-            # 发送初始进度
-            self.send_to_stream(job_id, {
-                "type": "progress",
-                "job_id": job_id,
-                "progress": 0,
-                "status": "processing",
-                "message": "正在加载模型..."
-            })
-            
-            # 模拟处理进度
-            for i in range(1, 101):
-                time.sleep(0.1)  # 模拟处理时间
-                
-                # 生成进度消息
-                if i < 20:
-                    message = f"正在加载 {model} 模型..."
-                elif i < 40:
-                    message = "正在分析音频频谱..."
-                elif i < 80:
-                    message = f"正在分离音轨 ({', '.join(stems)})..."
-                else:
-                    message = "正在保存结果文件..."
-                
-                # 更新任务状态
-                with self.lock:
-                    if job_id in self.jobs:
-                        self.jobs[job_id].update({
-                            "progress": i,
-                            "message": message
-                        })
-                
-                # 发送进度更新
-                self.send_to_stream(job_id, {
-                    "type": "progress",
-                    "job_id": job_id,
-                    "progress": i,
-                    "status": "processing",
-                    "message": message
-                })
-            
-            # 处理完成
-            output_files = [f"{file_path.rsplit('.', 1)[0]}_{stem}.wav" for stem in stems]
-            
-            with self.lock:
-                if job_id in self.jobs:
-                    self.jobs[job_id].update({
-                        "status": "completed",
-                        "progress": 100,
-                        "message": "音频分离完成",
-                        "output_files": output_files,
-                        "completed_at": time.time()
-                    })
-            
-            # 发送完成通知
-            self.send_to_stream(job_id, {
-                "type": "completed",
-                "job_id": job_id,
-                "progress": 100,
-                "status": "completed",
-                "message": "音频分离完成",
-                "output_files": output_files
-            })
-            
-            # 发送结束信号
-            self.send_to_stream(job_id, {
-                "type": "end",
-                "job_id": job_id
-            })
-            
-        except Exception as e:
-            logger.error(f"处理任务 {job_id} 时出错: {str(e)}")
-            
-            # 更新错误状态
-            with self.lock:
-                if job_id in self.jobs:
-                    self.jobs[job_id].update({
-                        "status": "error",
-                        "message": f"处理出错: {str(e)}",
-                        "error_at": time.time()
-                    })
-            
-            # 发送错误通知
-            self.send_to_stream(job_id, {
-                "type": "error",
-                "job_id": job_id,
-                "status": "error",
-                "message": f"处理出错: {str(e)}"
-            })
-            
-            # 发送结束信号
-            self.send_to_stream(job_id, {
-                "type": "end",
-                "job_id": job_id
-            })
+    def close_stream(self, stream_id: str, stream: Optional[StreamBuffer] = None):
+        """关闭流；指定stream时只在它仍是该ID的当前流时移除"""
+        with self.lock:
+            current = self.streams.get(stream_id)
+            if current is None or (stream is not None and current is not stream):
+                removed = None
+            else:
+                removed = self.streams.pop(stream_id)
+        if removed is not None:
+            self._retire_stream(removed)
+            logger.info(f"关闭MCP流: {stream_id}")
+        elif stream is not None and not stream.closed:
+            # 已被同ID的新流替换
+            self._retire_stream(stream)
     
-    def create_stream(self, stream_id: str) -> queue.Queue:
-        """创建一个新的流"""
+    def _retire_stream(self, stream: StreamBuffer):
+        """关闭流缓冲并把它的丢弃/合并计数计入累计统计"""
+        if stream.closed:
+            return
+        stream.close()
         with self.lock:
-            stream_queue = queue.Queue()
-            self.streams[stream_id] = stream_queue
-            logger.info(f"创建MCP流: {stream_id}")
-            return stream_queue
+            self.stream_counters["closed"] += 1
+            self.stream_counters["dropped_events"] += stream.dropped
+            self.stream_counters["coalesced_events"] += stream.coalesced
     
-    def close_stream(self, stream_id: str):
-        """关闭流"""
+    def send_to_stream(self, stream_id: str, data: Dict[str, Any]):
+        """向流发送数据（非阻塞；缓冲满时丢弃最旧的进度事件）"""
+        stream = self.streams.get(stream_id)
+        if stream is not None:
+            stream.put(data)
+            logger.debug(f"发送到MCP流 {stream_id}: {data}")
+        self.reap_idle_streams()
+    
+    def reap_idle_streams(self, now: Optional[float] = None, force: bool = False) -> int:
+        """关闭长时间没有读取方的流（客户端已断开但连接未被检测到）；返回关闭的流数"""
+        now = now or time.time()
+        if self.stream_idle_seconds <= 0:
+            return 0
+        # 最多每1/10空闲超时检查一次，发送事件时的开销保持为常数
+        if not force and now - self._last_reap < max(1.0, self.stream_idle_seconds / 10):
+            return 0
+        self._last_reap = now
         with self.lock:
-            if stream_id in self.streams:
+            idle = [(stream_id, stream) for stream_id, stream in self.streams.items()
+                    if stream.is_idle(self.stream_idle_seconds, now)]
+            for stream_id, _ in idle:
                 del self.streams[stream_id]
-                logger.info(f"关闭MCP流: {stream_id}")
+            self.stream_counters["reaped"] += len(idle)
+        for stream_id, stream in idle:
+            self._retire_stream(stream)
+            self.drop_session(stream_id)
+            logger.info(f"回收空闲MCP流: {stream_id}")
+        return len(idle)
     
-    def send_to_stream(self, stream_id: str, data: Dict[str, Any]):
-        """向流发送数据"""
+    def stream_stats(self) -> Dict[str, Any]:
+        """活动流数量、缓冲的事件和字节数，以及丢弃/合并/回收的累计计数"""
         with self.lock:
-            if stream_id in self.streams:
-                self.streams[stream_id].put(data)
-                logger.debug(f"发送到MCP流 {stream_id}: {data}")
+            streams = list(self.streams.values())
+            counters = dict(self.stream_counters)
+            subscriptions = sum(len(sessions) for sessions in self.subscriptions.values())
+        return {
+            "live_streams": len(streams),
+            "queued_events": sum(len(stream) for stream in streams),
+            "queued_bytes": sum(stream.queued_bytes for stream in streams),
+            "dropped_events": counters["dropped_events"] + sum(stream.dropped for stream in streams),
+            "coalesced_events": counters["coalesced_events"] + sum(stream.coalesced for stream in streams),
+            "created_streams": counters["created"],
+            "closed_streams": counters["closed"],
+            "reaped_streams": counters["reaped"],
+            "subscriptions": subscriptions,
+            "max_events_per_stream": self.stream_max_events,
+            "max_bytes_per_stream": self.stream_max_bytes,
+            "idle_timeout_seconds": self.stream_idle_seconds
+        }
+    
+    def _replay_job_state(self, stream_id: str):
+        """流建立时先发送任务的当前状态；已结束的任务直接发送结果和结束信号"""
+        record = self._job_record(stream_id)
+        if record is None:
+            return
+        event = self._job_event(stream_id, record)
+        self.send_to_stream(stream_id, event)
+        if event["type"] != "progress":
+            self.send_to_stream(stream_id, {"type": "end", "job_id": stream_id})
     
     def generate_stream_events(self, stream_id: str):
         """生成SSE流事件"""
-        stream_queue = self.create_stream(stream_id)
+        stream = self.create_stream(stream_id)
+        self._replay_job_state(stream_id)
         
         try:
             while True:
-                try:
-                    # 等待流数据
-                    data = stream_queue.get(timeout=30)
-                    
-                    # 格式化为SSE格式
-                    yield f"data: {json.dumps(data)}\n\n"
-                    
-                    # 如果是结束信号，退出循环
-                    if data.get("type") == "end":
+                # 等待流数据
+                data = stream.get(timeout=30)
+                if data is None:
+                    if stream.closed:
+                        # 被回收或被同ID的新流替换
                         break
-                        
-                except queue.Empty:
                     # 发送心跳
                     yield f": heartbeat {time.time()}\n\n"
+                    continue
+                
+                # 格式化为SSE格式
+                yield f"data: {json.dumps(data)}\n\n"
+                
+                # 如果是结束信号，退出循环
+                if data.get("type") == "end":
+                    break
                     
         except GeneratorExit:
             logger.info(f"MCP客户端断开连接: {stream_id}")
         finally:
-            self.close_stream(stream_id)
+            self.close_stream(stream_id, stream)
+    
+    async def agenerate_stream_events(self, stream_id: str):
+        """生成SSE流事件（异步版本，供ASGI服务使用，不占用线程）"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        
+        def wake():
+            """从推理线程唤醒事件循环中的读取方"""
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass
+        
+        stream = self.create_stream(stream_id)
+        stream.waker = wake
+        self._replay_job_state(stream_id)
+        
+        try:
+            while True:
+                data = stream.get_nowait()
+                if data is None:
+                    if stream.closed:
+                        break
+                    ready.clear()
+                    if len(stream):
+                        continue
+                    try:
+                        # 等待流数据
+                        await asyncio.wait_for(ready.wait(), timeout=30)
+                    except asyncio.TimeoutError:
+                        # 发送心跳
+                        yield f": heartbeat {time.time()}\n\n"
+                    continue
+                
+                # 格式化为SSE格式
+                yield f"data: {json.dumps(data)}\n\n"
+                
+                # 如果是结束信号，退出循环
+                if data.get("type") == "end":
+                    break
+        finally:
+            self.close_stream(stream_id, stream)
     
     def _create_success_response(self, request_id: Optional[Union[str, int]], result: Dict[str, Any]) -> Dict[str, Any]:
         """创建成功响应"""
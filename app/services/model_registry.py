@@ -0,0 +1,178 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Models shipped with demucs that this service knows how to load
+KNOWN_MODELS = ["htdemucs", "htdemucs_ft", "htdemucs_6s", "mdx", "mdx_q"]
+
+
+def estimate_model_bytes(model) -> int:
+    """Estimate the resident size of a model from its parameters and buffers"""
+    total = 0
+    try:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    except Exception as e:
+        logger.debug(f"Unable to estimate model size: {e}")
+    return total
+
+
+class ModelRegistry:
+    """Lazily loads demucs models and keeps an LRU-bounded set of them resident"""
+
+    def __init__(self,
+                 loader: Callable[[str], object],
+                 max_models: int = 1,
+                 max_bytes: int = 0,
+                 known_models: Optional[List[str]] = None,
+                 load_timeout: float = 600):
+        """
+        Args:
+            loader: Function that loads a model by name (e.g. pretrained.get_model)
+            max_models: Maximum number of resident models (0 means unlimited)
+            max_bytes: Maximum bytes of resident weights (0 means unlimited)
+            known_models: Model names that may be requested
+            load_timeout: Seconds a caller waits for a model load before giving up
+        """
+        self.loader = loader
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.known_models = list(known_models or KNOWN_MODELS)
+        self.load_timeout = load_timeout
+        # model_name -> (model, size_bytes), ordered from least to most recently used
+        self._models: "OrderedDict[str, tuple]" = OrderedDict()
+        # model_name -> Future of the in-flight load shared by all waiting callers
+        self._loading: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.counters = {
+            'loads': 0,
+            'load_failures': 0,
+            'load_timeouts': 0,
+            'evictions': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0
+        }
+
+    def get(self, model_name: str):
+        """
+        Return a resident model, loading it on first use
+
+        Loading is single-flight: concurrent callers asking for the same model
+        wait on one shared load instead of loading the weights again.
+        """
+        if model_name not in self.known_models:
+            raise ValueError(f"Model {model_name} not found. Available models: {self.known_models}")
+
+        with self.lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                self.counters['hits'] += 1
+                return self._models[model_name][0]
+
+            future = self._loading.get(model_name)
+            if future is None:
+                self.counters['misses'] += 1
+                future = Future()
+                self._loading[model_name] = future
+                threading.Thread(
+                    target=self._load,
+                    args=(model_name, future),
+                    name=f"model-loader-{model_name}",
+                    daemon=True
+                ).start()
+            else:
+                self.counters['waits'] += 1
+
+        try:
+            # Load errors are re-raised here for every waiting caller
+            return future.result(timeout=self.load_timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                self.counters['load_timeouts'] += 1
+            raise TimeoutError(f"Loading model {model_name} timed out after {self.load_timeout}s")
+
+    def _load(self, model_name: str, future: Future):
+        """Load a model through the configured loader and resolve the shared future"""
+        start_time = time.time()
+        try:
+            model = self.loader(model_name)
+        except BaseException as e:
+            with self.lock:
+                self.counters['load_failures'] += 1
+                self._loading.pop(model_name, None)
+            logger.error(f"Failed to load model {model_name}: {e}")
+            future.set_exception(e)
+            return
+
+        size = estimate_model_bytes(model)
+        with self.lock:
+            self.counters['loads'] += 1
+            self._models[model_name] = (model, size)
+            self._models.move_to_end(model_name)
+            self._evict_over_limit(keep=model_name)
+            self._loading.pop(model_name, None)
+        logger.info(f"Loaded model {model_name} in {time.time() - start_time:.2f}s ({size // (1024 * 1024)}MB)")
+        future.set_result(model)
+
+    def _resident_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def _evict_over_limit(self, keep: Optional[str] = None):
+        """Evict least recently used models until the limits are met (lock must be held)"""
+        while self._models:
+            over_count = self.max_models > 0 and len(self._models) > self.max_models
+            over_bytes = self.max_bytes > 0 and self._resident_bytes() > self.max_bytes
+            if not over_count and not over_bytes:
+                break
+
+            victim = next(iter(self._models))
+            if victim == keep:
+                # A single model larger than the byte budget stays resident
+                logger.warning(f"Model {keep} exceeds the model cache byte limit ({self.max_bytes})")
+                break
+
+            del self._models[victim]
+            self.counters['evictions'] += 1
+            logger.info(f"Evicted model {victim} from model cache")
+
+    def evict(self, model_name: str) -> bool:
+        """Drop a model from the cache"""
+        with self.lock:
+            if model_name in self._models:
+                del self._models[model_name]
+                self.counters['evictions'] += 1
+                return True
+            return False
+
+    def clear(self):
+        """Drop all resident models"""
+        with self.lock:
+            self.counters['evictions'] += len(self._models)
+            self._models.clear()
+
+    def is_loaded(self, model_name: str) -> bool:
+        with self.lock:
+            return model_name in self._models
+
+    def loaded_models(self) -> Dict[str, object]:
+        """Snapshot of resident models, least recently used first"""
+        with self.lock:
+            return {name: entry[0] for name, entry in self._models.items()}
+
+    def stats(self) -> Dict:
+        """Cache counters and current residency"""
+        with self.lock:
+            return {
+                **self.counters,
+                'resident_models': list(self._models.keys()),
+                'loading_models': list(self._loading.keys()),
+                'resident_bytes': self._resident_bytes(),
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes
+            }
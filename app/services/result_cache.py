@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """Compute the SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash: str, **params) -> str:
+    """Build a cache key from the content hash and the separation parameters"""
+    payload = json.dumps({'content': content_hash, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed cache of finished separation jobs with in-flight deduplication"""
+
+    def __init__(self, config):
+        self.max_entries = max(0, getattr(config, 'RESULT_CACHE_MAX_ENTRIES', 100))
+        self.max_bytes = max(0, getattr(config, 'RESULT_CACHE_MAX_BYTES', 0))
+        # Cached results never outlive the files they point to
+        self.max_age = getattr(config, 'FILE_RETENTION_MINUTES', 30) * 60
+
+        # key -> {'job_id', 'files', 'size', 'created_at'}, least recently used first
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # key -> job_id of the job currently producing that result
+        self._inflight: Dict[str, str] = {}
+        # job_id -> requests that reused its result (hit or in-flight join) and have not released it
+        self._reusers: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'inflight_joins': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+    def lookup_or_reserve(self, key: str, job_id: str) -> Tuple[str, str]:
+        """
+        Look up a result and reserve the key for job_id on a miss
+
+        Returns:
+            ('hit', cached_job_id), ('inflight', running_job_id) or ('miss', job_id)
+        """
+        with self.lock:
+            self._evict_expired_locked()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                if all(os.path.isfile(path) for path in entry['files']):
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    self._reuse_locked(entry['job_id'])
+                    return 'hit', entry['job_id']
+                # Files were removed behind our back
+                del self._entries[key]
+                self.counters['evictions'] += 1
+
+            running_job_id = self._inflight.get(key)
+            if running_job_id is not None:
+                self.counters['inflight_joins'] += 1
+                self._reuse_locked(running_job_id)
+                return 'inflight', running_job_id
+
+            self.counters['misses'] += 1
+            self._inflight[key] = job_id
+            return 'miss', job_id
+
+    def complete(self, key: str, job_id: str, files: List[str]):
+        """Store the outputs of a finished job and release the in-flight reservation"""
+        size = sum(os.path.getsize(path) for path in files if os.path.isfile(path))
+        with self.lock:
+            if self._inflight.get(key) == job_id:
+                del self._inflight[key]
+            if self.max_entries == 0:
+                return
+            self._entries[key] = {
+                'job_id': job_id,
+                'files': list(files),
+                'size': size,
+                'created_at': time.time()
+            }
+            self._entries.move_to_end(key)
+            self.counters['stores'] += 1
+            self._evict_over_limit_locked()
+
+    def fail(self, key: str, job_id: str):
+        """Release the in-flight reservation of a failed job"""
+        with self.lock:
+            if self._inflight.get(key) == job_id:
+                del self._inflight[key]
+
+    def release(self, job_id: str) -> bool:
+        """
+        Release one holder of a job's result before its files are removed
+
+        Every request that reused job_id shares its files, so cleaning up the job
+        only drops that request's hold while others remain.
+
+        Returns:
+            True if other requests still hold the result and its files must be kept
+        """
+        with self.lock:
+            reusers = self._reusers.get(job_id, 0)
+            if reusers <= 0:
+                return False
+            if reusers == 1:
+                del self._reusers[job_id]
+            else:
+                self._reusers[job_id] = reusers - 1
+            return True
+
+    def invalidate_job(self, job_id: str) -> bool:
+        """Drop any entry or reservation that refers to job_id"""
+        removed = False
+        with self.lock:
+            self._reusers.pop(job_id, None)
+            for key in [k for k, entry in self._entries.items() if entry['job_id'] == job_id]:
+                del self._entries[key]
+                self.counters['evictions'] += 1
+                removed = True
+            for key in [k for k, running in self._inflight.items() if running == job_id]:
+                del self._inflight[key]
+                removed = True
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._inflight.clear()
+            self._reusers.clear()
+
+    def _reuse_locked(self, job_id: str):
+        self._reusers[job_id] = self._reusers.get(job_id, 0) + 1
+
+    def _evict_expired_locked(self):
+        if self.max_age <= 0:
+            return
+        cutoff = time.time() - self.max_age
+        for key in [k for k, entry in self._entries.items() if entry['created_at'] < cutoff]:
+            del self._entries[key]
+            self.counters['evictions'] += 1
+
+    def _evict_over_limit_locked(self):
+        while self._entries:
+            over_entries = len(self._entries) > self.max_entries
+            over_bytes = self.max_bytes > 0 and self._total_bytes() > self.max_bytes
+            if not over_entries and not over_bytes:
+                break
+            key, entry = self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+            logger.debug(f"Evicted cached result of job {entry['job_id']}")
+
+    def _total_bytes(self) -> int:
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def stats(self) -> Dict:
+        """Cache counters and size"""
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses'] + self.counters['inflight_joins']
+            return {
+                **self.counters,
+                'hit_rate': round((self.counters['hits'] + self.counters['inflight_joins']) / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries),
+                'inflight': len(self._inflight),
+                'bytes': self._total_bytes(),
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'max_age_seconds': self.max_age
+            }
@@ -0,0 +1,132 @@
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# Events a full buffer never drops; a client must always learn how its job ended
+TERMINAL_TYPES = ('completed', 'error', 'end')
+
+# JSON-RPC notification sent to resource subscribers
+RESOURCE_UPDATED = 'notifications/resources/updated'
+
+
+def coalesce_key(event: Dict[str, Any]):
+    """Events with the same key replace each other while still queued; None never coalesces"""
+    if event.get('type') == 'progress':
+        return ('progress', event.get('job_id'))
+    if event.get('method') == RESOURCE_UPDATED:
+        return (RESOURCE_UPDATED, (event.get('params') or {}).get('uri'))
+    return None
+
+
+def is_terminal(event: Dict[str, Any]) -> bool:
+    if event.get('type') in TERMINAL_TYPES:
+        return True
+    params = event.get('params') or {}
+    return event.get('method') == RESOURCE_UPDATED and (params.get('expired')
+                                                         or params.get('status') in TERMINAL_TYPES)
+
+
+class StreamBuffer:
+    """Bounded, non-blocking event buffer for one MCP stream
+
+    Producers (inference threads, progress watchers) never block: a progress
+    event replaces the progress event still waiting in the buffer for the same
+    job, and when the buffer is over its event or byte limit the oldest
+    non-terminal events are dropped. The reader's last activity is recorded so
+    streams nobody reads from can be reaped.
+    """
+
+    def __init__(self, max_events: int = 64, max_bytes: int = 256 * 1024):
+        self.max_events = max(1, max_events)
+        self.max_bytes = max(0, max_bytes)
+        # [event, size]
+        self._events = deque()
+        self.queued_bytes = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self.created_at = self.last_read = time.time()
+        # Number of readers currently blocked in get(); a waiting reader is never idle
+        self.readers_waiting = 0
+        # Called (without the lock) after each put, e.g. to wake an asyncio reader
+        self.waker: Optional[Callable[[], None]] = None
+        self.condition = threading.Condition()
+
+    def put(self, event: Dict[str, Any]) -> bool:
+        """Queue an event; returns False once the stream is closed"""
+        size = len(json.dumps(event, default=str))
+        with self.condition:
+            if self.closed:
+                return False
+            key = coalesce_key(event)
+            last = self._events[-1] if self._events else None
+            if key is not None and last is not None and coalesce_key(last[0]) == key and not is_terminal(last[0]):
+                # 读取方还没取走上一条进度（或同一资源的更新通知），直接替换为最新状态
+                self.queued_bytes += size - last[1]
+                self._events[-1] = [event, size]
+                self.coalesced += 1
+            else:
+                self._events.append([event, size])
+                self.queued_bytes += size
+            self._trim_locked()
+            self.condition.notify()
+            waker = self.waker
+        if waker is not None:
+            waker()
+        return True
+
+    def _trim_locked(self):
+        while len(self._events) > self.max_events or (self.max_bytes and self.queued_bytes > self.max_bytes):
+            # 优先丢弃最旧的非终止事件；只剩终止事件时丢弃最旧的
+            index = next((i for i, (event, _) in enumerate(self._events) if not is_terminal(event)), 0)
+            if len(self._events) == 1:
+                break
+            _, size = self._events[index]
+            del self._events[index]
+            self.queued_bytes -= size
+            self.dropped += 1
+
+    def get_nowait(self) -> Optional[Dict[str, Any]]:
+        with self.condition:
+            self.last_read = time.time()
+            return self._pop_locked()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None on timeout or when the stream is closed and drained"""
+        with self.condition:
+            self.last_read = time.time()
+            if not self._events and not self.closed:
+                self.readers_waiting += 1
+                try:
+                    self.condition.wait_for(lambda: self._events or self.closed, timeout)
+                finally:
+                    self.readers_waiting -= 1
+                    self.last_read = time.time()
+            return self._pop_locked()
+
+    def _pop_locked(self):
+        if not self._events:
+            return None
+        event, size = self._events.popleft()
+        self.queued_bytes -= size
+        return event
+
+    def close(self):
+        """Stop accepting events and wake the reader"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            waker = self.waker
+        if waker is not None:
+            waker()
+
+    def is_idle(self, idle_seconds: float, now: Optional[float] = None) -> bool:
+        """True when no reader is waiting and none has read for idle_seconds"""
+        with self.condition:
+            return (self.readers_waiting == 0 and idle_seconds > 0
+                    and (now or time.time()) - self.last_read > idle_seconds)
+
+    def __len__(self):
+        return len(self._events)
@@ -0,0 +1,266 @@
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from app.services.job_store import JobStore
+from app.services.file_index import UPLOAD
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request body per write
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+# Upload states
+UPLOADING = 'uploading'
+COMPLETE = 'complete'
+CONSUMED = 'consumed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_id   TEXT PRIMARY KEY,
+    filename    TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    length      INTEGER NOT NULL,
+    offset      INTEGER NOT NULL DEFAULT 0,
+    sha256      TEXT,
+    status      TEXT NOT NULL,
+    job_id      TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be applied; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadManager:
+    """Resumable uploads written in place to their final path in the upload folder
+
+    A client creates an upload with its total length, appends chunks at the
+    current offset, and finalizes it once every byte has arrived. The SHA-256
+    is updated as each chunk is written, so a finalized upload can start a job
+    without copying or re-reading the file. Upload state is kept in the job
+    store's database, so an interrupted upload can resume after a restart or
+    on another worker.
+    """
+
+    def __init__(self, file_manager, store: Optional[JobStore] = None, max_size: int = 0):
+        """
+        Args:
+            file_manager: FileManager that places and indexes the upload files
+            store: JobStore whose database holds the upload records; a private in-memory store by default
+            max_size: Largest accepted upload in bytes (0 for no limit)
+        """
+        self.file_manager = file_manager
+        self.store = store if store is not None else JobStore()
+        self.store.conn.executescript(SCHEMA)
+        self.max_size = max_size
+        # upload_id -> (offset, sha256 object) for uploads written by this process
+        self._hashers: Dict[str, tuple] = {}
+        # upload_id -> lock serializing writes to the same upload within this process
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def conn(self):
+        return self.store.conn
+
+    def create(self, filename: str, length: int) -> Dict:
+        """
+        Create an empty upload
+
+        Args:
+            filename: Original file name
+            length: Total size in bytes
+
+        Returns:
+            The upload record
+        """
+        if length <= 0:
+            raise UploadError("Upload length must be positive")
+        if self.max_size and length > self.max_size:
+            raise UploadError(f"Upload exceeds the maximum size of {self.max_size} bytes", 413)
+
+        upload_id = str(uuid.uuid4())
+        path = self.file_manager.create_upload_file(filename, upload_id)
+        now = time.time()
+        self.conn.execute(
+            """INSERT INTO uploads (upload_id, filename, path, length, offset, status, created_at, updated_at)
+               VALUES (?, ?, ?, ?, 0, ?, ?, ?)""",
+            (upload_id, os.path.basename(filename), path, length, UPLOADING, now, now)
+        )
+        self._hashers[upload_id] = (0, hashlib.sha256())
+        logger.info(f"Created upload {upload_id}: {filename}, {length} bytes")
+        return self.get(upload_id)
+
+    def get(self, upload_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _require(self, upload_id: str) -> Dict:
+        upload = self.get(upload_id)
+        if upload is None:
+            raise UploadError("Upload not found", 404)
+        return upload
+
+    def _lock(self, upload_id: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _hasher(self, upload: Dict):
+        """SHA-256 state at the upload's offset, rebuilt from disk if this process did not write the prefix"""
+        cached = self._hashers.get(upload['upload_id'])
+        if cached and cached[0] == upload['offset']:
+            return cached[1]
+        # 上传在其他进程或重启前写入，重新读取已接收的部分
+        digest = hashlib.sha256()
+        remaining = upload['offset']
+        with open(upload['path'], 'rb') as f:
+            while remaining > 0:
+                chunk = f.read(min(WRITE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise UploadError("Upload file is shorter than its recorded offset", 409, offset=0)
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest
+
+    def write(self, upload_id: str, offset: int, stream) -> int:
+        """
+        Append the bytes of a stream at the upload's current offset
+
+        Bytes received before a dropped connection are kept, so the client
+        can ask for the offset and resume from there.
+
+        Args:
+            upload_id: Upload identifier
+            offset: Offset the client is writing at; must equal the current offset
+            stream: Readable request body
+
+        Returns:
+            The new offset
+        """
+        with self._lock(upload_id):
+            upload = self._require(upload_id)
+            if upload['status'] != UPLOADING:
+                raise UploadError("Upload is already finalized", 409, offset=upload['offset'])
+            if offset != upload['offset']:
+                raise UploadError(f"Offset mismatch: upload is at {upload['offset']}", 409, offset=upload['offset'])
+
+            digest = self._hasher(upload)
+            position = offset
+            error = None
+            with open(upload['path'], 'r+b') as f:
+                # 丢弃上次中断时写入但未记录的字节
+                f.truncate(position)
+                f.seek(position)
+                try:
+                    while True:
+                        chunk = stream.read(WRITE_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if position + len(chunk) > upload['length']:
+                            error = UploadError("Chunk exceeds the upload length", 413)
+                            break
+                        f.write(chunk)
+                        digest.update(chunk)
+                        position += len(chunk)
+                except Exception as e:
+                    # 连接中断：保留已写入的部分，客户端可从新的偏移继续
+                    logger.warning(f"Upload {upload_id} interrupted at {position} bytes: {e}")
+                    error = UploadError("Upload interrupted", 400)
+
+            self.conn.execute("UPDATE uploads SET offset = ?, updated_at = ? WHERE upload_id = ?",
+                              (position, time.time(), upload_id))
+            self._hashers[upload_id] = (position, digest)
+            self.file_manager.index.add(upload_id, UPLOAD, upload['path'], size=position)
+            if error is not None:
+                error.offset = position
+                raise error
+            return position
+
+    def finalize(self, upload_id: str, expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Mark a fully received upload as complete and record its SHA-256
+
+        Args:
+            upload_id: Upload identifier
+            expected_sha256: Optional client-computed hex digest to verify against
+        """
+        with self._lock(upload_id):
+            upload = self._require(upload_id)
+            if upload['status'] != UPLOADING:
+                return upload
+            if upload['offset'] != upload['length']:
+                raise UploadError(f"Upload incomplete: {upload['offset']} of {upload['length']} bytes received",
+                                  409, offset=upload['offset'])
+            content_hash = self._hasher(upload).hexdigest()
+            if expected_sha256 and expected_sha256.lower() != content_hash:
+                raise UploadError("Checksum mismatch")
+            self.conn.execute("UPDATE uploads SET sha256 = ?, status = ?, updated_at = ? WHERE upload_id = ?",
+                              (content_hash, COMPLETE, time.time(), upload_id))
+            self._hashers.pop(upload_id, None)
+            logger.info(f"Upload {upload_id} complete, sha256 {content_hash}")
+            return self.get(upload_id)
+
+    def consume(self, upload_id: str, job_id: str) -> Dict:
+        """
+        Hand a complete upload over to a job; each upload starts at most one job
+
+        The file stays where it is and is re-indexed under the job.
+        """
+        claimed = self.conn.execute(
+            "UPDATE uploads SET status = ?, job_id = ?, updated_at = ? WHERE upload_id = ? AND status = ?",
+            (CONSUMED, job_id, time.time(), upload_id, COMPLETE)
+        ).rowcount
+        upload = self._require(upload_id)
+        if not claimed:
+            if upload['status'] == UPLOADING:
+                raise UploadError("Upload is not finalized", 409, offset=upload['offset'])
+            raise UploadError("Upload was already used by another job", 409)
+        self.file_manager.index.add(job_id, UPLOAD, upload['path'], size=upload['length'])
+        return upload
+
+    def release(self, upload_id: str, job_id: str) -> bool:
+        """Give a consumed upload back when its job was not started, so it can start another"""
+        released = self.conn.execute(
+            "UPDATE uploads SET status = ?, job_id = NULL, updated_at = ? WHERE upload_id = ? AND status = ? AND job_id = ?",
+            (COMPLETE, time.time(), upload_id, CONSUMED, job_id)
+        ).rowcount
+        if released:
+            upload = self._require(upload_id)
+            self.file_manager.index.add(upload_id, UPLOAD, upload['path'], size=upload['length'])
+        return bool(released)
+
+    def delete(self, upload_id: str) -> bool:
+        """Abort an upload that has not started a job and remove its file"""
+        upload = self.get(upload_id)
+        if upload is None or upload['status'] == CONSUMED:
+            return False
+        with self._lock(upload_id):
+            if os.path.exists(upload['path']):
+                os.remove(upload['path'])
+            self.file_manager.index.remove_job(upload_id)
+            self.forget(upload_id)
+        return True
+
+    def forget(self, upload_id: str):
+        """Drop an upload's record after its file expired; also accepts the job_id of a consumed upload"""
+        self.conn.execute("DELETE FROM uploads WHERE upload_id = ? OR job_id = ?", (upload_id, upload_id))
+        self._hashers.pop(upload_id, None)
+        with self._locks_lock:
+            self._locks.pop(upload_id, None)
+
+    def clear(self):
+        self.conn.execute("DELETE FROM uploads")
+        self._hashers.clear()
@@ -373,6 +373,17 @@ window.AudioProcessor = {
             
             if (hasResultFile && outputFiles.length > 0) {
                 // 有具体文件信息
+                // 音轨列表（对象）：每个音轨单独下载，另提供一个ZIP下载（下载时生成）
+                if (typeof outputFiles[0] === 'object') {
+                    html += `<div class="mb-3">`;
+                    outputFiles.forEach(file => {
+                        html += `<a href="/api/download/${data.job_id}/${file.stem}" class="btn btn-outline-success me-2 mb-2" download>`;
+                        html += `<i class="fas fa-music"></i> ${file.name}`;
+                        html += `</a>`;
+                    });
+                    html += `</div>`;
+                    outputFiles = [`demucs_output_${data.job_id}.zip`];
+                }
                 outputFiles.forEach(file => {
                     const filename = file.split('/').pop();
                     // 使用job_id作为下载标识
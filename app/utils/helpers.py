@@ -1,12 +1,26 @@
 import uuid
 import os
+import hashlib
 import random
 import string
 import logging
-from flask import request, jsonify, send_file, current_app
+import unicodedata
+from urllib.parse import quote
+from flask import request, jsonify, send_file, current_app, Response, stream_with_context
+
+from app.utils.zip_stream import stream_zip
 
 logger = logging.getLogger(__name__)
 
+# 音轨文件的MIME类型
+AUDIO_MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'flac': 'audio/flac',
+    'ogg': 'audio/ogg',
+    'm4a': 'audio/mp4'
+}
+
 def generate_job_id():
     """Generate unique job ID"""
     return str(uuid.uuid4())
@@ -119,6 +133,86 @@ def create_file_response(file_path, download_name=None, cleanup_id=None):
         logger.error(f"Error creating file response: {str(e)}")
         return create_error_response(f'Error processing file: {str(e)}', 500)
 
+def create_zip_stream_response(files, download_name):
+    """
+    Create a download response that builds a ZIP archive while it is sent
+    
+    Parameters:
+    - files: List of (path, archive_name)
+    - download_name: Download file name
+    
+    Returns:
+    - Response: Streamed ZIP response (chunked, no Content-Length)
+    """
+    logger.info(f"流式发送ZIP: {download_name}, 文件数: {len(files)}")
+    return Response(
+        stream_with_context(stream_zip(files)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def create_stem_file_response(file_path, download_name):
+    """
+    Create a download response for a single stem file
+    
+    Supports Range/206, If-None-Match and If-Range through a strong ETag. With
+    DOWNLOAD_OFFLOAD set to 'x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd)
+    only the headers are returned and the web server sends the bytes.
+    
+    Parameters:
+    - file_path: Stem file path
+    - download_name: Download file name
+    
+    Returns:
+    - Response: File response
+    """
+    stat = os.stat(file_path)
+    # 音轨编码完成后不再修改，路径、大小和纳秒级修改时间唯一确定内容
+    etag = hashlib.sha1(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')).hexdigest()
+    extension = os.path.splitext(file_path)[1].lstrip('.').lower()
+    mimetype = AUDIO_MIME_TYPES.get(extension, 'application/octet-stream')
+    
+    offload = current_app.config.get('DOWNLOAD_OFFLOAD', '')
+    if offload not in ('x-accel', 'x-sendfile'):
+        return send_file(
+            file_path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=etag,
+            last_modified=stat.st_mtime
+        )
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    response = Response(mimetype=mimetype)
+    response.set_etag(etag)
+    # 与send_file相同：非ASCII文件名用RFC 5987的filename*，filename只保留ASCII回退，引号由werkzeug转义
+    try:
+        download_name.encode('ascii')
+        names = {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    if offload == 'x-accel':
+        # nginx的internal location把前缀映射到OUTPUT_FOLDER，Range由nginx处理
+        relative_path = os.path.relpath(file_path, current_app.config['OUTPUT_FOLDER'])
+        prefix = current_app.config.get('DOWNLOAD_ACCEL_PREFIX', '/protected-outputs').rstrip('/')
+        # 头部只能是latin-1，路径按URI编码，nginx匹配location前会解码
+        response.headers['X-Accel-Redirect'] = quote(f"{prefix}/{relative_path.replace(os.sep, '/')}")
+    else:
+        # lighttpd/Apache按字面使用该路径，不做URI解码：原样发送磁盘上的字节（WSGI头部以latin-1承载字节）
+        response.headers['X-Sendfile'] = os.fsencode(os.path.abspath(file_path)).decode('latin-1')
+    return response
+
 def allowed_file(filename):
     """
     Check if the file extension is allowed
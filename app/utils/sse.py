@@ -1,6 +1,8 @@
 import json
 import time
+import asyncio
 import threading
+from collections import deque
 from flask import Response, stream_with_context
 import logging
 
@@ -9,33 +11,69 @@ logger = logging.getLogger(__name__)
 class SSEManager:
     """Server-Sent Events (SSE) Manager for tracking progress of long-running tasks"""
     
-    def __init__(self):
+    # Fields that do not count as a change worth pushing to subscribers
+    VOLATILE_FIELDS = ('last_update',)
+    
+    def __init__(self, history_size=32):
         # Task progress storage: job_id -> progress info
         self.tasks = {}
         # Task lock to prevent race conditions
         self.lock = threading.Lock()
+        # 每个任务一个条件变量（共享self.lock），只唤醒订阅该任务的连接
+        self.conditions = {}
+        # job_id -> 状态版本号，每次实际变化时递增，同时作为SSE事件ID
+        self.versions = {}
+        # job_id -> 最近事件的环形缓冲 [(event_id, snapshot)]，用于断线重连后补发
+        self.history = {}
+        self.history_size = history_size
+        # job_id -> 变化回调集合，供异步（ASGI）订阅者使用，回调必须是非阻塞的
+        self.listeners = {}
+        # 所有任务的变化回调 (job_id, 任务快照)，释放锁后按版本顺序调用，必须是非阻塞的（如MCP流）
+        self.watchers = []
+        self._watch_lock = threading.Lock()
+        # 持久化任务存储（JobStore），使其他工作进程和重启后的服务也能查询任务
+        self.store = None
+        # 任务不在本进程时，轮询存储的间隔（秒）
+        self.store_poll_interval = 0.5
+        # 状态变化立即写入存储；只有进度变化时由后台线程每隔store_write_interval秒批量写入，0表示每次都写入
+        self.store_write_interval = 1.0
+        # 串行化存储写入，保证旧版本不会覆盖新版本
+        self._store_lock = threading.Lock()
+        # job_id -> (version, 快照)，等待批量写入的进度
+        self._unsaved = {}
+        self._flusher = None
+    
+    def attach_store(self, store):
+        """Write every task change through to a shared JobStore and read unknown tasks from it"""
+        self.store = store
     
-    def create_task(self, job_id):
-        """Create a new task with initial progress"""
+    def create_task(self, job_id, status='processing', message='Task started', source='api'):
+        """Create a new task with initial progress; source is the entry point recorded in the job store"""
         with self.lock:
             self.tasks[job_id] = {
                 'job_id': job_id,
                 'progress': 0,
-                'status': 'processing',
-                'message': 'Task started',
+                'status': status,
+                'message': message,
+                'source': source,
                 'started_at': time.time(),
                 'last_update': time.time(),
                 'result_file': None
             }
+            if job_id not in self.conditions:
+                self.conditions[job_id] = threading.Condition(self.lock)
+            change = self._notify_locked(job_id)
+        self._publish(*change, sync=True)
         return job_id
     
-    def update_progress(self, job_id, progress, message=None, status=None, result_file=None):
+    def update_progress(self, job_id, progress, message=None, status=None, result_file=None, details=None):
         """Update the progress of a task"""
         with self.lock:
             if job_id not in self.tasks:
                 return False
             
             task = self.tasks[job_id]
+            before = self._state_of(task)
             
             # 确保进度值是整数
             try:
@@ -61,6 +99,10 @@ class SSEManager:
                 
             if result_file:
                 task['result_file'] = result_file
+            
+            # Inference details such as segments done, throughput and ETA
+            if details:
+                task.update(details)
                 
             task['last_update'] = time.time()
             
@@ -70,7 +112,13 @@ class SSEManager:
                 if not message:
                     task['message'] = 'Task completed'
             
-            return True
+            if self._state_of(task) == before:
+                return True
+            change = self._notify_locked(job_id)
+        
+        # 锁外持久化和通知watcher：SQLite写入不阻塞其他任务的进度更新和SSE订阅者
+        self._publish(*change, sync=change[1]['status'] != before['status'])
+        return True
     
     def set_error(self, job_id, error_message):
         """Set task error status"""
@@ -81,38 +129,52 @@ class SSEManager:
             self.tasks[job_id]['status'] = 'error'
             self.tasks[job_id]['message'] = error_message
             self.tasks[job_id]['last_update'] = time.time()
-            return True
+            change = self._notify_locked(job_id)
+        self._publish(*change, sync=True)
+        return True
     
     def get_progress(self, job_id):
         """Get current progress of a task"""
-        with self.lock:
-            if job_id not in self.tasks:
-                return None
-            return dict(self.tasks[job_id])
+        progress, _ = self._snapshot(job_id)
+        return progress
     
     def get_result_file(self, job_id):
         """Get result file path for a completed task"""
-        with self.lock:
-            if job_id not in self.tasks:
-                return None
-            
-            task = self.tasks[job_id]
-            if task['status'] != 'completed' or not task['result_file']:
-                return None
-                
-            return task['result_file']
+        task = self.get_progress(job_id)
+        if task is None:
+            return None
+        if task['status'] != 'completed' or not task.get('result_file'):
+            return None
+        return task['result_file']
     
     def clean_task(self, job_id):
         """Remove a task from tracking"""
         with self.lock:
-            if job_id in self.tasks:
+            removed = job_id in self.tasks
+            if removed:
                 del self.tasks[job_id]
-                return True
-            return False
+                self._drop_subscriptions_locked(job_id)
+        if self.store and self._delete_stored(job_id):
+            removed = True
+        return removed
+    
+    def clear_tasks(self):
+        """Remove all tasks and release their subscribers"""
+        with self.lock:
+            count = len(self.tasks)
+            for job_id in list(self.tasks.keys()):
+                del self.tasks[job_id]
+                self._drop_subscriptions_locked(job_id)
+        if self.store:
+            with self._store_lock:
+                self._unsaved.clear()
+                count = max(count, self.store.clear())
+        return count
     
     def clean_old_tasks(self, max_age_seconds=3600):
         """Clean up tasks older than specified age"""
         now = time.time()
+        removed = []
         with self.lock:
             for job_id in list(self.tasks.keys()):
                 task = self.tasks[job_id]
@@ -120,41 +182,361 @@ class SSEManager:
                 if ((task['status'] in ['completed', 'error']) and 
                     (now - task['last_update'] > max_age_seconds)):
                     del self.tasks[job_id]
+                    self._drop_subscriptions_locked(job_id)
+                    removed.append(job_id)
+        if self.store:
+            with self._store_lock:
+                for job_id in removed:
+                    self._unsaved.pop(job_id, None)
+                # 同时清理其他工作进程留下的记录
+                self.store.delete_finished_before(now - max_age_seconds)
+    
+    def _state_of(self, task):
+        return {k: v for k, v in task.items() if k not in self.VOLATILE_FIELDS}
+    
+    def _notify_locked(self, job_id):
+        """
+        Bump the task version, record the event and wake its subscribers (lock must be held)
+        
+        Returns:
+            (job_id, snapshot, version) to hand to _publish once the lock is released
+        """
+        version = self.versions.get(job_id, 0) + 1
+        self.versions[job_id] = version
+        
+        snapshot = dict(self.tasks[job_id])
+        history = self.history.get(job_id)
+        if history is None:
+            history = self.history[job_id] = deque(maxlen=max(1, self.history_size))
+        history.append((version, snapshot))
+        
+        condition = self.conditions.get(job_id)
+        if condition:
+            condition.notify_all()
+        self._call_listeners_locked(self.listeners.get(job_id, ()))
+        return job_id, snapshot, version
+    
+    def _is_current(self, job_id, version):
+        """Whether version is still the latest change of a tracked task"""
+        with self.lock:
+            return job_id in self.tasks and self.versions.get(job_id) == version
+    
+    def _publish(self, job_id, snapshot, version, sync=False):
+        """
+        Persist a task change and pass it to the watchers (called without the lock)
+        
+        A change overtaken by a newer one is skipped: the newer publication
+        carries the latest state, so the store and the watchers never go back
+        to an older version.
+        """
+        if self.store:
+            self._persist(job_id, snapshot, version, sync)
+        if not self.watchers:
+            return
+        with self._watch_lock:
+            if not self._is_current(job_id, version):
+                return
+            for watcher in list(self.watchers):
+                try:
+                    watcher(job_id, dict(snapshot))
+                except Exception as e:
+                    logger.debug(f"SSE watcher failed: {e}")
+    
+    def _persist(self, job_id, snapshot, version, sync):
+        """Write status changes through to the store; queue plain progress for the next batch"""
+        with self._store_lock:
+            if not self._is_current(job_id, version):
+                return
+            if sync or self.store_write_interval <= 0:
+                self._unsaved.pop(job_id, None)
+                self._save(job_id, snapshot, version)
+                return
+            self._unsaved[job_id] = (version, snapshot)
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name='sse-store-flush', daemon=True)
+                self._flusher.start()
+    
+    def _save(self, job_id, snapshot, version):
+        try:
+            self.store.save(job_id, snapshot, version=version, source=snapshot.get('source', 'api'))
+        except Exception as e:
+            logger.error(f"Failed to persist task {job_id}: {e}")
+    
+    def flush(self):
+        """Write queued progress changes to the store now; returns the number written"""
+        with self._store_lock:
+            pending, self._unsaved = self._unsaved, {}
+            written = 0
+            for job_id, (version, snapshot) in pending.items():
+                if self._is_current(job_id, version):
+                    self._save(job_id, snapshot, version)
+                    written += 1
+            return written
+    
+    def _flush_loop(self):
+        """Background batch writer; exits once nothing is left to write"""
+        while True:
+            time.sleep(self.store_write_interval)
+            self.flush()
+            with self._store_lock:
+                if not self._unsaved:
+                    self._flusher = None
+                    return
+    
+    def _delete_stored(self, job_id):
+        with self._store_lock:
+            self._unsaved.pop(job_id, None)
+            return self.store.delete(job_id)
+    
+    def _drop_subscriptions_locked(self, job_id):
+        """Wake subscribers of a removed task so their streams can close (lock must be held)"""
+        condition = self.conditions.pop(job_id, None)
+        self.versions.pop(job_id, None)
+        self.history.pop(job_id, None)
+        if condition:
+            condition.notify_all()
+        self._call_listeners_locked(self.listeners.pop(job_id, ()))
+    
+    def _call_listeners_locked(self, listeners):
+        for callback in list(listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"SSE listener failed: {e}")
+    
+    def add_listener(self, job_id, callback):
+        """Register a non-blocking callback run on every change of the task; False if the task is unknown"""
+        with self.lock:
+            if job_id not in self.tasks:
+                return False
+            self.listeners.setdefault(job_id, set()).add(callback)
+            return True
+    
+    def add_watcher(self, callback):
+        """Register a non-blocking callback(job_id, task) run on every change of any task"""
+        with self.lock:
+            self.watchers.append(callback)
+    
+    def remove_listener(self, job_id, callback):
+        with self.lock:
+            listeners = self.listeners.get(job_id)
+            if listeners is not None:
+                listeners.discard(callback)
+                if not listeners:
+                    del self.listeners[job_id]
+    
+    def is_local(self, job_id):
+        """Whether the task is tracked by this process, so its changes reach the watchers"""
+        with self.lock:
+            return job_id in self.tasks
+    
+    def subscriber_count(self):
+        """Number of registered async listeners"""
+        with self.lock:
+            return sum(len(listeners) for listeners in self.listeners.values())
+    
+    def wait_for_change(self, job_id, version, timeout):
+        """
+        Block until the task's version differs from `version` or the timeout expires
+        
+        Returns:
+            (snapshot, version) after a change, (None, None) if the task is gone,
+            or (False, version) on timeout
+        """
+        with self.lock:
+            condition = self.conditions.get(job_id)
+            local = condition is not None and job_id in self.tasks
+        if not local:
+            return self._poll_store(job_id, version, timeout)
+        
+        with self.lock:
+            condition = self.conditions.get(job_id)
+            if condition is None or job_id not in self.tasks:
+                return None, None
+            changed = condition.wait_for(lambda: self.versions.get(job_id) != version, timeout=timeout)
+            if not changed:
+                return False, version
+            if job_id not in self.tasks:
+                return None, None
+            return dict(self.tasks[job_id]), self.versions[job_id]
+    
+    def _poll_store(self, job_id, version, timeout):
+        """wait_for_change for a task owned by another process: poll its version in the store"""
+        if not self.store:
+            return None, None
+        deadline = time.time() + timeout
+        while True:
+            task, current = self.store.get_with_version(job_id)
+            if task is None:
+                return None, None
+            if current != version:
+                return task, current
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False, version
+            time.sleep(min(self.store_poll_interval, remaining))
+    
+    def events_since(self, job_id, last_event_id):
+        """Buffered events newer than last_event_id, oldest first"""
+        with self.lock:
+            return [(event_id, dict(snapshot)) for event_id, snapshot in self.history.get(job_id, ())
+                    if event_id > last_event_id]
+    
+    def _initial_events(self, job_id, last_event_id):
+        """
+        Events a new subscriber starts with: the current snapshot, or what it missed
+        
+        Returns:
+            (events, progress, version) with events as [(event_id, snapshot)],
+            or (None, None, None) if the task is unknown
+        """
+        progress, version = self._snapshot(job_id)
+        if progress is None:
+            return None, None, None
+        
+        if last_event_id is None:
+            return [(version, progress)], progress, version
+        if last_event_id >= version:
+            return [], progress, version
+        
+        missed = self.events_since(job_id, last_event_id)
+        if not missed or missed[-1][0] < version:
+            # 缓冲区中没有最新状态时补发当前快照
+            missed.append((version, progress))
+        return missed, missed[-1][1], missed[-1][0]
+    
+    def _snapshot(self, job_id):
+        with self.lock:
+            if job_id in self.tasks:
+                return dict(self.tasks[job_id]), self.versions.get(job_id, 0)
+        if self.store:
+            # 任务由其他工作进程创建，或在服务重启前创建
+            return self.store.get_with_version(job_id)
+        return None, None
                     
-    def stream_progress(self, job_id):
-        """Generate SSE stream for a task's progress"""
-        if job_id not in self.tasks:
+    def stream_progress(self, job_id, heartbeat=15.0, coalesce=0.1, last_event_id=None):
+        """
+        Generate SSE stream for a task's progress
+        
+        The stream sleeps on the task's condition variable and only wakes when
+        update_progress actually changes the task. Updates arriving within
+        `coalesce` seconds of each other are sent as one event, and a comment
+        line is sent every `heartbeat` seconds while nothing changes.
+        
+        Every event carries the task version as its id. A client reconnecting
+        with `last_event_id` first gets the buffered events it missed.
+        """
+        events, progress, version = self._initial_events(job_id, last_event_id)
+        if events is None:
             yield self._format_sse({"error": "Task not found"})
             return
-            
-        # Send initial progress
-        yield self._format_sse(self.get_progress(job_id))
         
-        # Continue sending updates until task completes or errors
-        retry_count = 0
-        max_retries = 5  # Stop after 5 failed checks
+        # Send initial progress (or the events missed since last_event_id)
+        for event_id, snapshot in events:
+            yield self._format_sse(snapshot, event_id=event_id)
         
-        while retry_count < max_retries:
-            time.sleep(1)  # Check progress every second
-            
-            progress = self.get_progress(job_id)
-            if not progress:
-                retry_count += 1
+        # Continue sending updates until task completes or errors
+        while progress['status'] not in ['completed', 'error']:
+            changed, version = self.wait_for_change(job_id, version, timeout=heartbeat)
+            if changed is None:
+                break
+            if changed is False:
+                # 保持空闲连接，代理和浏览器不会因超时断开
+                yield ": heartbeat\n\n"
                 continue
-                
-            yield self._format_sse(progress)
+            progress = changed
             
-            # If task is completed or failed, stop streaming
-            if progress['status'] in ['completed', 'error']:
-                break
+            if coalesce:
+                # 合并短时间内的连续更新，只发送最新状态
+                time.sleep(coalesce)
+                latest, latest_version = self._snapshot(job_id)
+                if latest is not None:
+                    progress, version = latest, latest_version
+                
+            yield self._format_sse(progress, event_id=version)
                 
         # Final message
         yield self._format_sse({"message": "Stream closed"})
     
-    def _format_sse(self, data):
+    async def astream_progress(self, job_id, heartbeat=15.0, coalesce=0.1, last_event_id=None):
+        """
+        Async variant of stream_progress for the ASGI server
+        
+        Instead of blocking a thread on the task's condition variable, the
+        subscriber registers a listener that sets an asyncio.Event on its loop.
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        
+        def wake():
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+        
+        # 先注册监听再读取快照，期间的变化不会丢失
+        local = self.add_listener(job_id, wake)
+        
+        async def read(func, *args):
+            # 其他工作进程的任务从SQLite读取，放到线程池中执行，不阻塞事件循环
+            if local:
+                return func(*args)
+            return await loop.run_in_executor(None, func, *args)
+        
+        try:
+            events, progress, version = await read(self._initial_events, job_id, last_event_id)
+            if events is None:
+                yield self._format_sse({"error": "Task not found"})
+                return
+            for event_id, snapshot in events:
+                yield self._format_sse(snapshot, event_id=event_id)
+            
+            idle = 0.0
+            while progress['status'] not in ['completed', 'error']:
+                if local:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": heartbeat\n\n"
+                        continue
+                else:
+                    # 其他工作进程的任务没有本地通知，轮询存储中的版本号
+                    await asyncio.sleep(self.store_poll_interval)
+                    latest, latest_version = await read(self._snapshot, job_id)
+                    if latest is not None and latest_version == version:
+                        idle += self.store_poll_interval
+                        if idle >= heartbeat:
+                            idle = 0.0
+                            yield ": heartbeat\n\n"
+                        continue
+                    idle = 0.0
+                
+                if coalesce:
+                    # 合并短时间内的连续更新，只发送最新状态
+                    await asyncio.sleep(coalesce)
+                changed.clear()
+                
+                latest, latest_version = await read(self._snapshot, job_id)
+                if latest is None:
+                    break
+                if latest_version == version:
+                    continue
+                progress, version = latest, latest_version
+                yield self._format_sse(progress, event_id=version)
+            
+            # Final message
+            yield self._format_sse({"message": "Stream closed"})
+        finally:
+            if local:
+                self.remove_listener(job_id, wake)
+    
+    def _format_sse(self, data, event_id=None):
         """Format data as SSE message"""
         if isinstance(data, dict):
             data = json.dumps(data)
+        if event_id is not None:
+            return f"id: {event_id}\ndata: {data}\n\n"
         return f"data: {data}\n\n"
 
 
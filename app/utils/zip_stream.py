@@ -0,0 +1,76 @@
+import io
+import os
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+# Formats that are already compressed: deflating them costs CPU for no size gain
+COMPRESSED_EXTENSIONS = {'.mp3', '.flac', '.ogg', '.opus', '.m4a', '.aac', '.mp4', '.zip'}
+
+
+def compress_type_for(name):
+    """ZIP_STORED for already-compressed formats, ZIP_DEFLATED otherwise (e.g. WAV)"""
+    if os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that collects the bytes zipfile produces until they are drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        # zipfile needs the offsets of local headers for the central directory
+        return self._offset
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files, chunk_size=CHUNK_SIZE):
+    """
+    Generate a ZIP archive of files chunk by chunk, without writing it to disk
+
+    Because the target is not seekable, sizes and CRCs go into data descriptors
+    after each entry, so every byte can be sent as soon as it is produced.
+
+    Args:
+        files: Iterable of (path, archive_name)
+        chunk_size: Bytes read from each source file at a time
+
+    Yields:
+        bytes: Consecutive pieces of the archive
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for path, arcname in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compress_type_for(arcname)
+            with open(path, 'rb') as source, archive.open(info, 'w') as target:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory, written when the archive is closed
+    yield sink.drain()
@@ -0,0 +1,10 @@
+"""
+ASGI入口，流式端点运行在事件循环上
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8080
+"""
+
+from run import application as flask_application
+from app.asgi import create_asgi_app
+
+application = create_asgi_app(flask_application)
@@ -77,9 +77,11 @@ else:
 # 加载.env文件中的环境变量
 load_dotenv()
 
-from app import app as application
+from app import create_app
 from app.config import get_config
 
+application = create_app(get_config())
+
 if __name__ == '__main__':
     config = get_config()
     application.run(
@@ -4,11 +4,11 @@
 echo "🔧 初始化Demucs目录结构..."
 
 # 创建主要目录
-mkdir -p /demucs/{uploads,outputs,models}
+mkdir -p /demucs/{uploads,outputs,models,data}
 
 # 设置权限
 chmod 755 /demucs
-chmod 755 /demucs/{uploads,outputs,models}
+chmod 755 /demucs/{uploads,outputs,models,data}
 
 # 创建测试目录
 mkdir -p /demucs/{test_uploads,test_outputs}
@@ -18,6 +18,7 @@ echo "✅ 目录结构初始化完成："
 echo "   📁 /demucs/uploads - 上传目录"
 echo "   📁 /demucs/outputs - 输出目录" 
 echo "   📁 /demucs/models - 模型缓存目录"
+echo "   📁 /demucs/data - 任务状态数据库目录"
 echo "   📁 /demucs/test_uploads - 测试上传目录"
 echo "   📁 /demucs/test_outputs - 测试输出目录"
 
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP批量请求基准测试
+
+比较逐个请求和JSON-RPC批量请求查询任务状态（get_job_status）的单次调用开销。
+
+用法:
+    # 进程内（Flask测试客户端，测量应用本身的每请求开销）
+    python scripts/mcp_batch_benchmark.py --calls 2000 --batch-size 50
+
+    # 运行中的服务（保持连接，包含HTTP往返）
+    python scripts/mcp_batch_benchmark.py --url http://localhost:8080 --calls 2000 --batch-size 50
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import http.client
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def status_call(request_id, job_id):
+    return {'jsonrpc': '2.0', 'id': request_id, 'method': 'tools/call',
+            'params': {'name': 'get_job_status', 'arguments': {'job_id': job_id}}}
+
+
+class InProcessClient:
+    """通过Flask测试客户端调用 /mcp，并创建用于查询的任务记录"""
+
+    def __init__(self, job_count):
+        from app import create_app
+        from app.config import TestingConfig
+        from app.routes.api import sse_manager
+
+        self.client = create_app(TestingConfig).test_client()
+        self.job_ids = [f'bench-{index:05d}' for index in range(job_count)]
+        for job_id in self.job_ids:
+            sse_manager.create_task(job_id, status='processing', message='处理中', source='mcp')
+
+    def post(self, payload):
+        response = self.client.post('/mcp', json=payload)
+        return response.status_code, response.get_json()
+
+
+class HTTPClient:
+    """通过保持连接的HTTP请求调用 /mcp，查询给定的任务ID"""
+
+    def __init__(self, url, job_ids):
+        parts = urlsplit(url)
+        self.path = parts.path.rstrip('/') + '/mcp'
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.job_ids = job_ids
+
+    def post(self, payload):
+        body = json.dumps(payload).encode()
+        self.connection.request('POST', self.path, body, {'Content-Type': 'application/json'})
+        response = self.connection.getresponse()
+        data = response.read()
+        return response.status, json.loads(data) if data else None
+
+
+def run_unbatched(client, calls):
+    started = time.perf_counter()
+    for index in range(calls):
+        status, response = client.post(status_call(index, client.job_ids[index % len(client.job_ids)]))
+        if status != 200 or 'result' not in response:
+            raise RuntimeError(f'请求失败: {status} {response}')
+    return time.perf_counter() - started
+
+
+def run_batched(client, calls, batch_size):
+    started = time.perf_counter()
+    for offset in range(0, calls, batch_size):
+        batch = [status_call(index, client.job_ids[index % len(client.job_ids)])
+                 for index in range(offset, min(calls, offset + batch_size))]
+        status, responses = client.post(batch)
+        if status != 200 or len(responses) != len(batch) or any('result' not in r for r in responses):
+            raise RuntimeError(f'批量请求失败: {status} {str(responses)[:200]}')
+    return time.perf_counter() - started
+
+
+def main(args):
+    if args.url:
+        job_ids = args.job_id or ['bench-missing']
+        client = HTTPClient(args.url, job_ids)
+    else:
+        client = InProcessClient(args.jobs)
+
+    # 预热（连接、线程池、数据库连接）
+    run_unbatched(client, min(args.calls, 20))
+    run_batched(client, min(args.calls, args.batch_size * 2), args.batch_size)
+
+    unbatched = run_unbatched(client, args.calls)
+    batched = run_batched(client, args.calls, args.batch_size)
+
+    print(f"调用数: {args.calls}，批量大小: {args.batch_size}" + (f"，服务: {args.url}" if args.url else "，进程内"))
+    print(f"逐个请求: 总计 {unbatched:.3f}s，每次调用 {unbatched / args.calls * 1e6:.0f}µs")
+    print(f"批量请求: 总计 {batched:.3f}s，每次调用 {batched / args.calls * 1e6:.0f}µs")
+    print(f"加速比: {unbatched / batched:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MCP批量请求基准测试")
+    parser.add_argument('--url', help='服务地址；不指定时在进程内测试')
+    parser.add_argument('--job-id', action='append', help='查询的任务ID（--url模式，可重复）')
+    parser.add_argument('--jobs', type=int, default=100, help='进程内模式创建的任务数')
+    parser.add_argument('--calls', type=int, default=2000, help='状态查询次数')
+    parser.add_argument('--batch-size', type=int, default=50, help='每个批量请求的调用数')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSE并发订阅压测
+
+打开大量 /api/progress/<job_id> 订阅连接并保持空闲，同时测量普通API请求的延迟，
+验证流式连接不会耗尽服务的工作线程。
+
+用法:
+    # ASGI模式（uvicorn asgi:application --port 8080）
+    python scripts/sse_load_test.py --url http://localhost:8080 --audio test.mp3 --subscribers 2000
+
+    # 观察已有任务
+    python scripts/sse_load_test.py --url http://localhost:8080 --job-id <job_id>
+
+注意: 大量连接需要提高文件描述符上限，例如 `ulimit -n 65535`。
+"""
+
+import sys
+import time
+import json
+import uuid
+import asyncio
+import argparse
+import statistics
+from urllib.parse import urlsplit
+
+
+class Target:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.base_path = parts.path.rstrip('/')
+
+
+async def http_request(target, method, path, body=b'', headers=None):
+    """最小化的HTTP/1.1请求，返回(状态码, 响应体)"""
+    reader, writer = await asyncio.open_connection(target.host, target.port)
+    lines = [f"{method} {target.base_path}{path} HTTP/1.1", f"Host: {target.host}", "Connection: close",
+             f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"transfer-encoding: chunked" in head.lower():
+        payload = decode_chunked(payload)
+    return status, payload
+
+
+def decode_chunked(data):
+    body = b""
+    while data:
+        size_line, _, rest = data.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        body += rest[:size]
+        data = rest[size + 2:]
+    return body
+
+
+async def start_job(target, audio_path):
+    """上传音频文件创建一个分离任务"""
+    boundary = uuid.uuid4().hex
+    with open(audio_path, 'rb') as f:
+        content = f.read()
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{audio_path.split('/')[-1]}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    status, payload = await http_request(target, 'POST', '/api/process', body,
+                                         {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    if status != 200:
+        raise RuntimeError(f"创建任务失败: {status} {payload[:200]!r}")
+    return json.loads(payload)['data']['job_id']
+
+
+class Subscriber:
+    """一个SSE订阅连接"""
+
+    def __init__(self):
+        self.connected_at = None
+        self.first_event_at = None
+        self.events = 0
+        self.closed = False
+        self.error = None
+
+    async def run(self, target, job_id, started):
+        try:
+            reader, writer = await asyncio.open_connection(target.host, target.port)
+            request = (f"GET {target.base_path}/api/progress/{job_id} HTTP/1.1\r\nHost: {target.host}\r\n"
+                       f"Accept: text/event-stream\r\n\r\n")
+            writer.write(request.encode())
+            await writer.drain()
+            self.connected_at = time.time() - started
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"data:") or b"data:" in line:
+                    self.events += 1
+                    if self.first_event_at is None:
+                        self.first_event_at = time.time() - started
+                    if b"Stream closed" in line:
+                        break
+            self.closed = True
+            writer.close()
+        except Exception as e:
+            self.error = str(e)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def measure_api(target, path, count, interval):
+    """在订阅保持期间测量普通API请求延迟"""
+    latencies = []
+    failures = 0
+    for _ in range(count):
+        start = time.time()
+        try:
+            status, _ = await asyncio.wait_for(http_request(target, 'GET', path), timeout=10)
+            if status != 200:
+                failures += 1
+        except Exception:
+            failures += 1
+            continue
+        latencies.append(time.time() - start)
+        await asyncio.sleep(interval)
+    return latencies, failures
+
+
+async def main(args):
+    target = Target(args.url)
+    job_id = args.job_id or await start_job(target, args.audio)
+    print(f"任务: {job_id}")
+
+    started = time.time()
+    subscribers = [Subscriber() for _ in range(args.subscribers)]
+    tasks = []
+    for i, subscriber in enumerate(subscribers):
+        tasks.append(asyncio.ensure_future(subscriber.run(target, job_id, started)))
+        if args.ramp and i % args.ramp == 0:
+            await asyncio.sleep(0)
+
+    # 等待所有订阅收到首个事件
+    deadline = time.time() + args.connect_timeout
+    while time.time() < deadline and sum(1 for s in subscribers if s.first_event_at) < args.subscribers:
+        await asyncio.sleep(0.2)
+    subscribed = sum(1 for s in subscribers if s.first_event_at)
+    first_events = [s.first_event_at for s in subscribers if s.first_event_at]
+    print(f"已订阅: {subscribed}/{args.subscribers}，首个事件 p50={percentile(first_events, 0.5):.3f}s "
+          f"p95={percentile(first_events, 0.95):.3f}s" if first_events else f"已订阅: 0/{args.subscribers}")
+
+    latencies, failures = await measure_api(target, args.api_path, args.api_requests, args.api_interval)
+    p50 = percentile(latencies, 0.5)
+    p95 = percentile(latencies, 0.95)
+    print(f"订阅保持期间 GET {args.api_path}: {len(latencies)} 成功, {failures} 失败" +
+          (f", p50={p50 * 1000:.1f}ms p95={p95 * 1000:.1f}ms" if latencies else ""))
+
+    errors = [s.error for s in subscribers if s.error]
+    if errors:
+        print(f"订阅错误: {len(errors)}，示例: {errors[0]}")
+
+    if args.wait_complete:
+        await asyncio.wait(tasks, timeout=args.wait_complete)
+        closed = sum(1 for s in subscribers if s.closed)
+        print(f"任务结束后关闭的订阅: {closed}/{args.subscribers}")
+    for task in tasks:
+        task.cancel()
+
+    passed = (subscribed == args.subscribers and failures == 0 and p95 is not None
+              and p95 <= args.max_api_p95_ms / 1000)
+    print("结果: " + ("通过" if passed else "未通过"))
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SSE并发订阅压测")
+    parser.add_argument('--url', default='http://localhost:8080', help='服务地址')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--job-id', help='观察已有任务')
+    group.add_argument('--audio', help='上传该音频文件创建任务')
+    parser.add_argument('--subscribers', type=int, default=1000, help='并发订阅数')
+    parser.add_argument('--ramp', type=int, default=100, help='每建立多少个连接让出一次事件循环')
+    parser.add_argument('--connect-timeout', type=float, default=60, help='等待全部订阅建立的秒数')
+    parser.add_argument('--api-path', default='/api/models', help='测量延迟的普通API')
+    parser.add_argument('--api-requests', type=int, default=50, help='测量的请求数')
+    parser.add_argument('--api-interval', type=float, default=0.05, help='请求间隔秒数')
+    parser.add_argument('--max-api-p95-ms', type=float, default=500, help='通过标准: API p95延迟上限（毫秒）')
+    parser.add_argument('--wait-complete', type=float, default=0, help='等待任务完成并统计关闭的订阅（秒）')
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI流式服务测试
+
+验证进度流在事件循环上推送、客户端断开时释放订阅，以及其他请求交给Flask处理
+"""
+
+import os
+import sys
+import json
+import asyncio
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.asgi import create_asgi_app
+from app.routes.api import sse_manager
+
+
+class TestASGIStreaming(unittest.TestCase):
+    """测试ASGI模式的流式端点"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.asgi_app = create_asgi_app(create_app(TestingConfig))
+
+    def setUp(self):
+        sse_manager.create_task('asgi-job', status='processing', message='处理中')
+
+    def tearDown(self):
+        sse_manager.clean_task('asgi-job')
+
+    def _scope(self, path, headers=None, query=b'', root_path=''):
+        return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+                'headers': headers or [], 'scheme': 'http', 'server': ('testserver', 80),
+                'root_path': root_path, 'http_version': '1.1'}
+
+    def test_progress_stream_pushes_updates(self):
+        """更新后立即推送，任务完成后流结束"""
+        async def scenario():
+            sent = []
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            stream = asyncio.ensure_future(self.asgi_app(self._scope('/api/progress/asgi-job'), receive, send))
+            await asyncio.sleep(0.05)
+            self.assertEqual(sse_manager.subscriber_count(), 1)
+            sse_manager.update_progress('asgi-job', 100, '完成', 'completed')
+            await asyncio.wait_for(stream, timeout=5)
+            return sent
+
+        sent = asyncio.run(scenario())
+        self.assertEqual(sent[0]['status'], 200)
+        body = b''.join(m.get('body', b'') for m in sent[1:]).decode()
+        events = [json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')]
+        self.assertEqual(events[0]['status'], 'processing')
+        self.assertEqual(events[1]['status'], 'completed')
+        self.assertEqual(events[-1], {'message': 'Stream closed'})
+        self.assertFalse(sent[-1]['more_body'])
+        self.assertEqual(sse_manager.subscriber_count(), 0)
+
+    def test_disconnect_releases_subscription(self):
+        """客户端断开后监听器被移除"""
+        async def scenario():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                pass
+
+            stream = asyncio.ensure_future(self.asgi_app(self._scope('/api/progress/asgi-job'), receive, send))
+            await asyncio.sleep(0.05)
+            listening = sse_manager.subscriber_count()
+            disconnect.set()
+            await asyncio.wait_for(stream, timeout=5)
+            return listening
+
+        self.assertEqual(asyncio.run(scenario()), 1)
+        self.assertEqual(sse_manager.subscriber_count(), 0)
+
+    def test_stream_under_root_path(self):
+        """挂载在子路径下时，path中的root_path去掉后再匹配流式端点"""
+        async def scenario():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                pass
+
+            scope = self._scope('/demucs/api/progress/asgi-job', root_path='/demucs')
+            stream = asyncio.ensure_future(self.asgi_app(scope, receive, send))
+            await asyncio.sleep(0.05)
+            listening = sse_manager.subscriber_count()
+            disconnect.set()
+            await asyncio.wait_for(stream, timeout=5)
+            return listening
+
+        self.assertEqual(asyncio.run(scenario()), 1)
+
+    def test_other_routes_use_flask(self):
+        """非流式请求由Flask应用处理，与流式端点共享任务状态"""
+        async def scenario():
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                sent.append(message)
+
+            await self.asgi_app(self._scope('/api/status/asgi-job'), receive, send)
+            return sent
+
+        sent = asyncio.run(scenario())
+        self.assertEqual(sent[0]['status'], 200)
+        payload = json.loads(b''.join(m.get('body', b'') for m in sent[1:]))
+        self.assertEqual(payload['data']['job_id'], 'asgi-job')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务文件索引测试
+
+验证FileManager在创建文件时登记任务ID到路径的映射，查找和删除任务文件时不扫描目录，
+并且索引在重启后仍然可用
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.job_store import JobStore
+from app.services.file_index import FileIndex
+from app.services.file_manager import FileManager
+
+JOB_ID = 'a1b2c3d4-job'
+
+
+class FakeUpload:
+    filename = 'song.mp3'
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+
+
+class TestFileIndex(unittest.TestCase):
+    """测试FileManager的文件索引"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'jobs.db')
+        self.config = SimpleNamespace(UPLOAD_FOLDER=os.path.join(self.temp_dir, 'uploads'),
+                                      OUTPUT_FOLDER=os.path.join(self.temp_dir, 'outputs'),
+                                      FILE_RETENTION_MINUTES=30)
+        self.file_manager = FileManager(self.config, index=FileIndex(JobStore(self.db_path)))
+
+        _, self.upload_path = self.file_manager.save_uploaded_file(FakeUpload(), job_id=JOB_ID)
+        self.job_dir = self.file_manager.create_job_output_directory(JOB_ID)
+        self.stems = []
+        for stem in ('vocals', 'drums'):
+            path = os.path.join(self.job_dir, f'{stem}.mp3')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 50)
+            self.stems.append({'path': path, 'size': 50})
+        self.file_manager.record_output_files(JOB_ID, self.stems)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_lookups_do_not_scan_directories(self):
+        """查找输出目录和任务文件不调用listdir/walk"""
+        with mock.patch('os.listdir', side_effect=AssertionError('scan')), \
+                mock.patch('os.walk', side_effect=AssertionError('scan')):
+            self.assertEqual(self.file_manager.get_job_output_directory(JOB_ID), self.job_dir)
+            kinds = sorted(f['kind'] for f in self.file_manager.get_job_files(JOB_ID))
+        self.assertEqual(kinds, ['output_dir', 'stem', 'stem', 'upload'])
+
+    def test_index_survives_restart(self):
+        """新的FileManager实例（重启后）从同一数据库读取索引"""
+        restarted = FileManager(self.config, index=FileIndex(JobStore(self.db_path)))
+        self.assertEqual(restarted.get_job_output_directory(JOB_ID), self.job_dir)
+        jobs = restarted.index.jobs()
+        self.assertIn(self.upload_path, jobs[JOB_ID]['paths'])
+
+    def test_claim_orphans_once(self):
+        """只接管已退出进程的文件，且只有一个进程接管"""
+        index = self.file_manager.index
+        other = os.path.join(self.temp_dir, 'other.mp3')
+        index.add('live-job', 'upload', other, size=0)
+        index.conn.execute("UPDATE job_files SET owner_pid = ? WHERE job_id = ?", (999999, JOB_ID))
+        index.conn.execute("UPDATE job_files SET owner_pid = ? WHERE job_id = ?", (os.getppid(), 'live-job'))
+
+        with mock.patch('app.services.file_index._pid_alive', side_effect=lambda pid: pid != 999999):
+            claimed = FileIndex(JobStore(self.db_path)).claim_orphans()
+            self.assertEqual(list(claimed), [JOB_ID])
+            self.assertIn(self.upload_path, claimed[JOB_ID]['paths'])
+            # 已被本进程接管：其他启动中的工作进程不会再恢复这些文件
+            with mock.patch('os.getpid', return_value=os.getpid() + 1):
+                self.assertEqual(FileIndex(JobStore(self.db_path)).claim_orphans(), {})
+
+    def test_cleanup_job_files(self):
+        """按索引删除任务的所有文件并移除索引条目"""
+        with mock.patch('os.walk', side_effect=AssertionError('scan')):
+            success, _ = self.file_manager.cleanup_job_files(JOB_ID)
+        self.assertTrue(success)
+        self.assertFalse(os.path.exists(self.upload_path))
+        self.assertFalse(os.path.exists(self.job_dir))
+        self.assertEqual(self.file_manager.get_job_files(JOB_ID), [])
+        self.assertIsNone(self.file_manager.get_job_output_directory(JOB_ID))
+
+    def test_backfill_files_from_before_index(self):
+        """索引创建时登记之前版本留下的文件，之后可以查找、清理和回收"""
+        old_job = 'e5f6a7b8-old'
+        old_dir = os.path.join(self.config.OUTPUT_FOLDER, '20240101', old_job)
+        os.makedirs(old_dir)
+        for path in (os.path.join(old_dir, 'vocals.mp3'),
+                     os.path.join(self.config.OUTPUT_FOLDER, f'demucs_output_{old_job}.zip'),
+                     os.path.join(self.config.UPLOAD_FOLDER, 'song_0a1b2c3d.mp3')):
+            with open(path, 'wb') as f:
+                f.write(b'x' * 10)
+
+        # 新数据库：索引刚创建，扫描一次文件夹
+        file_manager = FileManager(self.config, index=FileIndex(JobStore(os.path.join(self.temp_dir, 'new.db'))))
+        self.assertEqual(file_manager.get_job_output_directory(old_job), old_dir)
+        self.assertEqual(sorted(f['kind'] for f in file_manager.get_job_files(old_job)),
+                         ['output_dir', 'stem', 'zip'])
+        self.assertEqual([f['kind'] for f in file_manager.get_job_files('0a1b2c3d')], ['upload'])
+        self.assertIn(old_job, file_manager.index.claim_orphans())
+
+        # 已有索引不再扫描
+        with mock.patch('os.scandir', side_effect=AssertionError('scan')):
+            FileManager(self.config, index=FileIndex(JobStore(self.db_path)))
+
+        success, _ = file_manager.cleanup_job_files(old_job)
+        self.assertTrue(success)
+        self.assertFalse(os.path.exists(old_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.config.OUTPUT_FOLDER, f'demucs_output_{old_job}.zip')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件清单测试
+
+验证文件索引增量维护每个任务的文件数和占用空间，管理接口按页查询、排序、过滤并返回汇总用量，
+且不扫描目录
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+from app.services.file_index import FileIndex, UPLOAD, OUTPUT_DIR, STEM
+
+
+class TestFileInventory(unittest.TestCase):
+    """测试文件索引的用量汇总"""
+
+    def setUp(self):
+        self.index = FileIndex()
+
+    def _add_job(self, job_id, upload_size=100, stem_sizes=(50, 50), created_at=None):
+        self.index.add(job_id, UPLOAD, f'/uploads/song_{job_id}.mp3', size=upload_size)
+        self.index.add(job_id, OUTPUT_DIR, f'/outputs/{job_id}', size=0)
+        for i, size in enumerate(stem_sizes):
+            self.index.add(job_id, STEM, f'/outputs/{job_id}/stem{i}.mp3', size=size)
+        if created_at is not None:
+            self.index.conn.execute("UPDATE job_usage SET created_at = ?, updated_at = ? WHERE job_id = ?",
+                                    (created_at, created_at, job_id))
+
+    def test_usage_is_maintained_incrementally(self):
+        self._add_job('job-a')
+        self._add_job('job-b', upload_size=10, stem_sizes=())
+        usage = self.index.usage()
+        self.assertEqual(usage['tasks'], 2)
+        self.assertEqual(usage['files'], 4)
+        self.assertEqual(usage['input_bytes'], 110)
+        self.assertEqual(usage['output_bytes'], 100)
+
+        # 删除目录会移除其下所有文件的条目
+        self.index.remove_path('/outputs/job-a')
+        rows, _ = self.index.query_jobs(task='job-a')
+        self.assertEqual(rows[0]['output_files'], 0)
+        self.assertEqual(rows[0]['total_bytes'], 100)
+
+        self.index.remove_job('job-b')
+        self.assertEqual(self.index.usage()['tasks'], 1)
+        self.index.clear()
+        self.assertEqual(self.index.usage()['total_bytes'], 0)
+
+    def test_totals_without_aggregating(self):
+        """汇总来自触发器维护的单行合计"""
+        self._add_job('job-a')
+        self._add_job('job-b', upload_size=10, stem_sizes=(5,))
+        self.index.remove_path('/outputs/job-a/stem0.mp3')
+        expected = {'tasks': 2, 'files': 4, 'input_bytes': 110, 'output_bytes': 55, 'total_bytes': 165}
+        usage = self.index.usage()
+        self.assertEqual({key: usage[key] for key in expected}, expected)
+        # 再次打开同一数据库不会重复初始化合计
+        reopened = FileIndex(self.index.store).usage()
+        self.assertEqual({key: reopened[key] for key in expected}, expected)
+
+    def test_query_filters_and_sorting(self):
+        now = time.time()
+        self._add_job('big-old', upload_size=1000, created_at=now - 7200)
+        self._add_job('small-new', upload_size=1, stem_sizes=(), created_at=now)
+        self._add_job('mid', created_at=now - 60)
+
+        rows, total = self.index.query_jobs(sort='total_size', descending=True, limit=2)
+        self.assertEqual(total, 3)
+        self.assertEqual([row['job_id'] for row in rows], ['big-old', 'mid'])
+
+        rows, _ = self.index.query_jobs(sort='total_size', descending=False, limit=2, offset=2)
+        self.assertEqual([row['job_id'] for row in rows], ['big-old'])
+
+        rows, total = self.index.query_jobs(updated_before=now - 3600)
+        self.assertEqual([row['job_id'] for row in rows], ['big-old'])
+        rows, _ = self.index.query_jobs(min_size=50, max_size=500)
+        self.assertEqual([row['job_id'] for row in rows], ['mid'])
+        rows, _ = self.index.query_jobs(status='processing')
+        self.assertEqual([row['job_id'] for row in rows], ['small-new'])
+        rows, _ = self.index.query_jobs(file_type='output', task='big')
+        self.assertEqual([row['job_id'] for row in rows], ['big-old'])
+
+    def test_job_store_status_wins(self):
+        self._add_job('failed-job')
+        self.index.store.save('failed-job', {'status': 'error', 'progress': 40})
+        rows, _ = self.index.query_jobs(status='error')
+        self.assertEqual([row['job_id'] for row in rows], ['failed-job'])
+        self.assertEqual(self.index.status_counts(), {'error': 1})
+
+
+class TestAdminFilesEndpoint(unittest.TestCase):
+    """测试 /admin/api/files 的分页接口"""
+
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.temp_dir = tempfile.mkdtemp()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['admin_authenticated'] = True
+        index = self.app.file_manager.index
+        for i in range(7):
+            job_id = f'job-{i:02d}-inventory'
+            path = os.path.join(self.temp_dir, f'song_{job_id}.mp3')
+            index.add(job_id, UPLOAD, path, size=100 * (i + 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_paginates_without_scanning(self):
+        with mock.patch('os.walk', side_effect=AssertionError('scan')), \
+                mock.patch('os.stat', side_effect=AssertionError('stat')):
+            response = self.client.get('/admin/api/files?per_page=3&page=3&sort=total_size&order=asc')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(data['pagination'], {'page': 3, 'per_page': 3, 'total': 7, 'pages': 3})
+        self.assertEqual([task['task_id'] for task in data['tasks']], ['job-06-inventory'])
+        self.assertEqual(data['tasks'][0]['input_files'][0]['size'], 700)
+        self.assertEqual(data['usage']['total_bytes'], 2800)
+        self.assertEqual(data['summary']['total_tasks'], 7)
+
+    def test_filters(self):
+        response = self.client.get('/admin/api/files?min_size=500&task=job-0')
+        data = response.get_json()['data']
+        self.assertEqual(data['pagination']['total'], 3)
+        # 过滤只影响当前列表，用量仍是全部任务的汇总
+        self.assertEqual(data['usage']['tasks'], 7)
+
+    def test_cleanup_old_keeps_active_jobs(self):
+        """清理过期文件跳过排队或处理中的任务"""
+        index = self.app.file_manager.index
+        old = time.time() - 24 * 3600
+        index.conn.execute("UPDATE job_usage SET created_at = ?, updated_at = ?", (old, old))
+        active = ['job-01-inventory', 'job-04-inventory']
+        for job_id in active:
+            sse_manager.create_task(job_id, status='processing')
+            self.addCleanup(sse_manager.clean_task, job_id)
+
+        response = self.client.post('/admin/api/cleanup/old')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('跳过 2 个', response.get_json()['message'])
+        rows, _ = index.query_jobs()
+        self.assertEqual(sorted(row['job_id'] for row in rows), active)
+
+
+if __name__ == '__main__':
+    unittest.main()
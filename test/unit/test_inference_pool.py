@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推理进程池测试
+
+验证工作进程导入的模块不会创建完整的应用（数据库、janitor、进程池），
+以及替换工作进程时等待旧进程退出不持有进程池的锁
+"""
+
+import os
+import sys
+import queue
+import threading
+import subprocess
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加项目根目录到路径
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.inference_pool import InferencePool, _WorkerHandle
+
+
+class SlowExitProcess:
+    """Worker process that takes a while to exit after being asked to"""
+
+    def __init__(self):
+        self.exited = threading.Event()
+        self.joining = threading.Event()
+        self.exitcode = None
+
+    def is_alive(self):
+        return not self.exited.is_set()
+
+    def join(self, timeout=None):
+        self.joining.set()
+        self.exited.wait(timeout)
+
+    def terminate(self):
+        self.exited.set()
+
+
+class TestInferencePool(unittest.TestCase):
+    """测试推理进程池"""
+
+    def test_worker_imports_do_not_create_app(self):
+        """工作进程（spawn）导入配置和分离服务时不创建应用"""
+        code = ("import logging; logging.basicConfig(level=logging.DEBUG); "
+                "import app.config, app.services.inference_pool; import app; "
+                "assert not hasattr(app, 'app')")
+        result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn('Application services initialized', result.stderr)
+        self.assertNotIn('Job store', result.stderr)
+
+    def test_recycling_joins_outside_lock(self):
+        pool = InferencePool(SimpleNamespace(INFERENCE_WORKERS=1, WORKER_MAX_JOBS=1))
+        process = SlowExitProcess()
+        handle = _WorkerHandle(0, process, queue.Queue())
+        handle.jobs_done = 1
+        pool.workers[0] = handle
+
+        with mock.patch.object(pool, '_spawn_worker_locked', return_value=1):
+            pool._release_worker(handle, crashed=False)
+        self.assertTrue(process.joining.wait(2))
+        # 旧进程退出期间锁可用，进度转发和其他任务不被阻塞
+        self.assertTrue(pool.lock.acquire(timeout=0.5))
+        pool.lock.release()
+        self.assertEqual(pool._idle.get_nowait(), 1)
+        self.assertIsNone(handle.task_queue.get_nowait())
+        process.exited.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
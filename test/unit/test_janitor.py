@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+过期回收测试
+
+验证janitor按过期时间顺序回收任务文件和记录，推迟仍在处理的任务，并统计回收的字节数
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.janitor import Janitor
+
+
+class TestJanitor(unittest.TestCase):
+    """测试基于堆的过期回收"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.upload_folder = os.path.join(self.temp_dir, 'uploads')
+        self.output_folder = os.path.join(self.temp_dir, 'outputs')
+        os.makedirs(self.upload_folder)
+        os.makedirs(self.output_folder)
+        config = SimpleNamespace(FILE_RETENTION_MINUTES=30, UPLOAD_FOLDER=self.upload_folder,
+                                 OUTPUT_FOLDER=self.output_folder)
+        self.janitor = Janitor(config)
+        self.evicted = []
+        self.janitor.add_evict_callback(self.evicted.append)
+
+    def tearDown(self):
+        self.janitor.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _make_job(self, job_id):
+        """创建上传文件、日期目录下的输出目录和ZIP"""
+        upload = os.path.join(self.upload_folder, f'song_{job_id}.mp3')
+        with open(upload, 'wb') as f:
+            f.write(b'x' * 100)
+        job_dir = os.path.join(self.output_folder, '20240101', job_id)
+        os.makedirs(job_dir)
+        for stem in ('vocals', 'drums'):
+            with open(os.path.join(job_dir, f'{stem}.mp3'), 'wb') as f:
+                f.write(b'x' * 50)
+        zip_path = os.path.join(self.output_folder, '20240101', f'demucs_output_{job_id}.zip')
+        with open(zip_path, 'wb') as f:
+            f.write(b'x' * 80)
+        return [upload, job_dir, zip_path]
+
+    def test_evicts_files_and_records_at_expiry(self):
+        """到期时删除上传文件、输出目录和ZIP，并运行回调"""
+        paths = self._make_job('job1')
+        self.janitor.track('job1', paths, ttl=0.2)
+
+        deadline = time.time() + 5
+        while not self.evicted and time.time() < deadline:
+            time.sleep(0.02)
+
+        self.assertEqual(self.evicted, ['job1'])
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+        # 空的日期目录也被删除，根目录保留
+        self.assertFalse(os.path.exists(os.path.join(self.output_folder, '20240101')))
+        self.assertTrue(os.path.isdir(self.output_folder))
+
+        stats = self.janitor.stats()
+        self.assertEqual(stats['evicted_jobs'], 1)
+        self.assertEqual(stats['removed_files'], 4)
+        self.assertEqual(stats['reclaimed_bytes'], 280)
+        self.assertEqual(stats['tracked_jobs'], 0)
+
+    def test_evicts_in_expiry_order(self):
+        """按过期时间而不是加入顺序回收"""
+        self.janitor.track('late', ttl=-1)
+        self.janitor.track('early', ttl=-2)
+        self.janitor.track('pending', ttl=60)
+        self.janitor.shutdown()
+        self.assertEqual(self.janitor.run_pending(), 2)
+        self.assertEqual(self.evicted, ['early', 'late'])
+        self.assertEqual(self.janitor.stats()['tracked_jobs'], 1)
+
+    def test_track_again_extends_retention(self):
+        """再次track会重新开始保留期，旧的堆条目被忽略"""
+        self.janitor.shutdown()
+        self.janitor.track('job', ttl=-1)
+        self.janitor.track('job', ttl=60)
+        self.assertEqual(self.janitor.run_pending(), 0)
+
+    def test_active_jobs_are_postponed(self):
+        """仍在处理的任务推迟回收"""
+        self.janitor.shutdown()
+        paths = self._make_job('busy')
+        self.janitor.is_active = lambda job_id: True
+        self.janitor.track('busy', paths, ttl=-1)
+        self.assertEqual(self.janitor.run_pending(), 0)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        self.assertEqual(self.janitor.stats()['postponed'], 1)
+
+    def test_restore_from_index(self):
+        """重启前的任务按最后更新时间恢复过期时间"""
+        self.janitor.shutdown()
+        paths = self._make_job('old')
+        self.janitor.restore({
+            'old': {'paths': paths, 'updated_at': time.time() - 3600},
+            'recent': {'paths': [], 'updated_at': time.time()}
+        })
+        self.assertEqual(self.janitor.run_pending(), 1)
+        self.assertEqual(self.evicted, ['old'])
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_forget(self):
+        self.janitor.shutdown()
+        self.janitor.track('job', ttl=-1)
+        self.assertTrue(self.janitor.forget('job'))
+        self.assertEqual(self.janitor.run_pending(), 0)
+        self.assertEqual(self.evicted, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
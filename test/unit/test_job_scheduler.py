@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务调度器测试
+
+验证有界队列、推理槽位限制、排队位置估计和队列满时的拒绝
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.job_scheduler import JobScheduler, QueueFullError
+
+
+class TestJobScheduler(unittest.TestCase):
+    """测试JobScheduler"""
+
+    def setUp(self):
+        self.config = SimpleNamespace(INFERENCE_SLOTS=1, MAX_QUEUED_JOBS=2, ESTIMATED_JOB_SECONDS=60)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def blocking_job(self, started=None):
+        def run():
+            if started is not None:
+                started.set()
+            self.release.wait(5)
+        return run
+
+    def test_slots_limit_concurrency(self):
+        """同时运行的任务数不超过槽位数"""
+        scheduler = JobScheduler(self.config)
+        started = threading.Event()
+        scheduler.submit("job-1", self.blocking_job(started))
+        self.assertTrue(started.wait(2))
+        scheduler.submit("job-2", self.blocking_job())
+
+        stats = scheduler.stats()
+        self.assertEqual(stats['running'], 1)
+        self.assertEqual(stats['queued'], 1)
+
+    def test_queue_position_and_estimate(self):
+        """排队任务返回排队位置和预计开始时间"""
+        scheduler = JobScheduler(self.config)
+        started = threading.Event()
+        scheduler.submit("job-1", self.blocking_job(started))
+        self.assertTrue(started.wait(2))
+        scheduler.submit("job-2", self.blocking_job())
+        scheduler.submit("job-3", self.blocking_job())
+
+        running = scheduler.get_job_info("job-1")
+        self.assertEqual(running['state'], 'running')
+
+        second = scheduler.get_job_info("job-2")
+        third = scheduler.get_job_info("job-3")
+        self.assertEqual(second['queue_position'], 1)
+        self.assertEqual(third['queue_position'], 2)
+        self.assertLessEqual(second['estimated_wait_seconds'], 60)
+        self.assertGreater(third['estimated_start_time'], second['estimated_start_time'])
+        self.assertIsNone(scheduler.get_job_info("unknown"))
+
+    def test_queue_full(self):
+        """队列满时抛出QueueFullError并给出重试时间"""
+        scheduler = JobScheduler(self.config)
+        started = threading.Event()
+        scheduler.submit("job-1", self.blocking_job(started))
+        self.assertTrue(started.wait(2))
+        scheduler.submit("job-2", self.blocking_job())
+        scheduler.submit("job-3", self.blocking_job())
+
+        with self.assertRaises(QueueFullError) as ctx:
+            scheduler.submit("job-4", self.blocking_job())
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(scheduler.stats()['rejected'], 1)
+
+    def test_jobs_complete(self):
+        """任务执行完成后更新统计"""
+        scheduler = JobScheduler(self.config)
+        done = threading.Event()
+        scheduler.submit("job-1", done.set)
+        self.assertTrue(done.wait(2))
+        time.sleep(0.05)
+        stats = scheduler.stats()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['running'], 0)
+
+    def test_no_waiting_queue(self):
+        """MAX_QUEUED_JOBS=0时不排队：有空闲槽位才接受任务"""
+        scheduler = JobScheduler(SimpleNamespace(INFERENCE_SLOTS=2, MAX_QUEUED_JOBS=0, ESTIMATED_JOB_SECONDS=60))
+        started = threading.Event()
+        scheduler.submit("job-1", self.blocking_job(started))
+        self.assertTrue(started.wait(2))
+        scheduler.submit("job-2", self.blocking_job())
+        with self.assertRaises(QueueFullError):
+            scheduler.submit("job-3", self.blocking_job())
+        self.assertEqual(scheduler.stats()['submitted'], 2)
+
+    def test_failed_jobs_counted(self):
+        """任务返回False或抛出异常时计为失败"""
+        scheduler = JobScheduler(self.config)
+        done = threading.Event()
+
+        def raising():
+            raise RuntimeError('boom')
+
+        scheduler.submit("job-1", lambda: False)
+        scheduler.submit("job-2", raising)
+        scheduler.submit("job-3", done.set)
+        self.assertTrue(done.wait(2))
+        time.sleep(0.05)
+        stats = scheduler.stats()
+        self.assertEqual((stats['failed'], stats['completed']), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务存储测试
+
+验证任务记录持久化到SQLite，其他进程（另一个SSEManager/JobStore实例）可以读取和订阅，
+MCP的get_job_status可以查询API创建的任务
+"""
+
+import os
+import sys
+import json
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+import multiprocessing
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.job_store import JobStore
+from app.services.mcp_server import MCPServer
+from app.utils.sse import SSEManager
+
+
+def _read_status(db_path, job_id, results):
+    results.put(JobStore(db_path).get(job_id)['status'])
+
+
+class TestJobStore(unittest.TestCase):
+    """测试SQLite任务存储"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'data', 'jobs.db')
+        self.store = JobStore(self.db_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_wal_mode_and_indexes(self):
+        """数据库使用WAL模式，并为状态和创建时间建立索引"""
+        self.assertEqual(self.store.conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        indexes = {row[1] for row in self.store.conn.execute("PRAGMA index_list(jobs)")}
+        self.assertIn('idx_jobs_status', indexes)
+        self.assertIn('idx_jobs_created_at', indexes)
+
+    def test_update_merges_fields_and_bumps_version(self):
+        """update合并字段并递增版本号"""
+        self.store.save('job', {'job_id': 'job', 'status': 'queued', 'progress': 0}, version=1)
+        self.store.update('job', {'status': 'processing', 'progress': 30})
+        task, version = self.store.get_with_version('job')
+        self.assertEqual(version, 2)
+        self.assertEqual(task['status'], 'processing')
+        self.assertEqual(task['job_id'], 'job')
+
+    def test_list_and_counts(self):
+        """按状态过滤、分页和统计"""
+        for i in range(5):
+            self.store.save(f'job{i}', {'status': 'completed' if i % 2 else 'error', 'created_at': i})
+        completed = self.store.list(status='completed')
+        self.assertEqual([job['created_at'] for job in completed], [3, 1])
+        self.assertEqual(len(self.store.list(limit=2, offset=4)), 1)
+        self.assertEqual(self.store.count_by_status(), {'completed': 2, 'error': 3})
+        self.assertEqual(self.store.count(status='error'), 3)
+
+    def test_readable_from_another_process(self):
+        """其他进程可以读取同一数据库中的任务"""
+        self.store.save('job', {'status': 'processing'})
+        results = multiprocessing.get_context('spawn').Queue()
+        process = multiprocessing.get_context('spawn').Process(
+            target=_read_status, args=(self.db_path, 'job', results))
+        process.start()
+        process.join(30)
+        self.assertEqual(results.get(timeout=5), 'processing')
+
+    def test_recover_orphans(self):
+        """所属进程已不存在的未完成任务被标记为失败"""
+        self.store.save('job', {'status': 'processing'})
+        self.store.conn.execute("UPDATE jobs SET owner_pid = ?", (2 ** 22 + 1,))
+        self.store.save('done', {'status': 'completed'})
+        self.assertEqual(self.store.recover_orphans(), 1)
+        self.assertEqual(self.store.get('job')['status'], 'error')
+        self.assertEqual(self.store.get('done')['status'], 'completed')
+
+
+class TestSharedJobStore(unittest.TestCase):
+    """测试SSEManager和MCP通过任务存储共享状态"""
+
+    def setUp(self):
+        self.store = JobStore()
+        self.owner = SSEManager()
+        self.owner.attach_store(self.store)
+        # 模拟另一个工作进程：没有本地任务，只能访问共享存储
+        self.other = SSEManager()
+        self.other.attach_store(self.store)
+        self.other.store_poll_interval = 0.02
+
+    def test_task_visible_to_other_worker(self):
+        """其他工作进程可以查询进度和结果文件"""
+        self.owner.create_task('job', status='queued')
+        self.owner.update_progress('job', 100, '完成', 'completed', result_file='/tmp/result.zip')
+        self.assertEqual(self.other.get_progress('job')['status'], 'completed')
+        self.assertEqual(self.other.get_result_file('job'), '/tmp/result.zip')
+
+    def test_other_worker_streams_progress(self):
+        """其他工作进程的SSE流通过轮询存储收到更新"""
+        self.owner.create_task('job', status='queued')
+        stream = self.other.stream_progress('job', heartbeat=5, coalesce=0)
+        first = next(stream)
+        self.assertIn('"queued"', first)
+
+        threading.Timer(0.05, self.owner.update_progress, args=('job', 100, '完成', 'completed')).start()
+        event = json.loads(next(stream).split('data: ', 1)[1])
+        self.assertEqual(event['status'], 'completed')
+        self.assertIn('Stream closed', next(stream))
+
+    def test_other_worker_async_stream_reads_off_loop(self):
+        """异步流读取其他工作进程的任务时，SQLite查询不在事件循环线程执行"""
+        self.owner.create_task('job', status='queued')
+        get_with_version = self.store.get_with_version
+        threads = []
+
+        def recording_get(*args):
+            threads.append(threading.get_ident())
+            return get_with_version(*args)
+
+        self.store.get_with_version = recording_get
+
+        async def scenario():
+            events = []
+            threading.Timer(0.05, self.owner.update_progress, args=('job', 100, '完成', 'completed')).start()
+            async for event in self.other.astream_progress('job', heartbeat=5, coalesce=0):
+                events.append(event)
+            return events, threading.get_ident()
+
+        events, loop_thread = asyncio.run(scenario())
+        self.assertIn('"completed"', events[-2])
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_progress_batched_outside_lock(self):
+        """状态变化立即写入；进度变化批量写入，写入时不持有进度管理器的锁"""
+        self.owner.store_write_interval = 60
+        self.owner.create_task('job', status='queued')
+        self.owner.update_progress('job', 0, status='processing')
+        self.assertEqual(self.other.get_progress('job')['status'], 'processing')
+
+        save = self.store.save
+        lock_free = []
+
+        def checking_save(*args, **kwargs):
+            lock_free.append(self.owner.lock.acquire(blocking=False))
+            if lock_free[-1]:
+                self.owner.lock.release()
+            save(*args, **kwargs)
+
+        self.store.save = checking_save
+        for value in range(10, 60, 10):
+            self.owner.update_progress('job', value)
+        self.assertEqual(lock_free, [])
+        self.assertEqual(self.other.get_progress('job')['progress'], 0)
+        self.assertEqual(self.owner.flush(), 1)
+        self.assertEqual(self.other.get_progress('job')['progress'], 50)
+
+        self.owner.update_progress('job', 100, '完成', 'completed')
+        self.assertEqual(self.other.get_progress('job')['status'], 'completed')
+        self.assertEqual(lock_free, [True, True])
+        self.assertEqual(self.owner.flush(), 0)
+
+    def test_clean_task_removes_record(self):
+        self.owner.create_task('job')
+        self.assertTrue(self.other.clean_task('job'))
+        self.assertIsNone(self.owner.store.get('job'))
+
+    def test_mcp_get_job_status_sees_api_jobs(self):
+        """MCP get_job_status可以查询API创建的任务"""
+        self.owner.create_task('job', status='queued')
+        server = MCPServer()
+        server.job_store = self.store
+        result = server._get_job_status({'job_id': 'job'})
+        self.assertEqual(json.loads(result['content'][0]['text'])['status'], 'queued')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长音频模式测试
+
+验证窗口规划、窗口交叉淡化拼接，以及按窗口分离时音轨流式写入编码器
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import torch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.audio_separator import AudioSeparator
+from app.services.long_audio import StreamingEncoder, WindowCrossfader, iter_windows, open_pcm_file, plan_windows
+
+
+class FakeDemucs(torch.nn.Module):
+    """每个音源输出输入乘以不同系数的假分离模型"""
+
+    def __init__(self):
+        super().__init__()
+        self.samplerate = 100
+        self.segment = 2.0
+        self.audio_channels = 2
+        self.sources = ["vocals", "drums", "bass", "other"]
+
+    def forward(self, mix):
+        gains = torch.arange(1, len(self.sources) + 1, dtype=mix.dtype).view(1, -1, 1, 1)
+        return mix.unsqueeze(1) * gains
+
+
+class FakeEncoder:
+    """收集写入数据的假编码器"""
+    instances = {}
+
+    def __init__(self, output_path, format_type, quality_settings, input_samplerate, output_samplerate, channels):
+        self.output_path = output_path
+        self.chunks = []
+        FakeEncoder.instances[os.path.basename(output_path)] = self
+
+    def write(self, audio):
+        self.chunks.append(audio.clone())
+
+    def close(self):
+        with open(self.output_path, 'wb') as f:
+            f.write(b'mp3')
+        return self.output_path
+
+    def abort(self):
+        pass
+
+
+class TestLongFileMode(unittest.TestCase):
+    """测试长音频模式"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        FakeEncoder.instances = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_plan_windows(self):
+        """内存足够时整段处理，否则窗口大小由内存上限决定"""
+        args = dict(samplerate=44100, channels=2, sources=4, overlap_seconds=2.0, min_window_seconds=30.0)
+        self.assertIsNone(plan_windows(duration=60, memory_limit_bytes=2048 * 1024 * 1024, **args))
+
+        small = plan_windows(duration=1200, memory_limit_bytes=1024 * 1024 * 1024, **args)
+        large = plan_windows(duration=1200, memory_limit_bytes=1536 * 1024 * 1024, **args)
+        self.assertLess(small['window_seconds'], large['window_seconds'])
+        self.assertLessEqual(large['estimated_peak_bytes'], 1536 * 1024 * 1024)
+        self.assertGreater(small['windows'], large['windows'])
+
+        forced = plan_windows(duration=60, memory_limit_bytes=2048 * 1024 * 1024, force=True, **args)
+        self.assertEqual(forced['windows'], 1)
+
+    def test_crossfade_reconstructs_signal(self):
+        """相同信号的重叠窗口拼接后与原信号一致"""
+        signal = torch.randn(2, 1000)
+        crossfader = WindowCrossfader(overlap=50)
+        windows = list(iter_windows(1000, 300, 50))
+        pieces = [crossfader.push(signal[:, start:end], last=end >= 1000) for start, end in windows]
+        self.assertGreater(len(windows), 3)
+        torch.testing.assert_close(torch.cat(pieces, dim=-1), signal)
+
+    def test_windowed_separation_streams_stems(self):
+        """按窗口分离后每个音轨的流式输出拼接为完整音轨"""
+        config = SimpleNamespace(
+            MODEL_CACHE_MAX_MODELS=1, MODEL_CACHE_MAX_BYTES=0, MODEL_LOAD_TIMEOUT=10, ENCODER_WORKERS=2,
+            AUDIO_QUALITY_SETTINGS={'low': {'mp3_bitrate': '128k', 'sample_rate': 100, 'description': 'low'}},
+            CHANNELS=2
+        )
+        separator = AudioSeparator(config)
+        separator.initialize()
+
+        audio = np.random.uniform(-0.2, 0.2, size=(2000, 2)).astype(np.float32)
+        pcm_path = os.path.join(self.temp_dir, 'decoded.f32')
+        audio.tofile(pcm_path)
+
+        plan = {'window_seconds': 6.0, 'overlap_seconds': 1.0}
+        with mock.patch('app.services.audio_separator.StreamingEncoder', FakeEncoder):
+            futures = separator._separate_windowed(
+                model=FakeDemucs(), pcm=open_pcm_file(pcm_path, 2), plan=plan, stems=['vocals', 'bass'],
+                output_base=os.path.join(self.temp_dir, 'song'), model_name='fake', output_format='mp3',
+                audio_quality='low', output_samplerate=100, job_id='job', progress_callback=None,
+                base_progress=10, max_progress=85
+            )
+            files = [future.result() for future in futures]
+
+        self.assertEqual([f['name'] for f in files], ['song_fake_vocals.mp3', 'song_fake_bass.mp3'])
+        expected = torch.from_numpy(audio).t()
+        vocals = torch.cat(FakeEncoder.instances['song_fake_vocals.mp3'].chunks, dim=-1)
+        bass = torch.cat(FakeEncoder.instances['song_fake_bass.mp3'].chunks, dim=-1)
+        self.assertGreater(len(FakeEncoder.instances['song_fake_vocals.mp3'].chunks), 2)
+        torch.testing.assert_close(vocals, expected, atol=1e-4, rtol=1e-4)
+        torch.testing.assert_close(bass, expected * 3, atol=1e-4, rtol=1e-4)
+
+
+# 代替ffmpeg的脚本：大量写标准错误，然后读完标准输入（或提前以退出码2退出）
+CHATTY_FFMPEG = (
+    "import sys; sys.stderr.write('warning: chatty encoder\\n' * 20000); sys.stderr.flush(); "
+    "sys.exit(2) if sys.argv[-1].endswith('fail.mp3') else sys.stdin.buffer.read()"
+)
+
+
+class TestStreamingEncoder(unittest.TestCase):
+    """测试流式编码器与ffmpeg进程的交互"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        popen = subprocess.Popen
+        patcher = mock.patch('app.services.long_audio.subprocess.Popen',
+                             side_effect=lambda cmd, **kwargs: popen(
+                                 [sys.executable, '-c', CHATTY_FFMPEG, cmd[-1]], **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _encoder(self, name):
+        return StreamingEncoder(os.path.join(self.temp_dir, name), 'mp3', {'mp3_bitrate': '128k'},
+                                input_samplerate=100, output_samplerate=100, channels=2)
+
+    def test_chatty_stderr_does_not_block_writes(self):
+        """ffmpeg的标准错误超过管道缓冲区时写入仍然完成"""
+        encoder = self._encoder('ok.mp3')
+        for _ in range(20):
+            encoder.write(torch.zeros(2, 100_000))
+        self.assertTrue(encoder.close().endswith('ok.mp3'))
+
+    def test_early_exit_raises_encoder_error(self):
+        """ffmpeg提前退出时抛出带退出码和错误输出的编码错误"""
+        encoder = self._encoder('fail.mp3')
+        with self.assertRaises(RuntimeError) as ctx:
+            for _ in range(20):
+                encoder.write(torch.zeros(2, 100_000))
+        self.assertIn('退出码 2', str(ctx.exception))
+        self.assertIn('chatty encoder', str(ctx.exception))
+        self.assertIsInstance(ctx.exception.__cause__, BrokenPipeError)
+        encoder.abort()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP批量请求测试
+
+验证 /mcp 端点支持JSON-RPC 2.0批量请求：数组请求返回按顺序排列的响应数组，通知不返回响应，
+无效成员返回各自的错误，批量中的调用在有界线程池中并发执行
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+
+
+def status_call(request_id, job_id):
+    return {'jsonrpc': '2.0', 'id': request_id, 'method': 'tools/call',
+            'params': {'name': 'get_job_status', 'arguments': {'job_id': job_id}}}
+
+
+class TestMCPBatch(unittest.TestCase):
+    """测试JSON-RPC批量请求"""
+
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.mcp = self.app.mcp_server
+
+    def test_batch_in_order_without_notifications(self):
+        sse_manager.create_task('batch-job-1', status='processing', message='处理中', source='mcp')
+        batch = [
+            status_call(1, 'batch-job-1'),
+            {'jsonrpc': '2.0', 'method': 'notifications/initialized'},
+            {'jsonrpc': '2.0', 'id': 'models', 'method': 'tools/call', 'params': {'name': 'get_models'}},
+            42,
+            {'jsonrpc': '2.0', 'id': 3, 'method': 'no/such/method'},
+        ]
+        response = self.client.post('/mcp', json=batch)
+        self.assertEqual(response.status_code, 200)
+        responses = response.get_json()
+        self.assertEqual([r['id'] for r in responses], [1, 'models', None, 3])
+        self.assertIn('batch-job-1', responses[0]['result']['content'][0]['text'])
+        self.assertIn('result', responses[1])
+        self.assertEqual(responses[2]['error']['code'], -32600)
+        self.assertEqual(responses[3]['error']['code'], -32601)
+
+    def test_empty_and_notification_only_batches(self):
+        response = self.client.post('/mcp', json=[])
+        self.assertEqual(response.get_json()['error']['code'], -32600)
+        response = self.client.post('/mcp', json=[{'jsonrpc': '2.0', 'method': 'notifications/initialized'}])
+        self.assertEqual(response.status_code, 204)
+        self.mcp.batch_max_requests = 2
+        response = self.client.post('/mcp', json=[status_call(i, 'missing') for i in range(3)])
+        self.assertEqual(response.get_json()['error']['code'], -32600)
+
+    def test_calls_run_concurrently_on_bounded_pool(self):
+        self.mcp.batch_workers = 3
+        running = []
+        peak = []
+        lock = threading.Lock()
+        original = self.mcp._get_job_status
+
+        def slow_status(arguments):
+            with lock:
+                running.append(threading.current_thread().name)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            return original(arguments)
+
+        self.mcp._get_job_status = slow_status
+        started = time.time()
+        responses = self.mcp.handle_batch([status_call(i, f'job-{i}') for i in range(9)])
+        elapsed = time.time() - started
+
+        self.assertEqual([r['id'] for r in responses], list(range(9)))
+        self.assertEqual(max(peak), 3)
+        self.assertLess(elapsed, 9 * 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP音频分离测试
+
+验证MCP separate_audio工具通过与 /api/process 相同的提交流程执行任务（推理池、结果缓存），
+流事件反映真实的分段进度，完成后的音轨作为MCP资源提供
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import tempfile
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+
+
+class FakeInferencePool:
+    """Reports segment progress like AudioSeparator and writes one stem"""
+
+    def __init__(self):
+        self.calls = []
+
+    def run(self, job_id, params, progress_callback=None):
+        self.calls.append(params)
+        progress_callback(40, "正在处理音频，使用模型: htdemucs (2/4)", "正在处理音频",
+                          {'segments_done': 2, 'segments_total': 4, 'eta_seconds': 1.5})
+        path = os.path.join(params['output_dir'], 'vocals.mp3')
+        with open(path, 'wb') as f:
+            f.write(b'stem-bytes')
+        return {'files': [{'name': 'vocals.mp3', 'stem': 'vocals', 'format': 'mp3', 'size': 10, 'path': path}]}
+
+
+class TestMCPSeparation(unittest.TestCase):
+    """测试MCP分离工具和任务资源"""
+
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.app.inference_pool = self.pool = FakeInferencePool()
+        self.mcp = self.app.mcp_server
+        # MCP请求在 /mcp 端点的请求上下文中处理
+        self.context = self.app.app_context()
+        self.context.push()
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, 'song.mp3')
+        with open(self.input_path, 'wb') as f:
+            f.write(os.urandom(1000))
+
+    def tearDown(self):
+        self.context.pop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _call(self, method, params):
+        response = self.mcp.handle_jsonrpc_request({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params})
+        self.assertNotIn('error', response)
+        return response['result']
+
+    def _separate(self):
+        result = self._call('tools/call', {'name': 'separate_audio', 'arguments': {'file_path': self.input_path}})
+        return json.loads(result['content'][0]['text'])
+
+    def _wait_completed(self, job_id):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            progress = sse_manager.get_progress(job_id)
+            if progress and progress['status'] in ('completed', 'error'):
+                return progress
+            time.sleep(0.02)
+        self.fail(f'job {job_id} did not finish')
+
+    def test_runs_real_pipeline_and_streams_progress(self):
+        job_id = None
+        stream = None
+        # 在任务开始前打开流：拦截提交，先创建流再执行
+        original_submit = self.app.job_scheduler.submit
+
+        def submit(submitted_id, func):
+            nonlocal stream, job_id
+            job_id = submitted_id
+            stream = self.mcp.generate_stream_events(submitted_id)
+            events.append(next(stream))
+            return original_submit(submitted_id, func)
+
+        events = []
+        self.app.job_scheduler.submit = submit
+        result = self._separate()
+        self.assertEqual(result['job_id'], job_id)
+
+        for event in stream:
+            if event.startswith('data: '):
+                events.append(event)
+        self.assertEqual(self.pool.calls[0]['input_file'], self.input_path)
+        data = [json.loads(event.split('data: ', 1)[1]) for event in events if event.startswith('data: ')]
+        progress = next(event for event in data if event.get('segments_done') == 2)
+        self.assertEqual((progress['segments_total'], progress['eta_seconds']), (4, 1.5))
+        completed = next(event for event in data if event['type'] == 'completed')
+        self.assertEqual(completed['output_files'][0]['uri'], f'demucs://jobs/{job_id}/stems/vocals')
+        self.assertEqual(data[-1]['type'], 'end')
+
+        # 调用方的文件不属于任务，不会登记到任务文件中
+        self.assertNotIn(self.input_path, [f['path'] for f in self.app.file_manager.get_job_files(job_id)])
+
+    def test_stems_are_resources_and_cache_is_shared(self):
+        job_id = self._separate()['job_id']
+        self._wait_completed(job_id)
+        self.assertEqual(self.app.job_store.list(source='mcp')[0]['job_id'], job_id)
+
+        uris = [resource['uri'] for resource in self._call('resources/list', {})['resources']]
+        stem_uri = f'demucs://jobs/{job_id}/stems/vocals'
+        self.assertIn(stem_uri, uris)
+        content = self._call('resources/read', {'uri': stem_uri})['contents'][0]
+        self.assertEqual(content['mimeType'], 'audio/mpeg')
+        self.assertEqual(base64.b64decode(content['blob']), b'stem-bytes')
+        job = json.loads(self._call('resources/read', {'uri': f'demucs://jobs/{job_id}'})['contents'][0]['text'])
+        self.assertEqual(job['stems'][0]['uri'], stem_uri)
+
+        # 相同文件和参数：复用已完成的结果，不再推理
+        again = self._separate()
+        self.assertEqual((again['job_id'], again['cached']), (job_id, True))
+        self.assertEqual(len(self.pool.calls), 1)
+
+        # 已完成任务的流直接发送结果和结束信号
+        events = [json.loads(event.split('data: ', 1)[1]) for event in self.mcp.generate_stream_events(job_id)]
+        self.assertEqual([event['type'] for event in events], ['completed', 'end'])
+
+    def test_missing_file(self):
+        result = self._call('tools/call', {'name': 'separate_audio',
+                                           'arguments': {'file_path': '/nonexistent/song.mp3'}})
+        self.assertIn('error', json.loads(result['content'][0]['text']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP stdio传输测试
+
+验证stdio会话用换行分隔的JSON-RPC处理请求（单个、批量、通知、解析错误），
+separate_audio 启动的任务进度作为异步通知（notifications/progress 和资源更新）写到输出
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.mcp_stdio import StdioSession
+
+
+class FakeInferencePool:
+    """Reports one progress step and writes one stem"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def run(self, job_id, params, progress_callback=None):
+        progress_callback(40, "正在处理音频 (2/4)", "正在处理音频", {'segments_done': 2, 'segments_total': 4})
+        self.release.wait(5)
+        path = os.path.join(params['output_dir'], 'vocals.mp3')
+        with open(path, 'wb') as f:
+            f.write(b'stem-bytes')
+        return {'files': [{'name': 'vocals.mp3', 'stem': 'vocals', 'format': 'mp3', 'size': 10, 'path': path}]}
+
+
+class LineWriter:
+    """Collects written protocol lines"""
+
+    def __init__(self):
+        self.lines = []
+        self.condition = threading.Condition()
+
+    def write(self, text):
+        with self.condition:
+            self.lines.extend(json.loads(line) for line in text.splitlines())
+            self.condition.notify_all()
+
+    def flush(self):
+        pass
+
+    def wait_for(self, predicate, timeout=5):
+        with self.condition:
+            return self.condition.wait_for(lambda: any(predicate(message) for message in self.lines), timeout)
+
+
+class TestMCPStdio(unittest.TestCase):
+    """测试MCP stdio会话"""
+
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.app.inference_pool = self.pool = FakeInferencePool()
+        self.writer = LineWriter()
+        self.session = StdioSession(self.app, iter(()), self.writer, session_id='stdio-test')
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, 'song.mp3')
+        with open(self.input_path, 'wb') as f:
+            f.write(os.urandom(1000))
+
+    def tearDown(self):
+        self.pool.release.set()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_request_framing(self):
+        response = self.session.handle_line('{"jsonrpc": "2.0", "id": 1, "method": "tools/list"}\n')
+        self.assertEqual(response['id'], 1)
+        self.assertIn('tools', response['result'])
+        self.assertIsNone(self.session.handle_line('{"jsonrpc": "2.0", "method": "notifications/initialized"}'))
+        self.assertIsNone(self.session.handle_line('  \n'))
+        self.assertEqual(self.session.handle_line('{not json')['error']['code'], -32700)
+
+        batch = [{'jsonrpc': '2.0', 'id': i, 'method': 'tools/call',
+                  'params': {'name': 'get_job_status', 'arguments': {'job_id': f'job-{i}'}}} for i in range(3)]
+        self.assertEqual([r['id'] for r in self.session.handle_line(json.dumps(batch))], [0, 1, 2])
+
+    def test_progress_notifications_while_serving(self):
+        done = threading.Event()
+
+        def lines():
+            yield json.dumps({'jsonrpc': '2.0', 'id': 7, 'method': 'tools/call', 'params': {
+                'name': 'separate_audio', 'arguments': {'file_path': self.input_path},
+                '_meta': {'progressToken': 'tok-1'}}}) + '\n'
+            # 输入保持打开，直到收到完成通知
+            done.wait(5)
+
+        self.session.reader = lines()
+        server = threading.Thread(target=self.session.serve)
+        server.start()
+
+        self.assertTrue(self.writer.wait_for(lambda m: m.get('id') == 7))
+        self.assertTrue(self.writer.wait_for(
+            lambda m: m.get('method') == 'notifications/progress' and m['params']['progress'] == 40))
+        self.pool.release.set()
+        self.assertTrue(self.writer.wait_for(
+            lambda m: m.get('method') == 'notifications/progress' and m['params']['progress'] == 100))
+        done.set()
+        server.join(5)
+        self.assertFalse(server.is_alive())
+
+        progress = [m['params'] for m in self.writer.lines if m.get('method') == 'notifications/progress']
+        self.assertTrue(all(p['progressToken'] == 'tok-1' and p['total'] == 100 for p in progress))
+        updates = [m['params'] for m in self.writer.lines if m.get('method') == 'notifications/resources/updated']
+        self.assertEqual(updates[-1]['status'], 'completed')
+        self.assertTrue(updates[-1]['job']['output_files'][0]['uri'].endswith('/stems/vocals'))
+        # 会话结束后流和订阅一起关闭
+        self.assertNotIn('stdio-test', self.app.mcp_server.streams)
+        self.assertEqual(self.app.mcp_server.subscriptions, {})
+
+    def test_cached_job_reports_final_progress_immediately(self):
+        self.pool.release.set()
+        call = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': {
+            'name': 'separate_audio', 'arguments': {'file_path': self.input_path}}})
+        job_id = json.loads(self.session.handle_line(call)['result']['content'][0]['text'])['job_id']
+        deadline = time.time() + 5
+        while self.app.mcp_server.job_update(job_id)['params']['status'] != 'completed' and time.time() < deadline:
+            time.sleep(0.02)
+
+        call = json.dumps({'jsonrpc': '2.0', 'id': 2, 'method': 'tools/call', 'params': {
+            'name': 'separate_audio', 'arguments': {'file_path': self.input_path},
+            '_meta': {'progressToken': 5}}})
+        self.session.handle_line(call)
+        progress = [m['params'] for m in self.writer.lines if m.get('method') == 'notifications/progress']
+        self.assertEqual(progress, [{'progressToken': 5, 'progress': 100, 'total': 100, 'message': progress[0]['message']}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP流缓冲测试
+
+验证每个MCP流的缓冲有界：未读取的进度事件合并为最新一条、超过事件数或字节数时丢弃最旧的
+非终止事件、没有读取方的流按空闲超时回收，以及流统计
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.mcp_server import MCPServer
+from app.services.stream_buffer import StreamBuffer
+
+
+def progress(job_id, value):
+    return {'type': 'progress', 'job_id': job_id, 'progress': value}
+
+
+class TestStreamBuffer(unittest.TestCase):
+    """测试有界流缓冲"""
+
+    def test_coalesces_pending_progress(self):
+        buffer = StreamBuffer(max_events=8)
+        for value in range(10):
+            buffer.put(progress('job-1', value))
+        buffer.put({'type': 'completed', 'job_id': 'job-1'})
+        buffer.put(progress('job-1', 100))
+
+        self.assertEqual(buffer.get_nowait()['progress'], 9)
+        self.assertEqual(buffer.get_nowait()['type'], 'completed')
+        self.assertEqual(buffer.get_nowait()['progress'], 100)
+        self.assertEqual(buffer.coalesced, 9)
+        self.assertEqual(buffer.queued_bytes, 0)
+
+    def test_drops_oldest_but_keeps_terminal_events(self):
+        buffer = StreamBuffer(max_events=3)
+        buffer.put({'type': 'completed', 'job_id': 'job-1'})
+        for index in range(5):
+            buffer.put({'type': 'log', 'job_id': 'job-1', 'index': index})
+        buffer.put({'type': 'end', 'job_id': 'job-1'})
+
+        events = [buffer.get_nowait() for _ in range(len(buffer))]
+        self.assertEqual([event['type'] for event in events], ['completed', 'log', 'end'])
+        self.assertEqual(events[1]['index'], 4)
+        self.assertEqual(buffer.dropped, 4)
+
+    def test_byte_limit(self):
+        buffer = StreamBuffer(max_events=100, max_bytes=300)
+        for index in range(20):
+            buffer.put({'type': 'log', 'index': index, 'text': 'x' * 50})
+        self.assertLessEqual(buffer.queued_bytes, 300)
+        self.assertEqual(buffer.dropped + len(buffer), 20)
+
+    def test_reader_wakes_on_put_and_close(self):
+        buffer = StreamBuffer()
+        threading.Timer(0.05, buffer.put, args=(progress('job-1', 5),)).start()
+        self.assertEqual(buffer.get(timeout=2)['progress'], 5)
+        threading.Timer(0.05, buffer.close).start()
+        self.assertIsNone(buffer.get(timeout=2))
+        self.assertFalse(buffer.put(progress('job-1', 6)))
+
+
+class TestMCPStreams(unittest.TestCase):
+    """测试MCP服务器的流管理"""
+
+    def setUp(self):
+        self.mcp = MCPServer()
+        self.mcp.stream_max_events = 4
+        self.mcp.stream_idle_seconds = 60
+
+    def test_slow_reader_stays_bounded(self):
+        stream = self.mcp.create_stream('job-1')
+        for value in range(1000):
+            self.mcp.send_to_stream('job-1', progress('job-1', value))
+            self.mcp.send_to_stream('job-1', {'type': 'log', 'job_id': 'job-1', 'index': value})
+        self.assertEqual(len(stream), 4)
+
+        stats = self.mcp.stream_stats()
+        self.assertEqual((stats['live_streams'], stats['queued_events']), (1, 4))
+        self.assertEqual(stats['queued_bytes'], stream.queued_bytes)
+        self.assertEqual(stats['dropped_events'] + stats['queued_events'], 2000)
+
+    def test_idle_streams_are_reaped(self):
+        abandoned = self.mcp.create_stream('job-1')
+        active = self.mcp.create_stream('job-2')
+        self.mcp.send_to_stream('job-1', progress('job-1', 10))
+        now = time.time() + 120
+        active.last_read = now
+
+        self.assertEqual(self.mcp.reap_idle_streams(now=now, force=True), 1)
+        self.assertTrue(abandoned.closed)
+        self.assertEqual(list(self.mcp.streams), ['job-2'])
+        stats = self.mcp.stream_stats()
+        self.assertEqual((stats['reaped_streams'], stats['queued_bytes']), (1, 0))
+
+    def test_generator_ends_when_stream_is_reaped(self):
+        events = self.mcp.generate_stream_events('job-1')
+        threading.Timer(0.05, self.mcp.send_to_stream, args=('job-1', progress('job-1', 10))).start()
+        self.assertIn('"progress": 10', next(events))
+        stream = self.mcp.streams['job-1']
+        self.mcp.close_stream('job-1')
+        self.assertEqual(list(events), [])
+        self.assertTrue(stream.closed)
+        self.assertNotIn('job-1', self.mcp.streams)
+
+    def test_reopened_stream_replaces_previous(self):
+        first = self.mcp.create_stream('job-1')
+        second = self.mcp.create_stream('job-1')
+        self.assertTrue(first.closed)
+        # 旧读取方退出时不影响新流
+        self.mcp.close_stream('job-1', first)
+        self.assertIs(self.mcp.streams['job-1'], second)
+
+
+if __name__ == '__main__':
+    unittest.main()
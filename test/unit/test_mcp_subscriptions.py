@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP资源订阅测试
+
+验证客户端可以订阅任务资源（demucs://jobs/{job_id}），任务状态真正变化时通过会话的流推送
+notifications/resources/updated，取消订阅后不再推送，任务过期时订阅被清理
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+from app.utils.sse import SSEManager
+
+
+class TestMCPSubscriptions(unittest.TestCase):
+    """测试任务资源订阅"""
+
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.mcp = self.app.mcp_server
+        self.job_id = 'sub-job-0001'
+        self.uri = f'demucs://jobs/{self.job_id}'
+        sse_manager.create_task(self.job_id, status='queued', message='任务排队中', source='mcp')
+        self.stream = self.mcp.create_stream('session-1')
+
+    def tearDown(self):
+        sse_manager.clean_task(self.job_id)
+
+    def _rpc(self, method, params, session_id='session-1'):
+        headers = {'Mcp-Session-Id': session_id} if session_id else {}
+        response = self.client.post('/mcp', json={'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params},
+                                    headers=headers)
+        return response.get_json()
+
+    def _notifications(self):
+        events = []
+        while True:
+            event = self.stream.get_nowait()
+            if event is None:
+                return events
+            events.append(event)
+
+    def test_pushes_only_real_changes(self):
+        self.assertEqual(self._rpc('resources/subscribe', {'uri': self.uri})['result'], {})
+
+        sse_manager.update_progress(self.job_id, 30, '正在处理音频', '正在处理音频')
+        sse_manager.update_progress(self.job_id, 30, '正在处理音频', '正在处理音频')
+        events = self._notifications()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['method'], 'notifications/resources/updated')
+        self.assertEqual(events[0]['params']['uri'], self.uri)
+        self.assertEqual(events[0]['params']['job']['progress'], 30)
+
+        self._rpc('resources/unsubscribe', {'uri': self.uri})
+        sse_manager.update_progress(self.job_id, 60, '正在处理音频', '正在处理音频')
+        self.assertEqual(self._notifications(), [])
+        self.assertEqual(self.mcp.subscriptions, {})
+
+    def test_pending_updates_coalesce_per_resource(self):
+        self._rpc('resources/subscribe', {'uri': self.uri})
+        for value in range(10, 100, 10):
+            sse_manager.update_progress(self.job_id, value, '正在处理音频', '正在处理音频')
+        events = self._notifications()
+        self.assertEqual([event['params']['job']['progress'] for event in events], [90])
+
+        # 未读取的更新被最终状态替换；最终状态不会被后续通知覆盖
+        sse_manager.update_progress(self.job_id, 95, '保存音轨文件', '保存音轨文件')
+        sse_manager.update_progress(self.job_id, 100, '完成', 'completed')
+        self.mcp.forget_job(self.job_id)
+        events = self._notifications()
+        self.assertEqual([event['params'].get('status') for event in events], ['completed', None])
+        self.assertTrue(events[1]['params']['expired'])
+
+    def test_expired_job_drops_subscriptions(self):
+        self._rpc('resources/subscribe', {'uri': self.uri})
+        sse_manager.update_progress(self.job_id, 100, '完成', 'completed')
+        self.app.janitor.track(self.job_id, ttl=0)
+        self.app.janitor.run_pending()
+        events = self._notifications()
+        self.assertEqual(events[-1]['params'], {'uri': self.uri, 'expired': True})
+        self.assertNotIn(self.job_id, self.mcp.subscriptions)
+
+    def test_reaped_session_drops_subscriptions(self):
+        self._rpc('resources/subscribe', {'uri': self.uri})
+        self.assertEqual(self.mcp.stream_stats()['subscriptions'], 1)
+        self.mcp.reap_idle_streams(now=self.stream.last_read + self.mcp.stream_idle_seconds + 1, force=True)
+        self.assertEqual(self.mcp.subscriptions, {})
+
+    def _wait_for_notifications(self, count, timeout=5):
+        events = []
+        deadline = time.time() + timeout
+        while len(events) < count and time.time() < deadline:
+            events.extend(self._notifications())
+            time.sleep(0.01)
+        return events
+
+    def test_job_of_other_worker_polled_from_store(self):
+        """其他工作进程的任务没有本地通知，订阅通过轮询任务存储收到更新和过期"""
+        other = SSEManager()
+        other.attach_store(self.app.job_store)
+        other.store_write_interval = 0
+        other.create_task('remote-job', status='queued', source='mcp')
+        self.mcp.subscription_poll_interval = 0.02
+        uri = 'demucs://jobs/remote-job'
+        self.assertEqual(self._rpc('resources/subscribe', {'uri': uri})['result'], {})
+
+        other.update_progress('remote-job', 40, '正在处理音频', '正在处理音频')
+        events = self._wait_for_notifications(1)
+        self.assertEqual([(e['params']['uri'], e['params']['job']['progress']) for e in events], [(uri, 40)])
+
+        other.clean_task('remote-job')
+        events = self._wait_for_notifications(1)
+        self.assertEqual(events[-1]['params'], {'uri': uri, 'expired': True})
+        self.assertEqual(self.mcp.subscriptions, {})
+
+    def test_invalid_subscriptions(self):
+        self.assertIn('error', self._rpc('resources/subscribe', {'uri': self.uri}, session_id=None))
+        self.assertIn('error', self._rpc('resources/subscribe', {'uri': 'demucs://jobs/missing-job'}))
+        self.assertIn('error', self._rpc('resources/subscribe', {'uri': f'{self.uri}/stems/vocals'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型注册表测试
+
+验证模型按需加载、LRU淘汰以及加载/淘汰/命中计数
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+import torch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.model_registry import ModelRegistry
+
+
+class FakeModel(torch.nn.Module):
+    """只包含参数的假模型"""
+
+    def __init__(self, size):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.zeros(size))
+
+
+class TestModelRegistry(unittest.TestCase):
+    """测试ModelRegistry"""
+
+    def setUp(self):
+        self.loaded = []
+
+        def loader(name):
+            self.loaded.append(name)
+            return FakeModel(256)
+
+        self.loader = loader
+
+    def test_lazy_loading(self):
+        """只加载请求的模型"""
+        registry = ModelRegistry(self.loader, max_models=2)
+        self.assertEqual(self.loaded, [])
+
+        registry.get("htdemucs")
+        registry.get("htdemucs")
+
+        self.assertEqual(self.loaded, ["htdemucs"])
+        stats = registry.stats()
+        self.assertEqual(stats['loads'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_lru_eviction_by_count(self):
+        """超过模型数量上限时淘汰最久未使用的模型"""
+        registry = ModelRegistry(self.loader, max_models=2)
+        registry.get("htdemucs")
+        registry.get("mdx")
+        registry.get("htdemucs")
+        registry.get("mdx_q")
+
+        self.assertTrue(registry.is_loaded("htdemucs"))
+        self.assertTrue(registry.is_loaded("mdx_q"))
+        self.assertFalse(registry.is_loaded("mdx"))
+        self.assertEqual(registry.stats()['evictions'], 1)
+
+    def test_lru_eviction_by_bytes(self):
+        """超过权重字节上限时淘汰模型"""
+        # 每个假模型 256 * 4 = 1024 字节
+        registry = ModelRegistry(self.loader, max_models=0, max_bytes=1500)
+        registry.get("htdemucs")
+        registry.get("mdx")
+
+        self.assertEqual(list(registry.loaded_models().keys()), ["mdx"])
+        self.assertEqual(registry.stats()['resident_bytes'], 1024)
+
+    def test_single_flight_loading(self):
+        """并发请求同一模型只加载一次"""
+        release = threading.Event()
+
+        def slow_loader(name):
+            self.loaded.append(name)
+            release.wait(5)
+            return FakeModel(16)
+
+        registry = ModelRegistry(slow_loader, max_models=1)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("htdemucs")))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(self.loaded, ["htdemucs"])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(m is results[0] for m in results))
+        self.assertEqual(registry.stats()['loads'], 1)
+
+    def test_load_error_propagates_to_waiters(self):
+        """加载失败时所有等待者都收到错误，之后可以重试"""
+        release = threading.Event()
+
+        def failing_loader(name):
+            release.wait(5)
+            raise RuntimeError("download failed")
+
+        registry = ModelRegistry(failing_loader)
+        errors = []
+
+        def worker():
+            try:
+                registry.get("htdemucs")
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(errors, ["download failed"] * 4)
+        self.assertEqual(registry.stats()['load_failures'], 1)
+        self.assertEqual(registry.stats()['loading_models'], [])
+
+    def test_load_timeout(self):
+        """加载超时抛出TimeoutError"""
+        release = threading.Event()
+
+        def stuck_loader(name):
+            release.wait(5)
+            return FakeModel(16)
+
+        registry = ModelRegistry(stuck_loader, load_timeout=0.1)
+        with self.assertRaises(TimeoutError):
+            registry.get("htdemucs")
+        release.set()
+
+    def test_unknown_model(self):
+        """未知模型抛出ValueError"""
+        registry = ModelRegistry(self.loader)
+        with self.assertRaises(ValueError):
+            registry.get("not-a-model")
+
+
+if __name__ == '__main__':
+    unittest.main()
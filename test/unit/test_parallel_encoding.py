@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行编码测试
+
+验证音轨在编码线程池中并行保存，并且下一个模型的推理不等待上一个模型的编码
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+import torch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.audio_separator import AudioSeparator
+
+
+class FakeDemucs(torch.nn.Module):
+    """返回输入副本的假分离模型"""
+
+    def __init__(self):
+        super().__init__()
+        self.samplerate = 1000
+        self.segment = 2.0
+        self.audio_channels = 2
+        self.sources = ["vocals", "drums", "bass", "other"]
+
+    def forward(self, mix):
+        return mix.unsqueeze(1).repeat(1, len(self.sources), 1, 1)
+
+
+class FakeAudioFile:
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, streams=0, samplerate=None, channels=None):
+        return torch.zeros(2, 4000)
+
+
+class TestParallelEncoding(unittest.TestCase):
+    """测试编码线程池"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        config = SimpleNamespace(
+            MODEL_CACHE_MAX_MODELS=0, MODEL_CACHE_MAX_BYTES=0, MODEL_LOAD_TIMEOUT=10, ENCODER_WORKERS=4,
+            DEFAULT_OUTPUT_FORMAT='mp3', DEFAULT_AUDIO_QUALITY='low', SUPPORTED_OUTPUT_FORMATS=['mp3'],
+            AUDIO_QUALITY_SETTINGS={'low': {'mp3_bitrate': '128k', 'sample_rate': 1000, 'description': 'low'}},
+            SAMPLE_RATE=1000, CHANNELS=2
+        )
+        self.separator = AudioSeparator(config)
+        self.separator.AudioFile = FakeAudioFile
+        self.separator.model_registry.loader = lambda name: FakeDemucs()
+        self.separator.model_registry.known_models = ['first', 'second']
+
+        self.events = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+        original_apply = self.separator._apply_model_with_progress
+
+        def apply(**kwargs):
+            self._record('apply', kwargs['model_name'])
+            return original_apply(**kwargs)
+
+        def save(audio, output_path, format_type='mp3', quality='low', samplerate=1000):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.2)
+            path = f"{output_path}.{format_type}"
+            with open(path, 'wb') as f:
+                f.write(b'mp3')
+            with self.lock:
+                self.active -= 1
+            self._record('saved', os.path.basename(path))
+            return path
+
+        self.separator._apply_model_with_progress = apply
+        self.separator.save_audio_with_format = save
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _record(self, kind, name):
+        with self.lock:
+            self.events.append((kind, name))
+
+    def test_encoding_overlaps_inference(self):
+        """编码并行执行，第二个模型在第一个模型的音轨保存完成前开始推理"""
+        result = self.separator.separate_track(
+            os.path.join(self.temp_dir, 'song.mp3'), self.temp_dir, model_name='all'
+        )
+
+        names = [f['name'] for f in result['files']]
+        self.assertEqual(names[:2], ['song_first_vocals.mp3', 'song_first_drums.mp3'])
+        self.assertEqual(len(names), 8)
+        self.assertTrue(all(os.path.exists(f['path']) for f in result['files']))
+
+        self.assertGreater(self.max_active, 1)
+        second_apply = self.events.index(('apply', 'second'))
+        first_saves = [i for i, e in enumerate(self.events) if e[0] == 'saved' and '_first_' in e[1]]
+        self.assertLess(second_apply, max(first_saves))
+
+    def test_encoding_error_fails_job(self):
+        """编码失败时任务失败"""
+        def broken(*args, **kwargs):
+            raise RuntimeError("音频格式转换失败")
+
+        self.separator.save_audio_with_format = broken
+        with self.assertRaises(RuntimeError):
+            self.separator.separate_track(os.path.join(self.temp_dir, 'song.mp3'), self.temp_dir, model_name='first')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+采样率流水线测试
+
+验证音频按模型采样率解码和推理，输出音轨一次性降采样到质量设置的采样率
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import torch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.audio_separator import AudioSeparator
+
+
+class FakeDemucs(torch.nn.Module):
+    """记录输入长度、返回输入副本的假分离模型"""
+
+    def __init__(self):
+        super().__init__()
+        self.samplerate = 44100
+        self.segment = 2.0
+        self.audio_channels = 2
+        self.sources = ["vocals", "drums", "bass", "other"]
+
+    def forward(self, mix):
+        return mix.unsqueeze(1).repeat(1, len(self.sources), 1, 1)
+
+
+class TestResamplePipeline(unittest.TestCase):
+    """测试采样率处理"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        config = SimpleNamespace(
+            MODEL_CACHE_MAX_MODELS=1, MODEL_CACHE_MAX_BYTES=0, MODEL_LOAD_TIMEOUT=10, ENCODER_WORKERS=2,
+            DEFAULT_OUTPUT_FORMAT='mp3', DEFAULT_AUDIO_QUALITY='low', SUPPORTED_OUTPUT_FORMATS=['mp3'],
+            AUDIO_QUALITY_SETTINGS={'low': {'mp3_bitrate': '128k', 'sample_rate': 22050, 'description': 'low'}},
+            SAMPLE_RATE=22050, CHANNELS=2
+        )
+        self.separator = AudioSeparator(config)
+        self.separator.model_registry.loader = lambda name: FakeDemucs()
+
+        self.read_rates = []
+        self.saved = {}
+        test = self
+
+        class FakeAudioFile:
+            def __init__(self, path):
+                pass
+
+            def read(self, streams=0, samplerate=None, channels=None):
+                test.read_rates.append(samplerate)
+                return torch.randn(channels, samplerate)  # 1秒音频
+
+        def save(audio, output_path, format_type='mp3', quality='low', samplerate=None):
+            self.saved[os.path.basename(output_path)] = (tuple(audio.shape), samplerate)
+            return f"{output_path}.{format_type}"
+
+        self.separator.AudioFile = FakeAudioFile
+        self.separator.save_audio_with_format = save
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_decode_at_model_rate_and_resample_once(self):
+        """解码使用模型采样率，输出为质量设置的采样率"""
+        result = self.separator.separate_track(
+            os.path.join(self.temp_dir, 'song.mp3'), self.temp_dir,
+            model_name='htdemucs', stems=['vocals', 'bass']
+        )
+
+        self.assertEqual(self.read_rates, [44100])
+        self.assertEqual(set(self.saved), {'song_htdemucs_vocals', 'song_htdemucs_bass'})
+        for shape, samplerate in self.saved.values():
+            self.assertEqual(shape, (2, 22050))
+            self.assertEqual(samplerate, 22050)
+        self.assertEqual(result['sample_rate'], 22050)
+        self.assertGreater(result['resample_seconds'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
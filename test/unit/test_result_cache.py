@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果缓存测试
+
+验证内容哈希键、缓存命中、进行中任务去重、共享结果的清理以及缓存淘汰
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+from app.services.result_cache import ResultCache, hash_file, make_cache_key
+
+
+class TestResultCache(unittest.TestCase):
+    """测试ResultCache"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config = SimpleNamespace(RESULT_CACHE_MAX_ENTRIES=2, RESULT_CACHE_MAX_BYTES=0, FILE_RETENTION_MINUTES=30)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name, data=b'stem'):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_cache_key_depends_on_content_and_params(self):
+        """相同内容相同参数得到相同的键，参数或内容不同则键不同"""
+        first = hash_file(self._write('a.mp3', b'same audio'))
+        second = hash_file(self._write('b.mp3', b'same audio'))
+        self.assertEqual(first, second)
+
+        key = make_cache_key(first, model='htdemucs', stems=['vocals'])
+        self.assertEqual(key, make_cache_key(second, stems=['vocals'], model='htdemucs'))
+        self.assertNotEqual(key, make_cache_key(first, model='mdx', stems=['vocals']))
+        self.assertNotEqual(key, make_cache_key(hash_file(self._write('c.mp3', b'other')), model='htdemucs', stems=['vocals']))
+
+    def test_inflight_then_hit(self):
+        """进行中的任务被复用，完成后直接命中"""
+        cache = ResultCache(self.config)
+        self.assertEqual(cache.lookup_or_reserve('k', 'job-1'), ('miss', 'job-1'))
+        self.assertEqual(cache.lookup_or_reserve('k', 'job-2'), ('inflight', 'job-1'))
+
+        cache.complete('k', 'job-1', [self._write('vocals.mp3')])
+        self.assertEqual(cache.lookup_or_reserve('k', 'job-3'), ('hit', 'job-1'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['inflight_joins'], stats['hits']), (1, 1, 1))
+
+    def test_failed_job_releases_reservation(self):
+        """失败的任务释放预留，下一次请求重新计算"""
+        cache = ResultCache(self.config)
+        cache.lookup_or_reserve('k', 'job-1')
+        cache.fail('k', 'job-1')
+        self.assertEqual(cache.lookup_or_reserve('k', 'job-2'), ('miss', 'job-2'))
+
+    def test_release_keeps_shared_result(self):
+        """复用结果的请求各自释放，最后一个持有者才能删除"""
+        cache = ResultCache(self.config)
+        cache.lookup_or_reserve('k', 'job-1')
+        cache.lookup_or_reserve('k', 'job-2')
+        cache.complete('k', 'job-1', [self._write('vocals.mp3')])
+        cache.lookup_or_reserve('k', 'job-3')
+
+        self.assertTrue(cache.release('job-1'))
+        self.assertTrue(cache.release('job-1'))
+        self.assertFalse(cache.release('job-1'))
+        self.assertEqual(cache.lookup_or_reserve('k', 'job-4'), ('hit', 'job-1'))
+        cache.invalidate_job('job-1')
+        self.assertFalse(cache.release('job-1'))
+
+    def test_cleanup_route_keeps_shared_files(self):
+        """一个客户端清理共享任务时，其他复用该结果的客户端仍可使用文件"""
+        app = create_app(TestingConfig)
+        job_id = 'shared-cleanup-job'
+        job_dir = app.file_manager.create_job_output_directory(job_id)
+        stem = os.path.join(job_dir, 'vocals.mp3')
+        with open(stem, 'wb') as f:
+            f.write(b'stem')
+        app.file_manager.record_output_files(job_id, [{'path': stem, 'size': 4}])
+        sse_manager.create_task(job_id, status='completed')
+        app.result_cache.lookup_or_reserve('k', job_id)
+        app.result_cache.complete('k', job_id, [stem])
+        self.assertEqual(app.result_cache.lookup_or_reserve('k', 'second-request'), ('hit', job_id))
+
+        client = app.test_client()
+        try:
+            self.assertEqual(client.delete(f'/api/cleanup/{job_id}').status_code, 200)
+            self.assertTrue(os.path.isfile(stem))
+            self.assertIsNotNone(sse_manager.get_progress(job_id))
+
+            self.assertEqual(client.delete(f'/api/cleanup/{job_id}').status_code, 200)
+            self.assertFalse(os.path.exists(job_dir))
+            self.assertIsNone(sse_manager.get_progress(job_id))
+        finally:
+            sse_manager.clean_task(job_id)
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def test_missing_files_and_lru_eviction(self):
+        """结果文件被删除或超出条目上限时不再命中"""
+        cache = ResultCache(self.config)
+        for i in range(3):
+            cache.lookup_or_reserve(f'k{i}', f'job-{i}')
+            cache.complete(f'k{i}', f'job-{i}', [self._write(f'{i}.mp3')])
+
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.lookup_or_reserve('k0', 'job-x')[0], 'miss')
+
+        os.remove(os.path.join(self.temp_dir, '1.mp3'))
+        self.assertEqual(cache.lookup_or_reserve('k1', 'job-y')[0], 'miss')
+        self.assertEqual(cache.lookup_or_reserve('k2', 'job-z'), ('hit', 'job-2'))
+
+        self.assertTrue(cache.invalidate_job('job-2'))
+        self.assertEqual(cache.lookup_or_reserve('k2', 'job-w')[0], 'miss')
+
+
+if __name__ == '__main__':
+    unittest.main()
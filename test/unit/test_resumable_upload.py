@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块续传上传测试
+
+验证分块按偏移写入上传目录的最终位置、边写边计算的哈希与整文件哈希一致、
+断线后可从已接收的偏移续传，以及用upload_id启动任务时不复制文件
+"""
+
+import io
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.services.job_store import JobStore
+from app.services.file_index import FileIndex
+from app.services.file_manager import FileManager
+from app.services.upload_manager import UploadManager, UploadError
+from app.services.job_scheduler import QueueFullError
+
+
+class BrokenStream:
+    """Request body whose connection drops after some bytes"""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size):
+        chunk = self.stream.read(size)
+        if not chunk:
+            raise ConnectionResetError('client went away')
+        return chunk
+
+
+class TestUploadManager(unittest.TestCase):
+    """测试上传管理服务"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'jobs.db')
+        config = SimpleNamespace(UPLOAD_FOLDER=os.path.join(self.temp_dir, 'uploads'),
+                                 OUTPUT_FOLDER=os.path.join(self.temp_dir, 'outputs'),
+                                 FILE_RETENTION_MINUTES=30)
+        self.file_manager = FileManager(config, index=FileIndex(JobStore(self.db_path)))
+        self.uploads = UploadManager(self.file_manager, self.file_manager.index.store, max_size=10_000)
+        self.content = os.urandom(3000)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_chunks_hash_and_consume(self):
+        upload = self.uploads.create('song.mp3', len(self.content))
+        self.assertEqual(self.uploads.write(upload['upload_id'], 0, io.BytesIO(self.content[:1000])), 1000)
+        with self.assertRaises(UploadError) as ctx:
+            self.uploads.write(upload['upload_id'], 500, io.BytesIO(b'x'))
+        self.assertEqual((ctx.exception.status_code, ctx.exception.offset), (409, 1000))
+        self.uploads.write(upload['upload_id'], 1000, io.BytesIO(self.content[1000:]))
+
+        finalized = self.uploads.finalize(upload['upload_id'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(finalized['sha256'], hashlib.sha256(self.content).hexdigest())
+        with open(upload['path'], 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+        consumed = self.uploads.consume(upload['upload_id'], 'job-0001')
+        self.assertEqual(consumed['path'], upload['path'])
+        self.assertEqual([f['path'] for f in self.file_manager.get_job_files('job-0001')], [upload['path']])
+        with self.assertRaises(UploadError):
+            self.uploads.consume(upload['upload_id'], 'job-0002')
+
+    def test_resume_after_drop_and_restart(self):
+        """断线后保留已写入的字节；重启后从磁盘恢复哈希状态继续"""
+        upload = self.uploads.create('song.mp3', len(self.content))
+        with self.assertRaises(UploadError) as ctx:
+            self.uploads.write(upload['upload_id'], 0, BrokenStream(self.content[:1200]))
+        self.assertEqual(ctx.exception.offset, 1200)
+
+        restarted = UploadManager(self.file_manager, JobStore(self.db_path))
+        self.assertEqual(restarted.get(upload['upload_id'])['offset'], 1200)
+        restarted.write(upload['upload_id'], 1200, io.BytesIO(self.content[1200:]))
+        finalized = restarted.finalize(upload['upload_id'])
+        self.assertEqual(finalized['sha256'], hashlib.sha256(self.content).hexdigest())
+
+    def test_limits(self):
+        with self.assertRaises(UploadError) as ctx:
+            self.uploads.create('song.mp3', 20_000)
+        self.assertEqual(ctx.exception.status_code, 413)
+        upload = self.uploads.create('song.mp3', 10)
+        with self.assertRaises(UploadError):
+            self.uploads.write(upload['upload_id'], 0, io.BytesIO(b'x' * 11))
+        with self.assertRaises(UploadError):
+            self.uploads.finalize(upload['upload_id'])
+
+
+class TestUploadRoutes(unittest.TestCase):
+    """测试 /api/uploads 接口和 upload_id 启动任务"""
+
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.content = os.urandom(5000)
+
+    def test_upload_then_process_without_copy(self):
+        response = self.client.post('/api/uploads', json={'filename': 'song.mp3'},
+                                    headers={'Upload-Length': str(len(self.content))})
+        self.assertEqual(response.status_code, 201)
+        upload_url = response.headers['Location']
+        upload_id = response.get_json()['data']['upload_id']
+
+        response = self.client.patch(upload_url, data=self.content[:2000], headers={'Upload-Offset': '0'})
+        self.assertEqual(response.headers['Upload-Offset'], '2000')
+        response = self.client.patch(upload_url, data=self.content[:10], headers={'Upload-Offset': '0'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.head(upload_url).headers['Upload-Offset'], '2000')
+        self.client.patch(upload_url, data=self.content[2000:], headers={'Upload-Offset': '2000'})
+        response = self.client.post(f'{upload_url}/finalize')
+        self.assertEqual(response.get_json()['data']['sha256'], hashlib.sha256(self.content).hexdigest())
+
+        with mock.patch('app.services.job_submitter.hash_file', side_effect=AssertionError('rehash')), \
+                mock.patch('shutil.copyfileobj', side_effect=AssertionError('copy')), \
+                mock.patch.object(self.app.job_scheduler, 'submit', return_value={'queue_position': 0}):
+            response = self.client.post('/api/process', data={'upload_id': upload_id})
+        self.assertEqual(response.status_code, 200, response.get_json())
+        job_id = response.get_json()['data']['job_id']
+        upload = self.app.upload_manager.get(upload_id)
+        self.assertEqual(upload['job_id'], job_id)
+        self.assertIn(upload['path'], [f['path'] for f in self.app.file_manager.get_job_files(job_id)])
+
+        # 同一个上传不能启动第二个任务
+        response = self.client.post('/api/process', data={'upload_id': upload_id})
+        self.assertEqual(response.status_code, 409)
+
+    def test_full_queue_keeps_upload_for_retry(self):
+        response = self.client.post('/api/uploads', json={'filename': 'song.mp3'},
+                                    headers={'Upload-Length': str(len(self.content))})
+        upload_id = response.get_json()['data']['upload_id']
+        self.client.patch(f'/api/uploads/{upload_id}', data=self.content, headers={'Upload-Offset': '0'})
+        self.client.post(f'/api/uploads/{upload_id}/finalize')
+        path = self.app.upload_manager.get(upload_id)['path']
+
+        # 检查容量时已满
+        with mock.patch.object(self.app.job_scheduler, 'check_capacity', side_effect=QueueFullError('full', 7)):
+            response = self.client.post('/api/process', data={'upload_id': upload_id})
+        self.assertEqual((response.status_code, response.headers['Retry-After']), (429, '7'))
+        # 检查容量之后、入队之前被占满
+        with mock.patch.object(self.app.job_scheduler, 'submit', side_effect=QueueFullError('full', 7)):
+            response = self.client.post('/api/process', data={'upload_id': upload_id})
+        self.assertEqual(response.status_code, 429)
+
+        upload = self.app.upload_manager.get(upload_id)
+        self.assertEqual((upload['status'], upload['job_id']), ('complete', None))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual([f['path'] for f in self.app.file_manager.get_job_files(upload_id)], [path])
+
+        with mock.patch.object(self.app.job_scheduler, 'submit', return_value={'queue_position': 0}):
+            response = self.client.post('/api/process', data={'upload_id': upload_id})
+        self.assertEqual(response.status_code, 200, response.get_json())
+
+    def test_unfinished_upload_cannot_start_job(self):
+        response = self.client.post('/api/uploads', data={'filename': 'song.mp3', 'size': '100'})
+        upload_id = response.get_json()['data']['upload_id']
+        response = self.client.post('/api/process', data={'upload_id': upload_id})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.delete(f'/api/uploads/{upload_id}').status_code, 200)
+        self.assertEqual(self.client.head(f'/api/uploads/{upload_id}').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段进度测试
+
+使用一个假模型验证 _apply_model_with_progress 按实际完成的分段数上报进度、
+吞吐量和剩余时间
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+import torch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.audio_separator import AudioSeparator
+
+
+class FakeDemucs(torch.nn.Module):
+    """返回输入副本的假分离模型"""
+
+    def __init__(self):
+        super().__init__()
+        self.samplerate = 1000
+        self.segment = 2.0
+        self.audio_channels = 2
+        self.sources = ["vocals", "drums", "bass", "other"]
+        self.scale = torch.nn.Parameter(torch.ones(1))
+
+    def forward(self, mix):
+        return mix.unsqueeze(1).repeat(1, len(self.sources), 1, 1) * self.scale
+
+
+class TestSegmentProgress(unittest.TestCase):
+    """测试分段级进度上报"""
+
+    def setUp(self):
+        config = SimpleNamespace(MODEL_CACHE_MAX_MODELS=1, MODEL_CACHE_MAX_BYTES=0, MODEL_LOAD_TIMEOUT=10)
+        self.separator = AudioSeparator(config)
+        self.separator.initialize()
+
+    def test_progress_follows_segments(self):
+        """进度随分段完成单调增加，并包含吞吐量和ETA"""
+        model = FakeDemucs()
+        mix = torch.zeros(1, 2, 10 * model.samplerate)
+        updates = []
+
+        def callback(progress, message, status=None, details=None):
+            updates.append((progress, details))
+
+        sources = self.separator._apply_model_with_progress(
+            model=model, mix=mix, shifts=0, split=True, overlap=0.25, progress=False,
+            device="cpu", job_id="test-job", progress_callback=callback,
+            model_name="fake", base_progress=10, max_progress=85
+        )
+
+        self.assertEqual(tuple(sources.shape), (1, 4, 2, 10 * model.samplerate))
+
+        segment_updates = [details for _, details in updates if details]
+        self.assertTrue(segment_updates, "没有分段进度")
+        last = segment_updates[-1]
+        self.assertEqual(last['segments_done'], last['segments_total'])
+        # 10秒音频，2秒分段，25%重叠 -> 步长1.5秒 -> 7个分段
+        self.assertEqual(last['segments_total'], 7)
+        self.assertGreater(last['samples_per_second'], 0)
+        self.assertEqual(last['eta_seconds'], 0)
+
+        progresses = [p for p, _ in updates]
+        self.assertEqual(progresses, sorted(progresses))
+        self.assertEqual(progresses[-1], 85)
+
+    def test_segment_count_with_shifts(self):
+        """shifts会增加前向计算次数"""
+        model = FakeDemucs()
+        count = self.separator._count_segments(model, 10 * model.samplerate, shifts=2, split=True, overlap=0.25)
+        # 补零0.5秒后为10.5秒 -> 7个分段，2次shift
+        self.assertEqual(count, 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
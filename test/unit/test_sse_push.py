@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSE推送测试
+
+验证进度流只在任务状态实际变化时唤醒、合并连续更新，并在空闲时发送心跳
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.sse import SSEManager
+
+
+def parse(event):
+    return json.loads(event.split('data: ', 1)[1])
+
+
+def event_id(event):
+    return int(event.split('\n', 1)[0][len('id: '):])
+
+
+class TestSSEPush(unittest.TestCase):
+    """测试基于条件变量的进度推送"""
+
+    def setUp(self):
+        self.manager = SSEManager()
+        self.manager.create_task('job', status='queued')
+
+    def test_update_is_pushed_immediately(self):
+        """状态变化后立即推送，不等待轮询间隔"""
+        stream = self.manager.stream_progress('job', heartbeat=5, coalesce=0)
+        self.assertEqual(parse(next(stream))['status'], 'queued')
+
+        threading.Timer(0.05, self.manager.update_progress, args=('job', 40, '处理中', 'processing')).start()
+        start = time.time()
+        event = parse(next(stream))
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(event['progress'], 40)
+
+    def test_unchanged_update_does_not_wake(self):
+        """相同的更新不递增版本号"""
+        self.manager.update_progress('job', 10, '处理中', 'processing')
+        version = self.manager.versions['job']
+        self.manager.update_progress('job', 10, '处理中', 'processing')
+        self.assertEqual(self.manager.versions['job'], version)
+
+    def test_heartbeat_and_coalescing(self):
+        """空闲时发送心跳，连续更新合并为一个事件"""
+        stream = self.manager.stream_progress('job', heartbeat=0.1, coalesce=0.2)
+        next(stream)
+        self.assertEqual(next(stream), ": heartbeat\n\n")
+
+        def burst():
+            for progress in range(10, 60, 10):
+                self.manager.update_progress('job', progress, status='processing')
+        threading.Timer(0.05, burst).start()
+        self.assertEqual(parse(next(stream))['progress'], 50)
+
+        self.manager.update_progress('job', 100, '完成', 'completed')
+        self.assertEqual(parse(next(stream))['status'], 'completed')
+        self.assertEqual(parse(next(stream)), {'message': 'Stream closed'})
+
+    def test_removed_task_closes_stream(self):
+        """任务被清理时订阅连接结束"""
+        stream = self.manager.stream_progress('job', heartbeat=5, coalesce=0)
+        next(stream)
+        threading.Timer(0.05, self.manager.clean_task, args=('job',)).start()
+        self.assertEqual(parse(next(stream)), {'message': 'Stream closed'})
+
+    def test_event_ids_increase(self):
+        """每个事件携带递增的ID"""
+        stream = self.manager.stream_progress('job', heartbeat=5, coalesce=0)
+        first = next(stream)
+        self.manager.update_progress('job', 20, status='processing')
+        second = next(stream)
+        self.assertLess(event_id(first), event_id(second))
+
+    def test_reconnect_replays_missed_events(self):
+        """携带Last-Event-ID重连时补发错过的事件，包括完成事件"""
+        stream = self.manager.stream_progress('job', heartbeat=5, coalesce=0)
+        last_seen = event_id(next(stream))
+        stream.close()
+
+        self.manager.update_progress('job', 50, status='processing')
+        self.manager.update_progress('job', 100, '完成', 'completed', result_file='/tmp/result.zip')
+
+        events = list(self.manager.stream_progress('job', heartbeat=5, coalesce=0, last_event_id=last_seen))
+        replayed = [parse(e) for e in events[:-1]]
+        self.assertEqual([e['progress'] for e in replayed], [50, 100])
+        self.assertEqual(replayed[-1]['status'], 'completed')
+        self.assertEqual(parse(events[-1]), {'message': 'Stream closed'})
+
+    def test_ring_buffer_is_bounded(self):
+        """缓冲区超出容量时丢弃最旧的事件，重连仍能得到最新状态"""
+        manager = SSEManager(history_size=3)
+        manager.create_task('job')
+        for progress in range(1, 11):
+            manager.update_progress('job', progress, status='processing')
+        self.assertEqual(len(manager.history['job']), 3)
+
+        stream = manager.stream_progress('job', heartbeat=5, coalesce=0, last_event_id=1)
+        replayed = [parse(next(stream)) for _ in range(3)]
+        self.assertEqual([e['progress'] for e in replayed], [8, 9, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
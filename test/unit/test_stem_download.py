@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单音轨下载测试
+
+验证 /api/download/<job_id>/<stem> 的MIME类型、Range断点续传、ETag条件请求和X-Accel-Redirect
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+
+JOB_ID = 'stem-download-job'
+
+
+class TestStemDownload(unittest.TestCase):
+    """测试单音轨下载接口"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app(TestingConfig)
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app.config['OUTPUT_FOLDER'] = self.temp_dir
+        self.content = os.urandom(4096)
+        self.path = os.path.join(self.temp_dir, '20240101', JOB_ID, 'vocals.mp3')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        sse_manager.create_task(JOB_ID)
+        sse_manager.update_progress(JOB_ID, 100, status='completed', details={'output_files': [
+            {'name': 'vocals.mp3', 'stem': 'vocals', 'format': 'mp3', 'size': 4096, 'path': self.path}
+        ]})
+        self.client = self.app.test_client()
+        self.url = f'/api/download/{JOB_ID}/vocals'
+
+    def tearDown(self):
+        sse_manager.clean_task(JOB_ID)
+        self.app.config['DOWNLOAD_OFFLOAD'] = ''
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'audio/mpeg')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertIn('vocals.mp3', response.headers['Content-Disposition'])
+        self.assertFalse(response.headers['ETag'].startswith('W/'))
+        self.assertEqual(response.get_data(), self.content)
+
+    def test_range_request(self):
+        """Range请求返回206和对应的字节"""
+        response = self.client.get(self.url, headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 1000-1999/4096')
+        self.assertEqual(response.get_data(), self.content[1000:2000])
+
+    def test_conditional_requests(self):
+        """If-None-Match命中返回304，If-Range不匹配时返回完整文件"""
+        etag = self.client.get(self.url).headers['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_data()), 4096)
+
+    def test_unknown_stem(self):
+        response = self.client.get(f'/api/download/{JOB_ID}/piano')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('vocals', response.get_json()['message'])
+
+    def test_x_accel_offload(self):
+        """x-accel模式只返回头部，由nginx发送文件"""
+        self.app.config['DOWNLOAD_OFFLOAD'] = 'x-accel'
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-outputs/20240101/{JOB_ID}/vocals.mp3')
+        self.assertEqual(response.get_data(), b'')
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_offload_non_ascii_name(self):
+        """非ASCII和带引号的音轨文件名在卸载模式下按RFC 5987编码，X-Accel-Redirect按URI编码，X-Sendfile为原始路径"""
+        name = '人声 "混音".mp3'
+        path = os.path.join(os.path.dirname(self.path), name)
+        with open(path, 'wb') as f:
+            f.write(self.content)
+        sse_manager.update_progress(JOB_ID, 100, status='completed', details={'output_files': [
+            {'name': name, 'stem': 'vocals', 'format': 'mp3', 'size': 4096, 'path': path}
+        ]})
+
+        self.app.config['DOWNLOAD_OFFLOAD'] = 'x-accel'
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        disposition = response.headers['Content-Disposition']
+        self.assertIn("filename*=UTF-8''%E4%BA%BA%E5%A3%B0%20%22%E6%B7%B7%E9%9F%B3%22.mp3", disposition)
+        self.assertIn('filename=" \\"\\".mp3"', disposition)
+        self.assertEqual(response.headers['X-Accel-Redirect'],
+                         f'/protected-outputs/20240101/{JOB_ID}/%E4%BA%BA%E5%A3%B0%20%22%E6%B7%B7%E9%9F%B3%22.mp3')
+
+        self.app.config['DOWNLOAD_OFFLOAD'] = 'x-sendfile'
+        response = self.client.get(self.url)
+        self.assertEqual(response.headers['X-Sendfile'].encode('latin-1'), os.fsencode(os.path.abspath(path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
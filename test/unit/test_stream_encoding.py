@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管道编码测试
+
+验证MP3编码直接把PCM数据写入ffmpeg标准输入，不再产生临时WAV文件，
+并且保留原有的错误处理
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.config import Config
+from app.services.audio_separator import AudioSeparator
+
+
+class TestStreamEncoding(unittest.TestCase):
+    """测试管道编码"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.separator = AudioSeparator(Config)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pcm_is_piped_to_ffmpeg(self):
+        """PCM按声道交错写入stdin，参数来自质量设置"""
+        audio = torch.tensor([[0.1, 0.2, 0.3], [-0.1, -0.2, -0.3]])
+        output_base = os.path.join(self.temp_dir, 'song_vocals')
+
+        with mock.patch('app.services.audio_separator.subprocess.run') as run:
+            path = self.separator.save_audio_with_format(audio, output_base, format_type='mp3', quality='low')
+
+        self.assertEqual(path, output_base + '.mp3')
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[cmd.index('-ar') + 1], '22050')
+        self.assertEqual(cmd[cmd.index('-ac') + 1], '2')
+        self.assertEqual(cmd[cmd.index('-b:a') + 1], '128k')
+        self.assertEqual(cmd[cmd.index('-i') + 1], 'pipe:0')
+
+        pcm = np.frombuffer(run.call_args[1]['input'], dtype=np.float32)
+        np.testing.assert_allclose(pcm, [0.1, -0.1, 0.2, -0.2, 0.3, -0.3], rtol=1e-6)
+
+        # 不应留下任何中间文件
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_ffmpeg_errors_are_wrapped(self):
+        """ffmpeg失败或缺失时抛出RuntimeError"""
+        audio = torch.zeros(2, 10)
+        output_base = os.path.join(self.temp_dir, 'song_drums')
+
+        error = subprocess.CalledProcessError(1, ['ffmpeg'], stderr=b'Unknown encoder')
+        with mock.patch('app.services.audio_separator.subprocess.run', side_effect=error):
+            with self.assertRaisesRegex(RuntimeError, 'Unknown encoder'):
+                self.separator.save_audio_with_format(audio, output_base, format_type='mp3', quality='low')
+
+        with mock.patch('app.services.audio_separator.subprocess.run', side_effect=FileNotFoundError()):
+            with self.assertRaisesRegex(RuntimeError, 'ffmpeg未找到'):
+                self.separator.save_audio_with_format(audio, output_base, format_type='mp3', quality='low')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式ZIP下载测试
+
+验证ZIP在下载时分块生成、压缩格式的音轨只存储不压缩，以及下载接口不在磁盘上生成ZIP
+"""
+
+import io
+import os
+import sys
+import shutil
+import zipfile
+import tempfile
+import unittest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes.api import sse_manager
+from app.utils.zip_stream import stream_zip
+
+
+class TestZipStream(unittest.TestCase):
+    """测试流式ZIP生成"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.mp3 = os.path.join(self.temp_dir, 'vocals.mp3')
+        self.wav = os.path.join(self.temp_dir, 'drums.wav')
+        with open(self.mp3, 'wb') as f:
+            f.write(os.urandom(300 * 1024))
+        with open(self.wav, 'wb') as f:
+            f.write(b'\x00\x01' * 100 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_archive_is_valid_and_streamed_in_chunks(self):
+        """生成的ZIP可以正常解压，并且分多块输出"""
+        chunks = list(stream_zip([(self.mp3, 'vocals.mp3'), (self.wav, 'drums.wav')], chunk_size=64 * 1024))
+        self.assertGreater(len(chunks), 2)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            with open(self.mp3, 'rb') as f:
+                self.assertEqual(archive.read('vocals.mp3'), f.read())
+            infos = {info.filename: info for info in archive.infolist()}
+
+        # MP3只存储，WAV压缩
+        self.assertEqual(infos['vocals.mp3'].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(infos['drums.wav'].compress_type, zipfile.ZIP_DEFLATED)
+        self.assertLess(infos['drums.wav'].compress_size, infos['drums.wav'].file_size)
+
+    def test_download_endpoint_streams_zip(self):
+        """下载接口根据任务的音轨列表流式生成ZIP"""
+        app = create_app(TestingConfig)
+        job_id = 'zip-stream-job'
+        sse_manager.create_task(job_id)
+        sse_manager.update_progress(job_id, 100, status='completed', details={'output_files': [
+            {'name': 'vocals.mp3', 'stem': 'vocals', 'format': 'mp3', 'size': os.path.getsize(self.mp3),
+             'path': self.mp3}
+        ]})
+        try:
+            response = app.test_client().get(f'/api/download/{job_id}')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_streamed)
+            self.assertEqual(response.mimetype, 'application/zip')
+            self.assertIn(f'demucs_output_{job_id}.zip', response.headers['Content-Disposition'])
+            with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+                self.assertEqual(archive.namelist(), ['vocals.mp3'])
+            # 没有在磁盘上生成ZIP
+            self.assertEqual(sorted(os.listdir(self.temp_dir)), ['drums.wav', 'vocals.mp3'])
+
+            # 音轨文件已被删除时返回404
+            os.remove(self.mp3)
+            self.assertEqual(app.test_client().get(f'/api/download/{job_id}').status_code, 404)
+        finally:
+            sse_manager.clean_task(job_id)
+
+
+if __name__ == '__main__':
+    unittest.main()